@@ -62,3 +62,24 @@ class ExpenseSplitAdmin(admin.ModelAdmin):
                     "balance_outstanding", "status"]
     list_filter = ["status", "expense__group"]
     readonly_fields = ["expense_user", "expense", "amount", "balance_outstanding", "split_type"]
+
+
+@register(Balance)
+class BalanceAdmin(admin.ModelAdmin):
+    search_fields = ("lender__username", "borrower__username", "group__group_name")
+    list_display = ["id", "lender", "borrower", "group", "amount", "updated_on"]
+    list_filter = ["group"]
+    readonly_fields = ["lender", "borrower", "group", "amount"]
+
+
+@register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    search_fields = ("email", "subject")
+    list_display = ["id", "email", "subject", "status", "attempts", "created_on", "sent_on"]
+    list_filter = ["status"]
+    readonly_fields = ["email", "subject", "message", "html_message", "dedupe_key"]
+
+
+@register(ReminderRun)
+class ReminderRunAdmin(admin.ModelAdmin):
+    list_display = ["id", "run_key", "status", "cursor", "started_on", "updated_on"]
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenses'
+
+    def ready(self):
+        from expenses.common import constants as app_constants
+        from splitwise_app.utils import metrics_utils
+
+        metrics_utils.track_tasks(app_constants.METRIC_TASKS)
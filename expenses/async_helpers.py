@@ -0,0 +1,98 @@
+import asyncio
+from typing import Union
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Sum
+
+from . import helpers, ledger
+from .models import Balance, Expense, Group
+
+
+def db_query(func):
+    """
+    Run a blocking ORM call on a worker thread, so independent queries of one request can be awaited
+    concurrently with asyncio.gather. Each pool thread keeps its own connection for CONN_MAX_AGE instead of
+    connecting per call (so connections are bounded by the executor's thread count per process).
+    Django 4.0 has no async queryset API yet; this is the thread-pool equivalent of it.
+    """
+    def run(*args, **kwargs):
+        # no request_started/finished signals on these threads : drop broken or expired connections here
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def afetch_group_summary(user_id: int, group_id: Union[str, int]) -> Union[dict, None]:
+    """
+    Helper to fetch group detail, members & the user's owed/borrowed totals within the group concurrently.
+    None if the user is not a member of the group.
+    """
+    group, members, owed, borrowed = await asyncio.gather(
+        db_query(lambda: Group.objects.filter(id=group_id, groupmember__member_id=user_id)
+                 .values("id", "group_name", "description").first())(),
+        db_query(lambda: list(helpers.fetch_group_members(group_id)))(),
+        db_query(ledger.fetch_balance)(lender_id=user_id, group_id=group_id),
+        db_query(ledger.fetch_balance)(borrower_id=user_id, group_id=group_id),
+    )
+    if not group:
+        return None
+
+    return {
+        "group_name": group["group_name"],
+        "group_id": group["id"],
+        "description": group["description"],
+        "members": members,
+        "owed_expenses": owed,
+        "borrowed_expenses": borrowed,
+    }
+
+
+async def afetch_expense_detail(expense_id: Union[str, int]) -> Union[dict, None]:
+    """
+    Helper to fetch an expense & its splits concurrently
+    """
+    expense, splits = await asyncio.gather(
+        db_query(lambda: Expense.objects.filter(id=expense_id).values("id", "name", "balance_amt").first())(),
+        db_query(helpers.fetch_expense_split_details)(expense_id),
+    )
+    if not expense:
+        return None
+
+    return {
+        "expense_name": expense["name"],
+        "expense_id": expense["id"],
+        "amount": expense["balance_amt"],
+        "splits": splits,
+    }
+
+
+async def afetch_user_balances(user_id: int) -> dict:
+    """
+    Helper to fetch what each friend owes the user & what the user owes each friend (both aggregates run
+    concurrently), along with the totals
+    """
+    def outstanding(**filters):
+        return Balance.objects.filter(amount__gt=0, **filters)
+
+    lent, borrowed = await asyncio.gather(
+        db_query(lambda: list(outstanding(lender_id=user_id).values("borrower_id", "borrower__username")
+                              .annotate(total=Sum("amount")).order_by("borrower_id")))(),
+        db_query(lambda: list(outstanding(borrower_id=user_id).values("lender_id", "lender__username")
+                              .annotate(total=Sum("amount")).order_by("lender_id")))(),
+    )
+
+    return {
+        "owed_expenses": sum((row["total"] for row in lent), ledger.ZERO),
+        "borrowed_expenses": sum((row["total"] for row in borrowed), ledger.ZERO),
+        "owed_by": [
+            {"user_id": row["borrower_id"], "name": row["borrower__username"], "amount": row["total"]} for row in lent
+        ],
+        "borrowed_from": [
+            {"user_id": row["lender_id"], "name": row["lender__username"], "amount": row["total"]} for row in borrowed
+        ],
+    }
@@ -27,4 +27,77 @@ SETTLEMENT_STATUS_CHOICES = (
     ('Settled', 'Settled'),
     ('Failed', 'Failed'),
 )
-PAYMENT_LINK_URL = '/expense-app/payment-summary/{payment_uid}?signature={signature}'
\ No newline at end of file
+OUTBOX_STATUS_CHOICES = (
+    ('Pending', 'Pending'),
+    ('Sending', 'Sending'),
+    ('Sent', 'Sent'),
+    ('Failed', 'Failed'),
+)
+
+
+class OutboxStatus(Enum):
+    PENDING = 'Pending'
+    SENDING = 'Sending'
+    SENT = 'Sent'
+    FAILED = 'Failed'
+
+
+REMINDER_RUN_STATUS_CHOICES = (
+    ('Running', 'Running'),
+    ('Dispatched', 'Dispatched'),
+)
+
+REMINDER_CHUNK_STATUS_CHOICES = (
+    ('Pending', 'Pending'),
+    ('Done', 'Done'),
+)
+
+PAYMENT_LINK_URL = '/expense-app/payment-summary/{token}'
+PAYMENT_LINK_SALT = 'expenses.payment-link'
+PAYMENT_LINK_TTL = 60 * 60 * 24
+
+# bulk import
+IMPORT_CHUNK_SIZE = 500
+# payers' friend sets & groups' member sets an import keeps, least recently used dropped first
+IMPORT_LOOKUP_CACHE_SIZE = 1000
+MAX_REPORTED_IMPORT_ERRORS = 1000
+
+# notification outbox
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_BATCHES_PER_RUN = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_CLAIM_TIMEOUT_MINUTES = 10
+
+# weekly reminders
+REMINDER_CHUNK_SIZE = 500  # borrowers per chunk task
+REMINDER_GROUP_SIZE = 20  # chunk tasks per dispatched celery group
+
+# summary read-through cache
+SUMMARY_CACHE_TTL = 60 * 10
+SUMMARY_CACHE_SCOPE_TTL = 60 * 60 * 24
+SUMMARY_CACHE_LOCK_TTL = 10  # seconds a builder may hold the single-flight lock
+SUMMARY_CACHE_WAIT_SECONDS = 2
+SUMMARY_CACHE_POLL_SECONDS = 0.05
+
+# coalesced expense status recomputation
+EXPENSE_STATUS_BATCH_SIZE = 500
+EXPENSE_STATUS_MAX_BATCHES_PER_RUN = 20
+
+# expense search : words InnoDB's FULLTEXT index leaves out (innodb_ft_min_token_size & default stopword list)
+FULLTEXT_MIN_WORD_LENGTH = 3
+FULLTEXT_STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in', 'is',
+    'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who', 'will',
+    'with', 'und', 'www',
+))
+
+# synthetic datasets & benchmarks
+SYNTHETIC_PREFIX = 'synthetic'
+SYNTHETIC_PASSWORD = 'synthetic-pass'
+
+# celery tasks whose duration & retries are exported on /metrics
+METRIC_TASKS = (
+    'expenses.utils.send_email_notification',
+    'expenses.helpers.update_expense_status',
+    'expenses.tasks.weeekly_notification_task',
+)
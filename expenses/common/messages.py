@@ -7,10 +7,17 @@ EXPENSE_SETTLED_EMAIL_BODY = 'Hi {lender} expense debt of {amount} rs has been p
 EXPENSE_ADDED_NOTIFICATION = 'hey, {username} has requested {balance} rs for the expense {expense_name}'
 
 DEBIT_REMINDER_MAIL_SUBJECT = 'Reminder : Payment Notification'
+WEEKLY_REMINDER_MAIL_BODY = 'Hi {user} This is your weekly Split-X reminder. You owe :\n{dues}\nPlease settle asap.\nThank You!'
+WEEKLY_REMINDER_DUE_LINE = '- {amount} rs to {lender}'
 EXPENSE_RE3MINDER_MAIL_BODY = 'Hi {user} This is a reminder that you owe me {amount} rs for expenses on Split-X. Please settle asap.\nThank You! \n{lender}'
 EXPENSE_ADDED_SUCCESSFULLY = "Expense added successfully"
 EXPENSE_DETAILS_RETRIEVED = "Expense found"
 EXPENSE_NOT_FOUND = "Expense not found."
+EXPENSE_SEARCH_RESULTS = "Matching expenses"
+EXPENSES_IMPORTED = "Expenses import completed"
+EXPENSE_IMPORT_FAILED = "Expenses import failed"
+INVALID_IMPORT_FORMAT = "Import format must be one of csv, jsonl"
+IMPORT_FILE_REQUIRED = "A csv or jsonl file is required"
 GROUP_MEMBER_INSERT_FAILED = "Failed to create group members"
 GROUP_ADDESS_SUCCESS = "Group created successfully"
 VALIDATION_ERROR = "Validation error"
@@ -18,6 +25,8 @@ GROUP_EXPENSE_FETCHED = "Groups expenses list retrieved"
 GROUP_EXPENSE_NOT_FOUND = "Groups expenses data not found"
 GROUP_DATA_FOUND = "Groups data Found"
 GROUP_NOT_FOUND = "Group data not Found"
+GROUP_SETTLE_UP_FETCHED = "Group settle up suggestions retrieved"
+GROUP_SETTLE_UP_FAILED = "Failed to compute group settle up suggestions"
 USER_NOTIFIED_ABOUT_DUES = "User notified about dues"
 PAYMENT_LINK_GENERATED_SUCCESSFULLY = "Link generated successfully"
 LINK_GENERATION_FAILED = "Link generation failed"
@@ -30,3 +39,9 @@ ERROR_FETCHING_EXPENSE_SETTLEMENT_DATA = "Error fetching user expense settlement
 
 SETTLEMENT_UPDATED = "Settlement details updated Successfully"
 EXPENSE_SETTLED = "Expense Settled Successfully"
+
+BALANCES_FETCHED = "User balances retrieved"
+BALANCES_FETCH_FAILED = "Failed to fetch user balances"
+AUTHENTICATION_REQUIRED = "Authentication credentials were not provided or are invalid."
+METHOD_NOT_ALLOWED = "Method not allowed"
+REQUEST_THROTTLED = "Request was throttled."
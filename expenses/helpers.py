@@ -2,15 +2,17 @@ import decimal
 import logging
 import secrets
 
-from .models import Group, GroupMember, Expense, ExpenseSplit, Settlement
+from . import ledger, simplification, status_queue, summary_cache
+from .models import Group, GroupMember, Expense, ExpenseSplit, Settlement, NotificationOutbox
+from users import activity
 from users.models import User
 from expenses.common import messages as app_messages, constants as app_constants
 from django.db import transaction
-from django.db.models import Sum, F
+from django.utils import timezone
+from django.db.models import Case, Count, DecimalField, Prefetch, Q, Value, When
 from typing import Union
 from rest_framework import status
 from rest_framework.response import Response
-from .utils import send_email_notification
 from celery import shared_task
 from django.conf import settings
 from rest_framework.exceptions import NotFound
@@ -45,7 +47,7 @@ def fetch_user_groups(request: object, group_id: Union[str, int] = None) -> obje
             except Group.DoesNotExist:
                 raise NotFound(detail="Group not found or you are not a member of this group.")
         else:
-            groups = Group.objects.filter(groupmember__member=request.user).distinct()
+            groups = Group.objects.filter(groupmember__member=request.user).distinct().order_by('id')
 
     except Exception as e:
         logger.error(f"HELPERS - FETCH USER GROUPS : ERROR {str(e)}")
@@ -59,6 +61,36 @@ def fetch_group_members(group_id: str):
     return group_members
 
 
+def fetch_group_detail(request: object, group_id: Union[str, int]) -> Union[dict, None]:
+    """
+    Helper to build group detail payload, None if the user is not a member of the group
+    """
+    group = fetch_user_groups(request, group_id=group_id)
+    if not group:
+        return None
+
+    return {
+        "group_name": group.group_name,
+        "description": group.description,
+        "members": list(fetch_group_members(group.id)),
+        # "created_on": group.created_on
+    }
+
+
+def fetch_settle_up_suggestions(group_id: Union[str, int]) -> list:
+    """
+    Helper to fetch simplified settle-up payments for a group along with usernames
+    """
+    suggestions = simplification.suggest_settlements(group_id)
+    user_ids = {s["from_user"] for s in suggestions} | {s["to_user"] for s in suggestions}
+    usernames = dict(User.objects.filter(id__in=user_ids).values_list("id", "username")) if user_ids else {}
+    for suggestion in suggestions:
+        suggestion["from_username"] = usernames.get(suggestion["from_user"])
+        suggestion["to_username"] = usernames.get(suggestion["to_user"])
+        suggestion["amount"] = str(suggestion["amount"])
+    return suggestions
+
+
 def fetch_user_expense(request: object, expense_id: Union[str, int] = None, group_id: Union[str, int] = None) -> object:
     """
     Helper to get user expenses.
@@ -67,10 +99,12 @@ def fetch_user_expense(request: object, expense_id: Union[str, int] = None, grou
         if expense_id:
             expenses = Expense.objects.get(id=expense_id)
         elif group_id:
-            expenses = Expense.objects.filter(group__id=group_id)
+            expenses = with_outstanding_splits(Expense.objects.filter(group__id=group_id).order_by('id'))
         else:
             expence_user = request.user
-            expenses = [i.expense for i in ExpenseSplit.objects.filter(expense_user=expence_user)]
+            expenses = with_outstanding_splits(
+                Expense.objects.filter(expensesplit__expense_user=expence_user).distinct().order_by('id')
+            )
     except Exception as e:
         logger.error(f"HELPERS - FETCH USER EXPENSES : ERROR {str(e)}")
         expenses = None
@@ -80,28 +114,62 @@ def fetch_user_expense(request: object, expense_id: Union[str, int] = None, grou
 
 def fetch_group_expenses(group: object, request: object) -> tuple:
     """
-    Helper to fetch expenses for a group
+    Helper to fetch expenses for a group : (owed to user, borrowed by user) read from the balance ledger
     """
     member = request.user
-    owed_expenses = ExpenseSplit.objects.filter(expense__group=group,
-                                                balance_outstanding__gt=0).exclude(expense_user=member, ).aggregate(
-        total_balance_outstanding=Sum('balance_outstanding')).get("total_balance_outstanding", 0)
-    borrowed_expenses = ExpenseSplit.objects.filter(expense__group=group, balance_outstanding__gt=0,
-                                                    expense_user=member).aggregate(
-        total_balance_outstanding=Sum('balance_outstanding')).get("total_balance_outstanding", 0)
+    owed_expenses = ledger.fetch_balance(lender_id=member.id, group_id=group.id)
+    borrowed_expenses = ledger.fetch_balance(borrower_id=member.id, group_id=group.id)
     return owed_expenses, borrowed_expenses
 
 
+def fetch_groups_summary(groups: list, request: object) -> list:
+    """
+    Helper to build owed/borrowed summary for a page of groups with a single aggregate query
+    """
+    balances = ledger.fetch_group_balances(request.user.id, [g.id for g in groups])
+    result = []
+    for g in groups:
+        owed, borrowed = balances.get(g.id, (0, 0))
+        result.append({
+            "group_name": g.group_name,
+            "group_id": g.id,
+            "owed_expenses": owed or 0,
+            "borrowed_expenses": borrowed or 0
+        })
+    return result
+
+
 # expense data helpers
+def with_outstanding_splits(expenses: object) -> object:
+    """
+    Helper to prefetch outstanding splits (with their users) of an expense queryset into `outstanding_splits`.
+    Keeps expense listing at a fixed number of queries regardless of page size.
+    """
+    return expenses.prefetch_related(
+        Prefetch(
+            'expensesplit_set',
+            queryset=ExpenseSplit.objects.filter(balance_outstanding__gt=0).select_related('expense_user').order_by('id'),
+            to_attr='outstanding_splits'
+        )
+    )
+
+
 def fetch_expense_split(expense: object, request: object) -> tuple:
     """
     Helper to fetch expense data for a user
     """
     member = request.user
+    outstanding_splits = getattr(expense, 'outstanding_splits', None)
+    if outstanding_splits is not None:
+        owed_expense_split = [split for split in outstanding_splits if split.expense_user_id != member.id]
+        borrowed_expense = [split for split in outstanding_splits if split.expense_user_id == member.id]
+        return owed_expense_split, borrowed_expense
+
     borrowed_expense = ExpenseSplit.objects.filter(expense=expense, expense_user=member,
-                                                   balance_outstanding__gt=0)
+                                                   balance_outstanding__gt=0).select_related('expense_user')
     owed_expense_split = ExpenseSplit.objects.filter(expense=expense,
-                                                     balance_outstanding__gt=0).exclude(expense_user=member)
+                                                     balance_outstanding__gt=0).exclude(
+        expense_user=member).select_related('expense_user')
 
     return owed_expense_split, borrowed_expense
 
@@ -138,8 +206,24 @@ def fetch_borrowed_exp_breakup(borrowed_expenses: object) -> list:
     return borrowed_exp_details
 
 
+def fetch_expense_list_data(expenses: object, request: object) -> list:
+    """
+    Helper to build list payload for expenses loaded via `with_outstanding_splits`
+    """
+    result = []
+    for expense in expenses:
+        owed, borrowed = fetch_expense_split(expense, request)
+        result.append({
+            "expense_name": expense.name,
+            "expense_id": expense.id,
+            "owed_expenses": fetch_owed_exp_breakup(owed),
+            "borrowed_expenses": fetch_borrowed_exp_breakup(borrowed),
+        })
+    return result
+
+
 def fetch_expense_split_details(expense: object) -> object:
-    expense_splits = ExpenseSplit.objects.filter(expense=expense)
+    expense_splits = ExpenseSplit.objects.filter(expense=expense).select_related('expense_user')
     splits = []
     for obj in expense_splits:
         splits.append({
@@ -151,17 +235,40 @@ def fetch_expense_split_details(expense: object) -> object:
     return splits
 
 
+def fetch_expense_detail(request: object, expense_id: Union[str, int]) -> Union[dict, None]:
+    """
+    Helper to build expense detail payload along with its splits, None if the expense doesn't exist
+    """
+    expense = fetch_user_expense(request, expense_id=expense_id)
+    if not expense:
+        return None
+
+    return {
+        "expense_name": expense.name,
+        "expense_id": expense.id,
+        "amount": expense.balance_amt,
+        "splits": fetch_expense_split_details(expense),
+    }
+
+
+def fetch_expense_cache_scope(expense_id: Union[str, int]) -> Union[tuple, None]:
+    """
+    Helper to fetch what an expense's cached detail is versioned by : its group, or its payer for non-group expenses
+    """
+    expense = Expense.objects.filter(id=expense_id).values_list('group_id', 'expense_by_id').first()
+    if not expense:
+        return None
+    group_id, expense_by_id = expense
+    return ("group", group_id) if group_id else ("user", expense_by_id)
+
+
 def notify_user_about_debit(lender: User, user_id: Union[str, int]) -> bool:
     """
     Helper to send due pending notification to a friend
     """
     try:
         user = User.objects.get(id=user_id)
-        owed_amt = ExpenseSplit.objects.filter(
-            expense__expense_by=lender,
-            expense_user__id=user_id
-        ).aggregate(
-            total_balance_outstanding=Sum('balance_outstanding')).get("total_balance_outstanding", 0)
+        owed_amt = ledger.fetch_balance(lender_id=lender.id, borrower_id=user.id)
         if not owed_amt:
             raise Exception("All expenses are paid")
 
@@ -171,7 +278,7 @@ def notify_user_about_debit(lender: User, user_id: Union[str, int]) -> bool:
             amount=round(owed_amt, 2),
             lender=lender.username.capitalize()
         )
-        send_email_notification.apply_async(kwargs=dict(email=user.email, subject=subject, message=message))
+        NotificationOutbox.enqueue([dict(email=user.email, subject=subject, message=message)])
         return True
     except Exception as e:
         logger.error(f"HELPERS - NOTIFY USER ABOUT DEBIT : ERROR {str(e)}")
@@ -181,66 +288,142 @@ def notify_user_about_debit(lender: User, user_id: Union[str, int]) -> bool:
 def settle_expenses(expense_ids: list, user_id: int, payment_id: str, amount: decimal.Decimal, payment_status: str,
                     mode: str = None) -> tuple:
     """
-    Helper function to settle expenses/dues
+    Helper function to settle expenses/dues.
+    The settlement & the user's splits are locked (settlement first, splits by id) so concurrent callbacks
+    serialize per split, and a repeated callback for an already settled payment is a no-op.
     """
     try:
-        if payment_status == "Settled":
-            with transaction.atomic():
-                # Step 1: Fetch all relevant ExpenseSplits
-                expense_splits = ExpenseSplit.objects.select_related('expense').filter(
-                    expense__id__in=expense_ids,
-                    expense_user__id=user_id
+        is_offline = mode == "Offline"
+        now = timezone.now()
+        with transaction.atomic():
+            settlement = Settlement.objects.select_for_update().filter(
+                payment_id=payment_id,
+                deleted_on__isnull=True
+            ).values('id', 'status').first()
+
+            if payment_status != "Settled":
+                Settlement.objects.filter(payment_id=payment_id, deleted_on__isnull=True).exclude(
+                    status='Settled'
+                ).update(status='Failed', is_offline=is_offline, updated_on=now)
+                return True, app_messages.SETTLEMENT_UPDATED
+
+            if settlement and settlement["status"] == 'Settled':
+                return True, app_messages.EXPENSE_SETTLED
+
+            # Step 1: Lock the user's splits in a fixed order (no join, so the expense rows stay unlocked)
+            splits = list(ExpenseSplit.objects.select_for_update().filter(
+                expense__id__in=expense_ids,
+                expense_user__id=user_id
+            ).order_by('id').values('id', 'expense_id', 'balance_outstanding'))
+            if not splits:
+                return True, app_messages.EXPENSE_SETTLED
+            expenses = {
+                expense["id"]: expense
+                for expense in Expense.objects.filter(id__in={split["expense_id"] for split in splits}).values(
+                    'id', 'name', 'expense_by_id', 'expense_by__username', 'group_id')
+            }
+            borrower = (user_id, User.objects.filter(id=user_id).values_list('username', flat=True).first())
+
+            # Step 2: Per row balances & status from the locked values, written in one UPDATE
+            payments, balances, paid_ids = [], [], []
+            for split in splits:
+                balance = max(split["balance_outstanding"] - amount, 0)
+                if balance == 0:
+                    paid_ids.append(split["id"])
+                balances.append(When(id=split["id"], then=Value(balance)))
+                expense = expenses[split["expense_id"]]
+                payments.append({
+                    "lender_id": expense["expense_by_id"],
+                    "borrower_id": user_id,
+                    "group_id": expense["group_id"],
+                    "amount": split["balance_outstanding"] - balance,
+                })
+            ExpenseSplit.objects.filter(id__in=[split["id"] for split in splits]).update(
+                balance_outstanding=Case(*balances, output_field=DecimalField(max_digits=10, decimal_places=2)),
+                status=Case(
+                    When(id__in=paid_ids, then=Value(app_constants.SplitExpenseStatus.PAID.value)),
+                    default=Value(app_constants.SplitExpenseStatus.PENDING.value),
+                ),
+                settled=True,
+                updated_on=now
+            )
+            ledger.record_settlement(payments)
+            activity.record([
+                event
+                for split, payment in zip(splits, payments) if payment["amount"] > 0
+                for event in activity.expense_settled(
+                    split["expense_id"], expenses[split["expense_id"]]["name"], payment["amount"], borrower,
+                    (payment["lender_id"], expenses[split["expense_id"]]["expense_by__username"])
                 )
+            ])
 
-                # Step 2: Bulk update ExpenseSplits
-                expense_splits.update(
-                    balance_outstanding=F('balance_outstanding') - amount,
-                    status="Paid" if F('balance_outstanding') - amount == 0 else "Pending",
-                    settled=True
-                )
+            # Step 3: Mark the payment's settlements in one statement
+            Settlement.objects.filter(
+                payment_id=payment_id,
+                expense_split_id__in=[split["id"] for split in splits],
+                deleted_on__isnull=True
+            ).update(status='Settled', is_offline=is_offline, updated_on=now)
 
-                # Step 3: Update Settlements individually
-                settlements = Settlement.objects.filter(
-                    payment_id=payment_id,
-                    expense_split__in=expense_splits,
-                    deleted_on__isnull=True
-                ).select_related('expense_split')
-
-                for settlement in settlements:
-                    settlement.status = 'Settled'
-                    settlement.is_offline = mode == "Offline"
-                    settlement.save()
-
-            return True,app_messages.EXPENSE_SETTLED
-        else:
-            with transaction.atomic():
-                settlement = Settlement.objects.filter(
-                    payment_id=payment_id,
-                    deleted_on__isnull=True
-                ).first()
-                settlement.status = 'Failed'
-                settlement.is_offline = mode == "Offline"
-                settlement.save()
-            return True, app_messages.SETTLEMENT_UPDATED
+        return True, app_messages.EXPENSE_SETTLED
     except Exception as e:
         logger.error(f"HELPERS - SETTLE EXPENSES : ERROR {str(e)}")
         return False, str(e)
 
 
+def recompute_expense_statuses(expense_ids) -> int:
+    """
+    Helper to decide the status of many expenses with one grouped query & flip the changed ones with one UPDATE.
+    An expense is Paid once none of its splits has an outstanding balance. Returns the number of flipped expenses.
+    """
+    paid, pending = app_constants.SplitExpenseStatus.PAID.value, app_constants.SplitExpenseStatus.PENDING.value
+    expenses = Expense.objects.filter(id__in=set(expense_ids)).annotate(
+        open_splits=Count('expensesplit', filter=Q(expensesplit__status=pending,
+                                                   expensesplit__balance_outstanding__gt=0))
+    ).values_list('id', 'status', 'open_splits', 'group_id', 'expense_by_id')
+
+    changed = [expense for expense in expenses if expense[1] != (pending if expense[2] else paid)]
+    if not changed:
+        return 0
+    paid_ids = [expense[0] for expense in changed if not expense[2]]
+    with transaction.atomic():
+        Expense.objects.filter(id__in=[expense[0] for expense in changed]).update(
+            status=Case(When(id__in=paid_ids, then=Value(paid)), default=Value(pending)),
+            updated_on=timezone.now()
+        )
+        # cached expense details are versioned by their group, or by the payer for non-group expenses
+        summary_cache.bump_versions(
+            group_ids=[expense[3] for expense in changed],
+            user_ids=[expense[4] for expense in changed if expense[3] is None]
+        )
+    return len(changed)
+
+
 @shared_task(bind=True, queue=settings.NOTIFICATION_QUEUE)
 def update_expense_status(self, **kwargs):
+    """
+    Recompute the status of `expenses` if given, else drain the ids coalesced by status_queue.enqueue.
+    Runs periodically from celery beat.
+    """
     expenses = kwargs.get("expenses")
-    for expense_id in expenses:
-        if not ExpenseSplit.objects.filter(expense__id=expense_id, status="Pending",
-                                           balance_outstanding__gt=0).exists():
-            expense_obj = Expense.objects.get(id=expense_id)
-            expense_obj.status = "Paid"
-            expense_obj.save()
-    return True
+    if expenses is not None:
+        return recompute_expense_statuses(expenses)
+
+    flipped = 0
+    for _ in range(app_constants.EXPENSE_STATUS_MAX_BATCHES_PER_RUN):
+        expense_ids = status_queue.pop()
+        if not expense_ids:
+            break
+        try:
+            flipped += recompute_expense_statuses(expense_ids)
+        except Exception:
+            status_queue.enqueue(expense_ids)
+            raise
+    return flipped
 
 
 def get_payment_data(payment_uid):
-    settlement = Settlement.objects.filter(payment_id=payment_uid).first()
+    settlement = Settlement.objects.select_related('expense_split__expense', 'expense_split__expense_user').filter(
+        payment_id=payment_uid).first()
     if not settlement:
         raise Exception("Invalid payment link")
 
@@ -0,0 +1,255 @@
+import csv
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from expenses import ledger
+from expenses.common import constants as app_constants, messages as app_messages
+from expenses.models import Expense, ExpenseSplit, GroupMember
+from expenses.serializers import ExpenseSerializer
+from users import activity
+from users.friendships import load_friend_ids
+from users.models import User
+
+logger = logging.getLogger("expenses")
+
+CSV_FORMAT = "csv"
+JSONL_FORMAT = "jsonl"
+IMPORT_FORMATS = (CSV_FORMAT, JSONL_FORMAT)
+
+
+class ExpenseImporter:
+    """
+    Streams expenses from CSV or JSONL & writes them in chunked bulk transactions.
+
+    JSONL : one expense per line
+        {"name": "Cab", "balance_amt": "300", "expense_by": 1, "group": 2, "split_type": "Equal",
+         "splits": [{"expense_user": 1}, {"expense_user": 3, "split_value": "100"}]}
+    CSV : header name,balance_amt,expense_by,group,split_type,splits where splits is
+        `user_id[:split_value]` joined by `|`, e.g. `1|3|4` or `1:50|3:50`
+
+    The payer's split is marked Paid, every other split Pending. Friendships & group memberships are
+    validated against sets loaded once per payer/group & kept in an LRU of `lookup_cache_size` entries. Invalid rows
+    are reported through `on_error` & skipped; they never abort the file. A stream that can't be decoded stops the
+    import where it breaks, as one more reported failure. No notifications are sent for imported expenses.
+    """
+
+    def __init__(self, chunk_size: int = app_constants.IMPORT_CHUNK_SIZE, on_error=None, default_expense_by: int = None,
+                 lookup_cache_size: int = app_constants.IMPORT_LOOKUP_CACHE_SIZE):
+        self.chunk_size = chunk_size
+        self.lookup_cache_size = lookup_cache_size
+        self.on_error = on_error
+        self.default_expense_by = default_expense_by
+        self.imported = 0
+        self.failed = 0
+        self._friends = OrderedDict()
+        self._groups = OrderedDict()
+        self._split_rules = ExpenseSerializer()
+
+    def run(self, lines, fmt: str) -> dict:
+        chunk = []
+        rows = self._parse(lines, fmt)
+        row_number = 0
+        while True:
+            try:
+                row_number, row = next(rows)
+            except StopIteration:
+                break
+            except (csv.Error, UnicodeDecodeError) as e:
+                # the stream itself can't be read past this point; keep what was imported so far
+                self._fail(row_number + 1, f"Unreadable file : {str(e)}")
+                break
+
+            try:
+                chunk.append((row_number, self._build(row)))
+            except serializers.ValidationError as ve:
+                self._fail(row_number, ve.detail)
+            except (KeyError, ValueError, TypeError, AttributeError, InvalidOperation) as e:
+                self._fail(row_number, f"Malformed row : {str(e)}")
+
+            if len(chunk) >= self.chunk_size:
+                self._write(chunk)
+                chunk = []
+
+        if chunk:
+            self._write(chunk)
+
+        return {"imported": self.imported, "failed": self.failed}
+
+    def _parse(self, lines, fmt):
+        if fmt == CSV_FORMAT:
+            for row_number, row in enumerate(csv.DictReader(lines), start=2):
+                yield row_number, self._from_csv(row)
+        elif fmt == JSONL_FORMAT:
+            for row_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self._fail(row_number, f"Invalid JSON : {str(e)}")
+                    continue
+                if not isinstance(row, dict):
+                    self._fail(row_number, "Invalid JSON : each line must be an object")
+                    continue
+                yield row_number, row
+        else:
+            raise ValueError(app_messages.INVALID_IMPORT_FORMAT)
+
+    def _from_csv(self, row):
+        splits = []
+        for part in (row.get("splits") or "").split("|"):
+            if not part.strip():
+                continue
+            user_id, _, split_value = part.partition(":")
+            splits.append({"expense_user": user_id.strip(), "split_value": split_value.strip() or None})
+        return {
+            "name": row.get("name"),
+            "balance_amt": row.get("balance_amt"),
+            "expense_by": row.get("expense_by"),
+            "group": row.get("group"),
+            "split_type": row.get("split_type"),
+            "splits": splits,
+        }
+
+    def _build(self, row):
+        """
+        Validate a parsed row with the same rules as ExpenseSerializer & return unsaved (expense, splits)
+        """
+        expense_by = int(row.get("expense_by") or self.default_expense_by)
+        group_id = int(row["group"]) if row.get("group") else None
+        split_type = row.get("split_type") or app_constants.SplitType.EQUAL.value
+        if split_type not in dict(app_constants.SPLIT_CHOICES):
+            raise serializers.ValidationError(f"Invalid split type {split_type}")
+        balance_amt = self._split_rules._decimalize(row["balance_amt"])
+
+        split_breakup = [
+            {
+                "expense_user": int(split["expense_user"]),
+                "split_type": split_type,
+                "split_value": split.get("split_value"),
+                "status": app_constants.SplitExpenseStatus.PAID.value if int(split["expense_user"]) == expense_by
+                else app_constants.SplitExpenseStatus.PENDING.value,
+            } for split in row.get("splits") or []
+        ]
+        members = {split["expense_user"] for split in split_breakup}
+
+        if group_id:
+            if not members <= self._group_member_ids(group_id):
+                raise serializers.ValidationError("can't add group_expense with members not in group.")
+        elif not members - {expense_by} <= self._friend_ids(expense_by):
+            raise serializers.ValidationError("Must be friends to add expense")
+
+        self._split_rules._validate_split_type_consistency(split_breakup)
+        self._split_rules._validate_payment_breakup(split_breakup, expense_by)
+        self._split_rules._normalize_or_validate_split_values(split_breakup, balance_amt)
+
+        expense = Expense(name=row.get("name") or "user_expense", balance_amt=balance_amt,
+                          expense_by_id=expense_by, group_id=group_id)
+        splits = []
+        for split in split_breakup:
+            amount = self._split_rules._calculate_split_amount(
+                split_type, self._split_rules._decimalize(split["split_value"]), balance_amt
+            )
+            balance_outstanding = Decimal('0.00') if split["status"] == app_constants.SplitExpenseStatus.PAID.value \
+                else amount
+            splits.append(ExpenseSplit(
+                expense_user_id=split["expense_user"],
+                split_type=split_type,
+                amount=amount,
+                balance_outstanding=balance_outstanding,
+                status=split["status"],
+                settled=balance_outstanding == 0,
+            ))
+        return expense, splits
+
+    def _friend_ids(self, user_id):
+        friend_ids = self._lookup(self._friends, user_id, self._load_friend_ids)
+        if friend_ids is None:
+            raise serializers.ValidationError(f"User {user_id} does not exist")
+        return friend_ids
+
+    def _load_friend_ids(self, user_id):
+        friend_ids = load_friend_ids(user_id)
+        if not friend_ids and not User.objects.filter(id=user_id).exists():
+            return None
+        return friend_ids
+
+    def _group_member_ids(self, group_id):
+        return self._lookup(self._groups, group_id, lambda key: set(
+            GroupMember.objects.filter(group_id=key).values_list("member_id", flat=True)
+        ))
+
+    def _lookup(self, entries, key, load):
+        if key in entries:
+            entries.move_to_end(key)
+            return entries[key]
+        value = entries[key] = load(key)
+        if len(entries) > self.lookup_cache_size:
+            entries.popitem(last=False)
+        return value
+
+    def _write(self, chunk):
+        try:
+            with transaction.atomic():
+                expenses = [expense for _, (expense, _) in chunk]
+                self._insert_expenses(expenses)
+
+                splits = []
+                for _, (expense, expense_splits) in chunk:
+                    for split in expense_splits:
+                        split.expense = expense
+                        splits.append(split)
+                ExpenseSplit.objects.bulk_create(splits, batch_size=self.chunk_size)
+
+                ledger.apply_deltas(ledger.split_deltas(
+                    {
+                        "lender_id": split.expense.expense_by_id,
+                        "borrower_id": split.expense_user_id,
+                        "group_id": split.expense.group_id,
+                        "amount": split.balance_outstanding,
+                    } for split in splits
+                ))
+
+                payers = User.objects.only('id', 'username').in_bulk({expense.expense_by_id for expense in expenses})
+                activity.record([
+                    event
+                    for expense, expense_splits in (entry for _, entry in chunk)
+                    for event in activity.expense_added(
+                        expense.id, expense.name, expense.balance_amt, expense.group_id,
+                        payers[expense.expense_by_id], [split.expense_user_id for split in expense_splits]
+                    )
+                ])
+            self.imported += len(chunk)
+        except Exception as e:
+            logger.error(f"IMPORTER - WRITE CHUNK : ERROR {str(e)}")
+            for row_number, _ in chunk:
+                self._fail(row_number, f"Write failed : {str(e)}")
+
+    def _insert_expenses(self, expenses):
+        """
+        Bulk insert a chunk & set its ids. Where the database can't return them (MySQL), they are read back by the
+        chunk's import_batch : auto increment ids follow insert order, so ordering by id lines them up.
+        """
+        batch = uuid.uuid4()
+        for expense in expenses:
+            expense.import_batch = batch
+        Expense.objects.bulk_create(expenses, batch_size=self.chunk_size)
+        if connection.features.can_return_rows_from_bulk_insert:
+            return
+
+        ids = list(Expense.objects.filter(import_batch=batch).order_by('id').values_list('id', flat=True))
+        if len(ids) != len(expenses):
+            raise RuntimeError(f"Inserted {len(expenses)} expenses, read back {len(ids)}")
+        for expense, expense_id in zip(expenses, ids):
+            expense.id = expense_id
+
+    def _fail(self, row_number, errors):
+        self.failed += 1
+        if self.on_error:
+            self.on_error(row_number, errors)
@@ -0,0 +1,194 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.db.models import Q, Sum, F
+
+from . import summary_cache
+from .models import Balance, ExpenseSplit
+
+logger = logging.getLogger("expenses")
+
+ZERO = Decimal('0.00')
+# apply_deltas retries when a concurrent writer inserted a missing balance row first
+BALANCE_WRITE_ATTEMPTS = 3
+
+
+def split_deltas(splits) -> dict:
+    """
+    Helper to turn split rows into ledger deltas keyed by (lender_id, borrower_id, group_id).
+    Each row must expose `lender_id`, `borrower_id`, `group_id` & `amount`.
+    Self splits (lender == borrower) never create a debt & are skipped.
+    """
+    deltas = defaultdict(Decimal)
+    for row in splits:
+        if row["lender_id"] is None or row["borrower_id"] is None or row["lender_id"] == row["borrower_id"]:
+            continue
+        deltas[(row["lender_id"], row["borrower_id"], row["group_id"])] += row["amount"]
+    return deltas
+
+
+def apply_deltas(deltas: dict) -> None:
+    """
+    Helper to add `deltas` onto the balance ledger.
+    Must be called inside the transaction that changes the underlying ExpenseSplit rows.
+    Cached summaries of the affected groups & users are invalidated once it commits.
+    """
+    deltas = {key: amount for key, amount in deltas.items() if amount}
+    if not deltas:
+        return
+
+    lender_ids = {key[0] for key in deltas}
+    borrower_ids = {key[1] for key in deltas}
+    group_ids = {key[2] for key in deltas if key[2] is not None}
+    for attempt in range(BALANCE_WRITE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                _write_deltas(deltas, lender_ids, borrower_ids, group_ids)
+            break
+        except IntegrityError:
+            # a concurrent writer inserted a missing row first (the unique key made us wait for its commit) :
+            # the next attempt locks & updates that row instead
+            if attempt == BALANCE_WRITE_ATTEMPTS - 1:
+                raise
+            logger.info("LEDGER - APPLY DELTAS : balance row created concurrently, retrying")
+
+    summary_cache.bump_versions(group_ids=group_ids, user_ids=lender_ids | borrower_ids)
+
+
+def _write_deltas(deltas, lender_ids, borrower_ids, group_ids) -> None:
+    group_keys = {key[2] or 0 for key in deltas}
+    # lock existing rows in a fixed order so concurrent writers can't deadlock
+    existing = {
+        (row.lender_id, row.borrower_id, row.group_id): row
+        for row in _locked_balances(lender_ids, borrower_ids, group_keys)
+    }
+
+    now = timezone.now()
+    to_update, to_create = [], []
+    for key in sorted(deltas, key=lambda k: (k[0], k[1], k[2] or 0)):
+        row = existing.get(key)
+        if row:
+            row.amount += deltas[key]
+            row.updated_on = now
+            to_update.append(row)
+        else:
+            to_create.append(Balance.for_key(key, deltas[key]))
+
+    if to_update:
+        Balance.objects.bulk_update(to_update, ['amount', 'updated_on'])
+    if to_create:
+        Balance.objects.bulk_create(to_create)
+
+
+def _locked_balances(lender_ids, borrower_ids, group_keys):
+    return Balance.objects.select_for_update().filter(
+        lender_id__in=lender_ids, borrower_id__in=borrower_ids, group_key__in=group_keys
+    ).order_by('id')
+
+
+def record_expense_splits(expense, splits: list) -> None:
+    """
+    Helper to add freshly created splits of `expense` to the ledger
+    """
+    apply_deltas(split_deltas(
+        {
+            "lender_id": expense.expense_by_id,
+            "borrower_id": split.expense_user_id,
+            "group_id": expense.group_id,
+            "amount": split.balance_outstanding,
+        } for split in splits
+    ))
+
+
+def record_settlement(payments) -> None:
+    """
+    Helper to reduce ledger balances by settled split payments, rows of `lender_id`, `borrower_id`, `group_id` &
+    the `amount` actually applied to the split
+    """
+    apply_deltas(split_deltas({**payment, "amount": -payment["amount"]} for payment in payments))
+
+
+def fetch_balance(lender_id=None, borrower_id=None, group_id=None) -> Decimal:
+    """
+    Helper to read an outstanding total from the ledger
+    """
+    balances = Balance.objects.filter(amount__gt=0)
+    if lender_id is not None:
+        balances = balances.filter(lender_id=lender_id)
+    if borrower_id is not None:
+        balances = balances.filter(borrower_id=borrower_id)
+    if group_id is not None:
+        balances = balances.filter(group_id=group_id)
+    return balances.aggregate(total=Sum('amount')).get("total") or ZERO
+
+
+def fetch_group_balances(user_id, group_ids) -> dict:
+    """
+    Helper to read owed & borrowed totals of a user for many groups in one grouped query.
+    Returns {group_id: (owed, borrowed)}; groups without outstanding balances are omitted.
+    """
+    rows = Balance.objects.filter(
+        group_id__in=group_ids, amount__gt=0
+    ).filter(
+        Q(lender_id=user_id) | Q(borrower_id=user_id)
+    ).values('group_id').annotate(
+        owed=Sum('amount', filter=Q(lender_id=user_id)),
+        borrowed=Sum('amount', filter=Q(borrower_id=user_id)),
+    ).order_by()
+
+    return {row['group_id']: (row['owed'] or ZERO, row['borrowed'] or ZERO) for row in rows}
+
+
+def expected_balances() -> dict:
+    """
+    Helper to compute ledger rows from scratch by aggregating ExpenseSplit
+    """
+    rows = ExpenseSplit.objects.filter(
+        expense_user__isnull=False,
+        expense__expense_by__isnull=False,
+    ).exclude(
+        Q(expense_user=F('expense__expense_by')) | Q(balance_outstanding=0)
+    ).values(
+        'expense__expense_by', 'expense_user', 'expense__group'
+    ).annotate(total=Sum('balance_outstanding'))
+
+    return {
+        (row['expense__expense_by'], row['expense_user'], row['expense__group']): row['total']
+        for row in rows if row['total']
+    }
+
+
+def find_drift() -> list:
+    """
+    Consistency check : list of (key, ledger_amount, expected_amount) where the ledger disagrees with ExpenseSplit
+    """
+    expected = expected_balances()
+    actual = defaultdict(Decimal)
+    for row in Balance.objects.values('lender_id', 'borrower_id', 'group_id', 'amount'):
+        actual[(row['lender_id'], row['borrower_id'], row['group_id'])] += row['amount']
+
+    drift = []
+    for key in set(expected) | set(actual):
+        ledger_amount = actual.get(key, ZERO)
+        expected_amount = expected.get(key, ZERO)
+        if ledger_amount != expected_amount:
+            drift.append((key, ledger_amount, expected_amount))
+    return drift
+
+
+def rebuild_balances(batch_size: int = 1000) -> int:
+    """
+    Helper to rebuild the whole ledger from ExpenseSplit. Returns number of ledger rows written.
+    """
+    with transaction.atomic():
+        expected = expected_balances()
+        Balance.objects.all().delete()
+        Balance.objects.bulk_create(
+            [Balance.for_key(key, amount) for key, amount in expected.items()],
+            batch_size=batch_size
+        )
+    logger.info(f"LEDGER - REBUILD BALANCES : {len(expected)} rows written")
+    return len(expected)
@@ -0,0 +1,305 @@
+import json
+import statistics
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime
+from unittest import mock
+
+import django
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver
+from rest_framework.test import APIClient
+
+import expenses.urls
+import users.urls
+from expenses import utils
+from expenses.common import constants as app_constants
+from expenses.models import Balance, Expense, ExpenseSplit, GroupMember, Settlement
+from splitwise_app.utils.throttle_utils import RedisRateThrottle
+from users.friendships import load_friend_ids
+from users.models import User
+from users.tokens import RefreshToken
+
+ASYNC = "async"
+
+
+class Command(BaseCommand):
+    help = ("Benchmark every endpoint of expenses/urls.py & users/urls.py in-process against a dataset from "
+            "generate_dataset. Records latency percentiles & SQL query counts per endpoint & exports JSON that "
+            "--compare can diff against a run of another commit. Writes run in rolled back transactions & "
+            "throttling is disabled while benchmarking.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default=app_constants.SYNTHETIC_PREFIX)
+        parser.add_argument('--iterations', type=int, default=30, help="Measured requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=3, help="Unmeasured requests per endpoint first.")
+        parser.add_argument('--only', help="Run endpoints whose name contains this.")
+        parser.add_argument('--output', help="Write results to this JSON file.")
+        parser.add_argument('--compare', help="JSON results of an earlier run to diff against.")
+        parser.add_argument('--max-regression', type=float,
+                            help="With --compare, fail if any p50 grows by more than this %% or any query count grows.")
+
+    def handle(self, *args, **options):
+        context = self._context(options['prefix'])
+        endpoints = self._endpoints(context)
+        missing = self._routes() - {(endpoint["route"], endpoint["method"]) for endpoint in endpoints}
+        for route, method in sorted(missing):
+            self.stdout.write(self.style.WARNING(f"Not benchmarked : {method} {route}"))
+        if options['only']:
+            endpoints = [endpoint for endpoint in endpoints if options['only'] in endpoint["name"]]
+
+        results = {}
+        # the benchmark measures the views, not the rate limits; no mail leaves the process either
+        with mock.patch.object(RedisRateThrottle, "allow_request", return_value=True), \
+                override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+            for endpoint in endpoints:
+                results[endpoint["name"]] = self._run(endpoint, context["access"], options['iterations'],
+                                                      options['warmup'])
+                self._print(endpoint["name"], results[endpoint["name"]])
+
+        report = {"meta": self._meta(context, options), "endpoints": results}
+        if options['output']:
+            with open(options['output'], "w") as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        if options['compare']:
+            self._compare(results, options['compare'], options['max_regression'])
+
+    def _context(self, prefix):
+        user = User.objects.filter(email=f"{prefix}0@split-x.test").first()
+        if not user:
+            raise CommandError(f"No '{prefix}' dataset found, run generate_dataset first")
+        friend = User.objects.filter(id__in=load_friend_ids(user.id)).order_by('id').first()
+        group_id = GroupMember.objects.filter(member=user).order_by('group_id').values_list(
+            'group_id', flat=True).first()
+        owed_split = ExpenseSplit.objects.filter(expense_user=user, balance_outstanding__gt=0).exclude(
+            expense__expense_by=user).select_related('expense').order_by('id').first()
+        pending = Settlement.objects.filter(
+            status='Pending', expense_split__expense_user__isnull=False
+        ).select_related('expense_split').order_by('id').first()
+        borrower_id = Balance.objects.filter(lender=user, amount__gt=0).order_by('borrower_id').values_list(
+            'borrower_id', flat=True).first()
+        if not (friend and group_id and owed_split and pending and borrower_id):
+            raise CommandError("The dataset is too small to exercise every endpoint, generate a larger one")
+        return {
+            "user": user,
+            "friend": friend,
+            "group_id": group_id,
+            "expense": Expense.objects.filter(group_id=group_id).order_by('id').first(),
+            "owed_split": owed_split,
+            "pending": pending,
+            "borrower_id": borrower_id,
+            "access": str(RefreshToken.for_user(user).access_token),
+        }
+
+    def _endpoints(self, context):
+        """
+        One entry per (route, method). `data` may be a callable of the iteration number, `auth` a callable
+        returning (access token, data) for endpoints that consume their token.
+        """
+        user, friend, expense = context["user"], context["friend"], context["expense"]
+        group_id, owed_split, pending = context["group_id"], context["owed_split"], context["pending"]
+        members = list(GroupMember.objects.filter(group_id=group_id).values_list('member_id', flat=True))
+
+        def endpoint(route, method, path, data=None, auth=True, fmt="json"):
+            return {"name": f"{method} {route}", "route": route, "method": method, "path": path, "data": data,
+                    "auth": auth, "format": fmt}
+
+        def logout(_):
+            refresh = RefreshToken.for_user(user)
+            return str(refresh.access_token), {"refresh": str(refresh)}
+
+        def expense_payload(_):
+            return {
+                "name": "benchmark", "balance_amt": "90.00", "expense_by": user.id, "group": group_id,
+                "split_breakup": [{"expense_user": member_id, "split_type": "Equal", "split_value": None,
+                                   "status": "Paid" if member_id == user.id else "Pending"}
+                                  for member_id in members]
+            }
+
+        def import_payload(n):
+            rows = f"name,balance_amt,expense_by,group,split_type,splits\nimported {n},30,{user.id},{group_id}," \
+                   f"Equal,{'|'.join(str(member_id) for member_id in members)}\n"
+            return {"file": SimpleUploadedFile("expenses.csv", rows.encode()), "format": "csv"}
+
+        refresh = str(RefreshToken.for_user(user))
+        payment_token = utils.generate_payment_token(
+            pending.payment_id, pending.expense_split.expense_user_id, pending.expense_split.expense_id, pending.amount)
+        password = app_constants.SYNTHETIC_PASSWORD
+        return [
+            endpoint("user-list", "GET", "/users/"),
+            endpoint("user-list", "POST", "/users/", auth=False, data=lambda n: {
+                "username": f"signup{n}", "email": f"benchmark-signup{n}@split-x.test", "password": "pass123"}),
+            endpoint("user-detail", "GET", f"/users/{friend.id}/"),
+            endpoint("user-detail", "PUT", f"/users/{user.id}/", data={"first_name": "Bench"}),
+            endpoint("user-detail", "PATCH", f"/users/{user.id}/", data={"first_name": "Bench"}),
+            endpoint("user-me", "GET", "/users/me/"),
+            endpoint("user-me", "PUT", "/users/me/", data={"first_name": "Bench"}),
+            endpoint("user-login", "POST", "/users/login/", auth=False,
+                     data={"email": user.email, "password": password}),
+            endpoint("user-refresh-token", "POST", "/users/refresh-token/", auth=False, data={"refresh": refresh}),
+            endpoint("user-logout", "POST", "/users/logout/", auth=logout),
+            endpoint("user-change-password", "POST", "/users/change_password/", data={
+                "old_password": password, "new_password": password, "confirm_new_password": password}),
+            endpoint("user-invite", "POST", "/users/invite/", data={"email": "benchmark-invite@split-x.test"}),
+            endpoint("user-activity", "GET", "/users/activity/"),
+            endpoint("user-forget-password", "POST", "/users/forget_password/", auth=False, data={}),
+            endpoint("user-reset-password", "POST", "/users/reset_password/", auth=False, data={}),
+            endpoint("user-validate-account", "POST", "/users/validate_account/", auth=False, data={}),
+            endpoint("user-resend-validation", "POST", "/users/resend_validation/", auth=False, data={}),
+            endpoint("friend-list", "GET", "/friend/"),
+            endpoint("friend-list", "POST", "/friend/", data=lambda n: {
+                "email": f"benchmark-friend{n}@split-x.test", "username": f"benchmark-friend{n}"}),
+            endpoint("friend-detail", "GET", f"/friend/{friend.username}/"),
+            endpoint("friend-detail", "DELETE", f"/friend/{friend.username}/"),
+            endpoint("groups-list", "GET", "/expense-app/groups/"),
+            endpoint("groups-list", "POST", "/expense-app/groups/", data={
+                "group_name": "benchmark", "description": "benchmark", "member": [friend.id]}),
+            endpoint("groups-detail", "GET", f"/expense-app/groups/{group_id}/"),
+            endpoint("groups-detail", "PUT", f"/expense-app/groups/{group_id}/",
+                     data={"group_name": "benchmark", "description": "benchmark"}),
+            endpoint("groups-detail", "PATCH", f"/expense-app/groups/{group_id}/", data={"description": "benchmark"}),
+            endpoint("groups-expense-list", "GET", f"/expense-app/groups/{group_id}/expense-list/"),
+            endpoint("groups-settle-up", "GET", f"/expense-app/groups/{group_id}/settle-up/"),
+            endpoint("expenses-list", "GET", "/expense-app/expense/"),
+            endpoint("expenses-list", "POST", "/expense-app/expense/", data=expense_payload),
+            endpoint("expenses-import-expenses", "POST", "/expense-app/expense/import/", data=import_payload,
+                     fmt="multipart"),
+            endpoint("expenses-detail", "GET", f"/expense-app/expense/{expense.id}/"),
+            endpoint("expenses-search", "GET",
+                     f"/expense-app/expense/search/?q=expense&status=Pending&counterparty={friend.id}"),
+            endpoint("expenses-user-expense-settlements", "GET",
+                     f"/expense-app/expense/{user.id}/expense-settlement/{owed_split.expense_id}/"),
+            endpoint("payments-simulate-settle-expenses", "POST", "/expense-app/payment/settle/", data={
+                "payment_id": pending.payment_id, "status": "Settled", "mode": "online",
+                "user_id": pending.expense_split.expense_user_id}),
+            endpoint("reminders-notify", "POST", "/expense-app/reminder/notify/",
+                     data={"user_id": context["borrower_id"]}),
+            endpoint("generate-payment-link", "POST", "/expense-app/get-payment-link/", data={
+                "expense_id": owed_split.expense_id, "amount": "0.01", "user_id": user.id}),
+            endpoint("payment-summary", "GET", f"/expense-app/payment-summary/{payment_token}"),
+            endpoint("async-group-summary", "GET", f"/expense-app/async/groups/{group_id}/summary/"),
+            endpoint("async-expense-detail", "GET", f"/expense-app/async/expense/{expense.id}/"),
+            endpoint("async-user-balances", "GET", "/expense-app/async/balances/"),
+        ]
+
+    def _routes(self) -> set:
+        """
+        (url name, method) of every endpoint the two urlconfs expose, to report what the suite doesn't cover
+        """
+        routes = set()
+
+        def walk(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    walk(pattern.url_patterns)
+                elif isinstance(pattern, URLPattern) and pattern.name and pattern.name != "api-root":
+                    callback = pattern.callback
+                    if getattr(callback, "actions", None):
+                        methods = callback.actions
+                    elif getattr(callback, "cls", None):
+                        methods = [m for m in callback.cls.http_method_names
+                                   if m not in ("options", "head") and hasattr(callback.cls, m)]
+                    else:
+                        methods = ["get"]
+                    routes.update((pattern.name, method.upper()) for method in methods)
+
+        walk(users.urls.urlpatterns)
+        walk(expenses.urls.urlpatterns)
+        return routes
+
+    def _run(self, endpoint, access, iterations, warmup):
+        client = APIClient()
+        latencies, queries, statuses = [], [], Counter()
+        is_async = endpoint["route"].startswith(ASYNC)
+        for n in range(warmup + iterations):
+            data = endpoint["data"](n) if callable(endpoint["data"]) else endpoint["data"]
+            if callable(endpoint["auth"]):
+                token, data = endpoint["auth"](n)
+            else:
+                token = access if endpoint["auth"] else None
+            client.credentials(**({"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}))
+
+            request = getattr(client, endpoint["method"].lower())
+            # the query log is a bounded deque; once full, CaptureQueriesContext can't tell new entries apart
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if endpoint["method"] == "GET":
+                    response = request(endpoint["path"])
+                else:
+                    # writes are measured, then rolled back so every iteration sees the same data
+                    with transaction.atomic():
+                        response = request(endpoint["path"], data, format=endpoint["format"])
+                        transaction.set_rollback(True)
+                elapsed = (time.perf_counter() - started) * 1000
+
+            if n >= warmup:
+                latencies.append(elapsed)
+                # async views query from worker threads, on connections this one can't observe
+                queries.append(None if is_async else len(captured.captured_queries))
+                statuses[response.status_code] += 1
+
+        latencies.sort()
+        counted = sorted(count for count in queries if count is not None)
+        return {
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p90_ms": round(latencies[int(len(latencies) * 0.9) - 1] if len(latencies) > 1 else latencies[0], 2),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] if len(latencies) > 1 else latencies[0], 2),
+            "mean_ms": round(statistics.mean(latencies), 2),
+            "max_ms": round(latencies[-1], 2),
+            "queries": statistics.median_low(counted) if counted else None,
+            "max_queries": counted[-1] if counted else None,
+            "status": {str(code): count for code, count in statuses.items()},
+        }
+
+    def _print(self, name, result):
+        queries = "-" if result["queries"] is None else f"{result['queries']}/{result['max_queries']}"
+        statuses = ",".join(sorted(result["status"]))
+        self.stdout.write(f"{name:<52} p50={result['p50_ms']:>8.2f} p90={result['p90_ms']:>8.2f} "
+                          f"p99={result['p99_ms']:>8.2f}ms queries={queries:<7} status={statuses}")
+
+    def _meta(self, context, options):
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                    check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "prefix": options['prefix'],
+            "iterations": options['iterations'],
+            "warmup": options['warmup'],
+            "dataset": {
+                "users": User.objects.filter(email__startswith=options['prefix']).count(),
+                "expenses": Expense.objects.filter(name__startswith=f"{options['prefix']} expense ").count(),
+            },
+        }
+
+    def _compare(self, results, path, max_regression):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        self.stdout.write(f"\nCompared with {path} (commit {baseline['meta'].get('commit')})")
+        regressions = []
+        for name, result in results.items():
+            before = baseline["endpoints"].get(name)
+            if not before:
+                self.stdout.write(f"{name:<52} new")
+                continue
+            change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+            query_change = None
+            if result["queries"] is not None and before["queries"] is not None:
+                query_change = result["queries"] - before["queries"]
+            self.stdout.write(f"{name:<52} p50 {before['p50_ms']:>8.2f} -> {result['p50_ms']:>8.2f}ms "
+                              f"({change:+.1f}%) queries {before['queries']} -> {result['queries']}")
+            if max_regression is not None and (change > max_regression or (query_change or 0) > 0):
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f"Regressed beyond {max_regression}% or in query count : {', '.join(regressions)}")
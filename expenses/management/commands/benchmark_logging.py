@@ -0,0 +1,91 @@
+import copy
+import logging
+import logging.config
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.log import configure_logging
+
+from splitwise_app.utils.logging_utils import QueueListenerHandler, queue_logging_config
+
+MODES = ("sync", "queue")
+
+
+class Command(BaseCommand):
+    help = ("Measure the logging overhead a request pays in the default (sync FileHandler) & LOG_MODE=queue "
+            "configurations. Each simulated request logs --records lines, the way the views log an API call & "
+            "its outcome. Files are written to a temporary directory & settings.LOGGING is restored afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help="Simulated requests per mode.")
+        parser.add_argument('--records', type=int, default=4, help="Log records per request.")
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent request threads.")
+        parser.add_argument('--console', action='store_true', help="Keep the console handlers as well.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<6} {'p50 us':>8} {'p99 us':>8} {'max us':>9} {'wall s':>7} {'drain s':>8} "
+                          f"{'lines':>7}")
+        try:
+            for mode in MODES:
+                with tempfile.TemporaryDirectory() as directory:
+                    result = self._run(mode, directory, options)
+                self.stdout.write(
+                    f"{mode:<6} {result['p50']:>8.1f} {result['p99']:>8.1f} {result['max']:>9.1f} "
+                    f"{result['wall']:>7.2f} {result['drain']:>8.3f} {result['lines']:>7}"
+                )
+        finally:
+            configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+
+    def _config(self, mode, directory, console):
+        config = copy.deepcopy(settings.LOGGING)
+        for handler in config["handlers"].values():
+            if handler.get("filename"):
+                handler["filename"] = os.path.join(directory, os.path.basename(handler["filename"]))
+        if not console:
+            for logger in config["loggers"].values():
+                logger["handlers"] = [name for name in logger["handlers"] if name != "console"]
+        if mode == "queue":
+            config = queue_logging_config(config, directory=directory, console=console)
+        return config
+
+    def _run(self, mode, directory, options):
+        logging.config.dictConfig(self._config(mode, directory, options['console']))
+        logger = logging.getLogger("expenses")
+        records = options['records']
+
+        def request(n):
+            started = time.perf_counter()
+            for record in range(records):
+                logger.info(f"API VIEW - EXPENSE LIST : REQUEST {n} RECORD %s", record)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            timings = sorted(pool.map(request, range(options['requests'])))
+        wall = time.perf_counter() - started
+
+        # the time the listener still needs to get everything on disk once the requests have returned
+        started = time.perf_counter()
+        for handler in logger.handlers:
+            if isinstance(handler, QueueListenerHandler):
+                handler.stop()
+            handler.flush()
+        drain = time.perf_counter() - started
+
+        lines = 0
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name)) as log_file:
+                lines += sum(1 for _ in log_file)
+        return {
+            "p50": statistics.median(timings) * 1e6,
+            "p99": timings[int(len(timings) * 0.99) - 1] * 1e6,
+            "max": timings[-1] * 1e6,
+            "wall": wall,
+            "drain": drain,
+            "lines": lines,
+        }
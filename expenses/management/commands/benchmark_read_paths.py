@@ -0,0 +1,79 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Compare requests/sec of the read endpoints served by the WSGI & ASGI deployments. "
+            "Start both with the same number of workers, e.g. `gunicorn -w 4 splitwise_app.wsgi` & "
+            "`gunicorn -w 4 -k uvicorn.workers.UvicornWorker splitwise_app.asgi:application`.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default="http://localhost:8000")
+        parser.add_argument('--asgi-url', default="http://localhost:8001")
+        parser.add_argument('--token', required=True, help="JWT access token of a member of --group.")
+        parser.add_argument('--group', type=int, required=True)
+        parser.add_argument('--expense', type=int, required=True)
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint & server.")
+        parser.add_argument('--concurrency', type=int, default=32)
+
+    def handle(self, *args, **options):
+        group, expense = options['group'], options['expense']
+        async_paths = [
+            f"/expense-app/async/groups/{group}/summary/",
+            f"/expense-app/async/expense/{expense}/",
+            "/expense-app/async/balances/",
+        ]
+        sync_paths = [
+            f"/expense-app/groups/{group}/",
+            f"/expense-app/expense/{expense}/",
+        ]
+
+        runs = [("wsgi", options['wsgi_url'], path) for path in sync_paths + async_paths]
+        runs += [("asgi", options['asgi_url'], path) for path in async_paths]
+
+        self.stdout.write(f"{'server':<6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}  path")
+        throttled = False
+        for server, base_url, path in runs:
+            result = self._run(base_url + path, options)
+            throttled |= result["throttled"]
+            self.stdout.write(
+                f"{server:<6} {result['rps']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                f"{result['errors']:>7}  {path}"
+            )
+        if throttled:
+            self.stdout.write(self.style.WARNING("Some requests were throttled (429); raise the 'user' rate in "
+                                                 "REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] while benchmarking."))
+
+    def _run(self, url, options):
+        headers = {"Authorization": f"Bearer {options['token']}"}
+
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except urllib.error.URLError:
+                status = None
+            return status, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        return {
+            "rps": len(results) / elapsed,
+            "p50": statistics.median(latencies),
+            "p95": latencies[int(len(latencies) * 0.95) - 1],
+            "errors": len([status for status, _ in results if status != 200]),
+            "throttled": any(status == 429 for status, _ in results),
+        }
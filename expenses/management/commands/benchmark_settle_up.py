@@ -0,0 +1,78 @@
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses import simplification
+from expenses.models import Balance, Group
+from users.models import User
+
+BENCHMARK_PREFIX = "settle-bench-"
+
+
+class Command(BaseCommand):
+    help = ("Benchmark group settle up as the endpoint runs it : the group's Balance read plus debt simplification, "
+            "on synthetic ledger rows (written & rolled back) or on a real group with --group.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=1000)
+        parser.add_argument('--splits', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--budget', type=float, default=1.0, help="Fail if settle up exceeds this (seconds).")
+        parser.add_argument('--group', type=int, help="Time settle up of an existing group instead.")
+
+    def handle(self, *args, **options):
+        if options['group']:
+            self._run(options['group'], options['budget'])
+            return
+
+        with transaction.atomic():
+            group_id, rows = self._seed(options['members'], options['splits'], options['seed'])
+            self.stdout.write(f"members={options['members']} splits={options['splits']} ledger_rows={rows}")
+            try:
+                self._run(group_id, options['budget'])
+            finally:
+                # synthetic rows never outlive the benchmark
+                transaction.set_rollback(True)
+
+    def _seed(self, members, splits, seed) -> tuple:
+        """
+        A group whose Balance rows aggregate `splits` random splits between `members` users, the way the
+        ledger does. Returns (group id, ledger rows).
+        """
+        rng = random.Random(seed)
+        pairs = defaultdict(int)
+        for _ in range(splits):
+            lender, borrower = rng.randrange(members), rng.randrange(members)
+            if lender != borrower:
+                pairs[(lender, borrower)] += rng.randint(100, 500000)
+
+        group = Group.objects.create(group_name=f"{BENCHMARK_PREFIX}group")
+        User.objects.bulk_create([User(username=f"{BENCHMARK_PREFIX}{rank}") for rank in range(members)],
+                                 batch_size=5000)
+        user_ids = {
+            int(username[len(BENCHMARK_PREFIX):]): user_id
+            for user_id, username in User.objects.filter(username__startswith=BENCHMARK_PREFIX).values_list(
+                'id', 'username')
+        }
+        Balance.objects.bulk_create([
+            Balance.for_key((user_ids[lender], user_ids[borrower], group.id), Decimal(cents) / 100)
+            for (lender, borrower), cents in pairs.items()
+        ], batch_size=5000)
+        return group.id, len(pairs)
+
+    def _run(self, group_id, budget) -> None:
+        started = time.perf_counter()
+        positions = simplification.fetch_net_positions(group_id)
+        read = time.perf_counter() - started
+        transfers = simplification.simplify_debts(positions)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"transfers={len(transfers)} balance_read={read * 1000:.1f}ms "
+                          f"simplify={(elapsed - read) * 1000:.1f}ms elapsed={elapsed * 1000:.1f}ms")
+        if elapsed > budget:
+            raise CommandError(f"Settle up took {elapsed:.3f}s, budget is {budget:.3f}s")
+        self.stdout.write(self.style.SUCCESS("Within budget"))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.common import constants as app_constants
+from expenses.synthetic import DatasetGenerator
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Generate a seeded, skewed synthetic dataset (users, friendships, groups, expenses with Equal/Exact/"
+            "Percentage splits & settlements) in bulk. The same arguments always produce the same data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=200)
+        parser.add_argument('--group-size', type=int, default=8, help="Max members per group (min 3).")
+        parser.add_argument('--friends', type=int, default=5, help="Extra friendships per user, beyond groups.")
+        parser.add_argument('--expenses', type=int, default=20000)
+        parser.add_argument('--group-ratio', type=float, default=0.7, help="Share of expenses within a group.")
+        parser.add_argument('--settled-ratio', type=float, default=0.3, help="Share of open splits fully paid.")
+        parser.add_argument('--pending-ratio', type=float, default=0.05,
+                            help="Share of open splits left with a pending settlement.")
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help="Zipf exponent of user & group activity, 0 for uniform.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=app_constants.IMPORT_CHUNK_SIZE)
+        parser.add_argument('--prefix', default=app_constants.SYNTHETIC_PREFIX,
+                            help="Tag of the generated rows; users are <prefix><rank>@split-x.test.")
+        parser.add_argument('--clear', action='store_true', help="Remove a previous dataset with this prefix first.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 3:
+            raise CommandError("At least 3 users are needed")
+        generator = DatasetGenerator(prefix=options['prefix'], seed=options['seed'], skew=options['skew'],
+                                     batch_size=options['batch_size'], stdout=self.stdout)
+        if options['clear']:
+            generator.clear()
+        elif User.objects.filter(email__startswith=options['prefix']).exists():
+            raise CommandError(f"A dataset tagged '{options['prefix']}' exists, use --clear or another --prefix")
+
+        started = time.perf_counter()
+        result = generator.run(
+            users=options['users'], groups=options['groups'], group_size=options['group_size'],
+            friends=options['friends'], expenses=options['expenses'], group_ratio=options['group_ratio'],
+            settled_ratio=options['settled_ratio'], pending_ratio=options['pending_ratio']
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            " ".join(f"{key}={value}" for key, value in result.items()) + f" elapsed={elapsed:.1f}s"
+        ))
+        self.stdout.write(f"Log in as {options['prefix']}0@split-x.test / {app_constants.SYNTHETIC_PASSWORD} "
+                          f"(the most active user)")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.common import constants as app_constants
+from expenses.importer import ExpenseImporter, IMPORT_FORMATS
+
+
+class Command(BaseCommand):
+    help = "Stream-import expenses from a csv or jsonl file in chunked bulk transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=app_constants.IMPORT_CHUNK_SIZE)
+        parser.add_argument('--expense-by', type=int, help="Payer id for rows that don't specify expense_by.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in IMPORT_FORMATS:
+            raise CommandError(f"Unknown format {fmt}, use --format")
+
+        def on_error(row_number, detail):
+            self.stderr.write(f"row {row_number} : {detail}")
+
+        importer = ExpenseImporter(
+            chunk_size=options['chunk_size'],
+            on_error=on_error,
+            default_expense_by=options['expense_by']
+        )
+        with open(options['path'], newline='', encoding='utf-8') as source:
+            summary = importer.run(source, fmt)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['imported']} expenses, {summary['failed']} rows failed"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import ledger
+
+
+class Command(BaseCommand):
+    help = "Rebuild the (lender, borrower, group) balance ledger from ExpenseSplit, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare the ledger against ExpenseSplit & exit non-zero on drift.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = ledger.find_drift()
+            for (lender_id, borrower_id, group_id), ledger_amount, expected_amount in drift:
+                self.stdout.write(
+                    f"lender={lender_id} borrower={borrower_id} group={group_id} : "
+                    f"ledger={ledger_amount} expected={expected_amount}"
+                )
+            if drift:
+                raise CommandError(f"Balance ledger out of sync for {len(drift)} row(s)")
+            self.stdout.write(self.style.SUCCESS("Balance ledger is consistent"))
+            return
+
+        rows = ledger.rebuild_balances(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Balance ledger rebuilt : {rows} rows"))
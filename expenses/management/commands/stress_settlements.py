@@ -0,0 +1,91 @@
+import multiprocessing
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from expenses import helpers, ledger
+from expenses.models import Balance, Expense, ExpenseSplit, Settlement
+from users.models import User
+
+
+def _settle(args):
+    expense_id, user_id, payment_id, amount = args
+    started = time.perf_counter()
+    success, message = helpers.settle_expenses([expense_id], user_id, payment_id, amount, "Settled")
+    return success, message, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ("Fire concurrent payment callbacks at a single split from several processes & verify the resulting "
+            "balances. Run against MySQL (sqlite serializes writers and isn't a meaningful contention test). "
+            "Creates & removes its own users & expense.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--payments', type=int, default=200)
+        parser.add_argument('--duplicates', type=int, default=2,
+                            help="Times each payment callback is delivered (retries must not double count).")
+        parser.add_argument('--amount', default="1.00", help="Amount of each payment.")
+
+    def handle(self, *args, **options):
+        amount = Decimal(options['amount'])
+        payments = options['payments']
+        split_amount = amount * payments
+
+        lender = User.objects.create_user(email="stress-lender@split-x.test", password=None,
+                                          username="stress-lender")
+        borrower = User.objects.create_user(email="stress-borrower@split-x.test", password=None,
+                                            username="stress-borrower")
+        try:
+            expense = Expense.objects.create(name="settlement stress", balance_amt=split_amount, expense_by=lender)
+            split = ExpenseSplit.objects.create(expense=expense, expense_user=borrower, amount=split_amount,
+                                                balance_outstanding=split_amount)
+            ledger.record_expense_splits(expense, [split])
+            payment_ids = []
+            for _ in range(payments):
+                payment_ids.append(helpers.create_pending_settlement({"expense_split": split, "amount": amount}))
+
+            jobs = [(expense.id, borrower.id, payment_id, amount)
+                    for payment_id in payment_ids for _ in range(options['duplicates'])]
+            # forked workers must not share this process' database connection
+            connections.close_all()
+            started = time.perf_counter()
+            with multiprocessing.get_context("fork").Pool(options['processes']) as pool:
+                results = pool.map(_settle, jobs, chunksize=1)
+            elapsed = time.perf_counter() - started
+
+            self._report(results, elapsed, options)
+            self._verify(split, borrower, lender)
+        finally:
+            Settlement.objects.filter(expense_split__expense__expense_by=lender).delete()
+            Balance.objects.filter(lender=lender).delete()
+            Expense.objects.filter(expense_by=lender).delete()
+            User.objects.filter(id__in=[lender.id, borrower.id]).delete()
+
+    def _report(self, results, elapsed, options):
+        latencies = sorted(latency * 1000 for _, _, latency in results)
+        failures = [message for success, message, _ in results if not success]
+        self.stdout.write(
+            f"processes={options['processes']} callbacks={len(results)} elapsed={elapsed:.2f}s "
+            f"throughput={len(results) / elapsed:.1f}/s p50={latencies[len(latencies) // 2]:.1f}ms "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1]:.1f}ms failed={len(failures)}"
+        )
+        for message in sorted(set(failures))[:5]:
+            self.stdout.write(self.style.WARNING(f"  {message}"))
+
+    def _verify(self, split, borrower, lender):
+        split.refresh_from_db()
+        settled = Settlement.objects.filter(expense_split=split, status='Settled').count()
+        expected = split.amount - sum(
+            Settlement.objects.filter(expense_split=split, status='Settled').values_list('amount', flat=True))
+        owed = ledger.fetch_balance(lender_id=lender.id, borrower_id=borrower.id)
+        self.stdout.write(f"settled={settled} balance_outstanding={split.balance_outstanding} ledger={owed} "
+                          f"status={split.status}")
+
+        if split.balance_outstanding != expected or owed != expected:
+            raise CommandError(f"Lost update : expected an outstanding balance of {expected}")
+        if (split.balance_outstanding == 0) != (split.status == "Paid"):
+            raise CommandError(f"Split status {split.status} doesn't match its balance")
+        self.stdout.write(self.style.SUCCESS("Balances are consistent"))
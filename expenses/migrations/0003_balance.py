@@ -0,0 +1,50 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_balances(apps, schema_editor):
+    ExpenseSplit = apps.get_model('expenses', 'ExpenseSplit')
+    Balance = apps.get_model('expenses', 'Balance')
+    rows = ExpenseSplit.objects.filter(
+        expense_user__isnull=False,
+        expense__expense_by__isnull=False,
+    ).exclude(
+        models.Q(expense_user=models.F('expense__expense_by')) | models.Q(balance_outstanding=0)
+    ).values(
+        'expense__expense_by', 'expense_user', 'expense__group'
+    ).annotate(total=models.Sum('balance_outstanding'))
+
+    Balance.objects.bulk_create([
+        Balance(lender_id=row['expense__expense_by'], borrower_id=row['expense_user'],
+                group_id=row['expense__group'], amount=row['total'])
+        for row in rows if row['total']
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Balance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('borrower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='borrowed_balances', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='expenses.group')),
+                ('lender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lent_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('lender', 'borrower', 'group')},
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
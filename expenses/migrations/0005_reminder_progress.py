@@ -0,0 +1,39 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_key', models.CharField(max_length=20, unique=True)),
+                ('cursor', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('Running', 'Running'), ('Dispatched', 'Dispatched')], default='Running', max_length=10)),
+                ('started_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReminderChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_borrower_id', models.BigIntegerField()),
+                ('last_borrower_id', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Done', 'Done')], default='Pending', max_length=10)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='expenses.reminderrun')),
+            ],
+            options={
+                'unique_together': {('run', 'first_borrower_id')},
+            },
+        ),
+    ]
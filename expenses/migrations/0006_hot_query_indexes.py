@@ -0,0 +1,29 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_reminder_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='balance',
+            index=models.Index(fields=['borrower', 'lender'], name='balance_borrower_lender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensesplit',
+            index=models.Index(fields=['expense_user', 'balance_outstanding'], name='split_user_outstanding_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensesplit',
+            index=models.Index(fields=['expense', 'expense_user'], name='split_expense_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['expense_split', 'status', 'deleted_on'], name='settlement_split_status_idx'),
+        ),
+    ]
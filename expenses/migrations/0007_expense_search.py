@@ -0,0 +1,67 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:50
+
+from django.db import migrations, models
+from django.db.models import F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def backfill_expense_timestamps(apps, schema_editor):
+    """
+    Existing expenses get the migration time from AddField; date them by their splits instead, which are written
+    with the expense (created_on : earliest split, updated_on : latest split change). Expenses without splits
+    keep the migration time.
+    """
+    Expense = apps.get_model('expenses', 'Expense')
+    ExpenseSplit = apps.get_model('expenses', 'ExpenseSplit')
+    splits = ExpenseSplit.objects.filter(expense_id=OuterRef('pk')).values('expense_id')
+    Expense.objects.update(
+        created_on=Coalesce(Subquery(splits.annotate(first=Min('created_on')).values('first')), F('created_on')),
+        updated_on=Coalesce(Subquery(splits.annotate(last=Max('updated_on')).values('last')), F('updated_on')),
+    )
+
+
+def add_name_fulltext_index(apps, schema_editor):
+    # InnoDB FULLTEXT index for the `q` search on MySQL; other backends fall back to a substring match
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE expenses_expense ADD FULLTEXT INDEX expense_name_ft (name)')
+
+
+def drop_name_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE expenses_expense DROP INDEX expense_name_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='created_on',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='updated_on',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_expense_timestamps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'created_on'], name='expense_group_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['created_on'], name='expense_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensesplit',
+            index=models.Index(fields=['expense_user', 'expense'], name='split_user_expense_idx'),
+        ),
+        migrations.RunPython(add_name_fulltext_index, drop_name_fulltext_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expense_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='import_batch',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['import_batch', 'id'], name='expense_import_batch_idx'),
+        ),
+    ]
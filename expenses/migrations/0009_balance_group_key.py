@@ -0,0 +1,43 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def merge_duplicate_balances(apps, schema_editor):
+    """
+    Fill group_key & fold rows that raced past the old (lender, borrower, group) key, whose NULL group let
+    duplicates in, into the oldest row of their key
+    """
+    Balance = apps.get_model('expenses', 'Balance')
+    Balance.objects.filter(group__isnull=False).update(group_key=F('group_id'))
+    duplicates = Balance.objects.values('lender_id', 'borrower_id', 'group_key').annotate(
+        rows=Count('id'), keep=Min('id'), total=Sum('amount')
+    ).filter(rows__gt=1).order_by()
+    for key in duplicates:
+        rows = Balance.objects.filter(lender_id=key['lender_id'], borrower_id=key['borrower_id'],
+                                      group_key=key['group_key'])
+        rows.filter(id=key['keep']).update(amount=key['total'])
+        rows.exclude(id=key['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0008_expense_import_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balance',
+            name='group_key',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(merge_duplicate_balances, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='balance',
+            unique_together={('lender', 'borrower', 'group_key')},
+        ),
+    ]
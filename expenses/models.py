@@ -1,6 +1,7 @@
+import hashlib
+
 from django.db import models
 from users.models import User
-from .utils import send_email_notification
 import expenses.common.messages as app_messages
 import expenses.common.constants as app_constants
 
@@ -30,10 +31,24 @@ class Expense(models.Model):
     group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True)
     status = models.CharField(max_length=10, choices=app_constants.EXPENSE_STATUS_CHOICES, default='Pending')
     expense_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    # chunk of expenses.importer that wrote the row, to read back ids of a bulk insert where the database can't
+    # return them (MySQL)
+    import_batch = models.UUIDField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.name} - {self.expense_by.username}"
 
+    class Meta:
+        # expense search (search.search_user_expenses) : group & date range filters. `name` also has a
+        # FULLTEXT index on MySQL, added in migration 0007. expenses.importer : ids of a chunk by import_batch
+        indexes = [
+            models.Index(fields=['group', 'created_on'], name='expense_group_created_idx'),
+            models.Index(fields=['created_on'], name='expense_created_idx'),
+            models.Index(fields=['import_batch', 'id'], name='expense_import_batch_idx'),
+        ]
+
 
 class ExpenseSplit(models.Model):
     expense_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -51,7 +66,10 @@ class ExpenseSplit(models.Model):
     def __str__(self):
         return f'Expense between {self.expense.expense_by.username} and {self.expense_user.username}'
 
-    def save(self, *args, **kwargs):
+    def notification(self) -> dict:
+        """
+        Email notification for this split, as kwargs for NotificationOutbox.enqueue
+        """
         subject = app_messages.EXPENSE_NOTIFICATION_MAIL_SUBJECT
         if self.status == app_constants.SplitExpenseStatus.PAID.value and self.expense.expense_by.id != self.expense_user.id:
             email = self.expense.expense_by.email
@@ -67,8 +85,18 @@ class ExpenseSplit(models.Model):
                 balance=self.balance_outstanding,
                 expense_name=self.expense.name
             )
-        send_email_notification.apply_async(kwargs=dict(email=email, subject=subject, message=message))
+        return dict(email=email, subject=subject, message=message)
+
+    def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
+        NotificationOutbox.enqueue([self.notification()])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expense_user', 'balance_outstanding'], name='split_user_outstanding_idx'),
+            models.Index(fields=['expense', 'expense_user'], name='split_expense_user_idx'),
+            models.Index(fields=['expense_user', 'expense'], name='split_user_expense_idx'),
+        ]
 
 
 class Settlement(models.Model):
@@ -86,4 +114,114 @@ class Settlement(models.Model):
         return f'Settlement of amount : {self.amount} for {self.expense_split.expense.name} : {self.status}'
 
     def expense_name(self):
-        return self.expense_split.expense.name
\ No newline at end of file
+        return self.expense_split.expense.name
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expense_split', 'status', 'deleted_on'], name='settlement_split_status_idx'),
+        ]
+
+
+class Balance(models.Model):
+    """
+    Outstanding amount `borrower` owes `lender` within `group` (null for non-group expenses).
+    Maintained incrementally by expenses.ledger alongside ExpenseSplit writes.
+    """
+    lender = models.ForeignKey(User, related_name='lent_balances', on_delete=models.CASCADE)
+    borrower = models.ForeignKey(User, related_name='borrowed_balances', on_delete=models.CASCADE)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True)
+    # `group` id, 0 for non-group balances : the unique key can't use `group`, NULLs are distinct in it
+    group_key = models.PositiveBigIntegerField(default=0, editable=False)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.borrower.username} owes {self.lender.username} : {self.amount}'
+
+    class Meta:
+        unique_together = ('lender', 'borrower', 'group_key')
+        indexes = [models.Index(fields=['borrower', 'lender'], name='balance_borrower_lender_idx')]
+
+    @classmethod
+    def for_key(cls, key: tuple, amount):
+        """
+        Unsaved row of a ledger key (lender_id, borrower_id, group_id or None)
+        """
+        lender_id, borrower_id, group_id = key
+        return cls(lender_id=lender_id, borrower_id=borrower_id, group_id=group_id, group_key=group_id or 0,
+                   amount=amount)
+
+
+class NotificationOutbox(models.Model):
+    """
+    Email waiting to be delivered. Rows are written in the same transaction as the business change &
+    drained by expenses.tasks.drain_notification_outbox, so rolled back changes never send mail.
+    """
+    email = models.EmailField(max_length=150)
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    html_message = models.TextField(null=True, blank=True)
+    dedupe_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=app_constants.OUTBOX_STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    sent_on = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.subject} to {self.email} : {self.status}'
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    @classmethod
+    def enqueue(cls, notifications: list) -> list:
+        """
+        Queue notifications (dicts of email, subject, message & optional html_message) for delivery
+        """
+        rows = []
+        for notification in notifications:
+            if not notification.get("email"):
+                continue
+            html_message = notification.get("html_message")
+            key = "\x00".join([notification["email"], notification["subject"], notification["message"], html_message or ""])
+            rows.append(cls(
+                email=notification["email"],
+                subject=notification["subject"],
+                message=notification["message"],
+                html_message=html_message,
+                dedupe_key=hashlib.sha256(key.encode()).hexdigest(),
+            ))
+        return cls.objects.bulk_create(rows)
+
+
+class ReminderRun(models.Model):
+    """
+    Progress of one weekly reminder run. `cursor` is the last borrower id handed to a chunk,
+    so a crashed run resumes after it instead of re-sending.
+    """
+    run_key = models.CharField(max_length=20, unique=True)
+    cursor = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=app_constants.REMINDER_RUN_STATUS_CHOICES, default='Running')
+    started_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Reminder run {self.run_key} : {self.status}'
+
+
+class ReminderChunk(models.Model):
+    """
+    Borrower id range [first_borrower_id, last_borrower_id] of a reminder run handled by one task
+    """
+    run = models.ForeignKey(ReminderRun, related_name='chunks', on_delete=models.CASCADE)
+    first_borrower_id = models.BigIntegerField()
+    last_borrower_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=app_constants.REMINDER_CHUNK_STATUS_CHOICES, default='Pending')
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.run.run_key} : {self.first_borrower_id} - {self.last_borrower_id} : {self.status}'
+
+    class Meta:
+        unique_together = ('run', 'first_borrower_id')
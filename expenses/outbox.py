@@ -0,0 +1,113 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import Case, F, Max, Q, Value, When
+from django.utils import timezone
+
+from expenses.common import constants as app_constants
+from expenses.models import NotificationOutbox
+
+logger = logging.getLogger("expenses")
+
+PENDING = app_constants.OutboxStatus.PENDING.value
+SENDING = app_constants.OutboxStatus.SENDING.value
+SENT = app_constants.OutboxStatus.SENT.value
+FAILED = app_constants.OutboxStatus.FAILED.value
+
+
+def claim_batch(batch_size: int = app_constants.OUTBOX_BATCH_SIZE) -> list:
+    """
+    Helper to claim a batch of pending rows by flipping them to Sending.
+    Rows stuck in Sending (crashed worker) are re-claimed after OUTBOX_CLAIM_TIMEOUT_MINUTES.
+    """
+    now = timezone.now()
+    stale = now - timedelta(minutes=app_constants.OUTBOX_CLAIM_TIMEOUT_MINUTES)
+    with transaction.atomic():
+        rows = NotificationOutbox.objects.filter(
+            Q(status=PENDING) | Q(status=SENDING, updated_on__lt=stale)
+        ).order_by('id')
+        rows = rows.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        rows = list(rows[:batch_size])
+        if rows:
+            NotificationOutbox.objects.filter(id__in=[row.id for row in rows]).update(status=SENDING, updated_on=now)
+    return rows
+
+
+def deliver_batch(rows: list) -> tuple:
+    """
+    Helper to send a claimed batch over one mail connection. Identical messages are sent once, & a message already
+    sent since a row was queued (by an earlier batch or before a retry) is not sent again.
+    Returns (sent, failed) row counts.
+    """
+    last_sent = dict(
+        NotificationOutbox.objects.filter(dedupe_key__in={row.dedupe_key for row in rows}, status=SENT)
+        .values('dedupe_key').annotate(last=Max('sent_on')).values_list('dedupe_key', 'last')
+    )
+    delivered_keys = {row.dedupe_key for row in rows
+                      if last_sent.get(row.dedupe_key) and last_sent[row.dedupe_key] >= row.created_on}
+    unique = {}
+    for row in rows:
+        if row.dedupe_key not in delivered_keys:
+            unique.setdefault(row.dedupe_key, row)
+
+    if unique:
+        mail_connection = get_connection()
+        try:
+            mail_connection.open()
+        except Exception as e:
+            logger.error(f"OUTBOX - DELIVER BATCH : ERROR opening mail connection {str(e)}")
+            unique = {}
+        else:
+            for key, row in unique.items():
+                mail = EmailMultiAlternatives(row.subject, row.message, settings.EMAIL_HOST_USER, [row.email],
+                                              connection=mail_connection)
+                if row.html_message:
+                    mail.attach_alternative(row.html_message, "text/html")
+                try:
+                    mail.send()
+                    delivered_keys.add(key)
+                except Exception as e:
+                    logger.error(f"OUTBOX - DELIVER BATCH : ERROR sending outbox row {row.id} {str(e)}")
+            try:
+                mail_connection.close()
+            except Exception as e:
+                # sent messages were already accepted by the server
+                logger.error(f"OUTBOX - DELIVER BATCH : ERROR closing mail connection {str(e)}")
+
+    sent_ids = [row.id for row in rows if row.dedupe_key in delivered_keys]
+    failed_ids = [row.id for row in rows if row.dedupe_key not in delivered_keys]
+    now = timezone.now()
+    if sent_ids:
+        NotificationOutbox.objects.filter(id__in=sent_ids).update(status=SENT, sent_on=now, updated_on=now)
+    if failed_ids:
+        NotificationOutbox.objects.filter(id__in=failed_ids).update(
+            attempts=F('attempts') + 1,
+            status=Case(
+                When(attempts__gte=app_constants.OUTBOX_MAX_ATTEMPTS - 1, then=Value(FAILED)),
+                default=Value(PENDING)
+            ),
+            updated_on=now
+        )
+    return len(sent_ids), len(failed_ids)
+
+
+def drain(batch_size: int = app_constants.OUTBOX_BATCH_SIZE,
+          max_batches: int = app_constants.OUTBOX_MAX_BATCHES_PER_RUN) -> dict:
+    """
+    Helper to drain the outbox batch by batch until it is empty or `max_batches` is reached
+    """
+    sent = failed = 0
+    for _ in range(max_batches):
+        rows = claim_batch(batch_size)
+        if not rows:
+            break
+        batch_sent, batch_failed = deliver_batch(rows)
+        sent += batch_sent
+        failed += batch_failed
+        if not batch_sent:
+            # nothing got through (mail server down) : retry on the next run, not within this one
+            break
+    return {"sent": sent, "failed": failed}
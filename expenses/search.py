@@ -0,0 +1,66 @@
+import re
+
+from django.db import NotSupportedError, connection
+from django.db.models import CharField, Lookup
+
+from expenses.common import constants as app_constants
+from expenses.models import Expense, ExpenseSplit
+
+
+@CharField.register_lookup
+class FullTextMatch(Lookup):
+    """
+    `name__fulltext="+cab* +airport*"` : MATCH ... AGAINST in boolean mode, served by a FULLTEXT index (MySQL only)
+    """
+    lookup_name = 'fulltext'
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"MATCH ({lhs}) AGAINST ({rhs} IN BOOLEAN MODE)", lhs_params + rhs_params
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError("fulltext lookups are only supported on MySQL")
+
+
+def fulltext_query(text: str) -> str:
+    """
+    Boolean mode query requiring every word of `text` as a word prefix, e.g. "cab air" -> "+cab* +air*".
+    Words InnoDB doesn't index (too short, stopwords) are dropped; empty if none is left.
+    """
+    words = [word for word in re.findall(r"\w+", text.lower())
+             if len(word) >= app_constants.FULLTEXT_MIN_WORD_LENGTH and word not in app_constants.FULLTEXT_STOPWORDS]
+    return " ".join(f"+{word}*" for word in words)
+
+
+def search_user_expenses(user_id: int, filters: dict) -> object:
+    """
+    Expenses `user_id` has a split in, newest first, narrowed by the validated ExpenseSearchSerializer `filters`.
+
+    Every filter has an index to run from : the user's expenses & `counterparty` (expenses both users have a split
+    in, the payer always has one) are walks of split_user_expense_idx in expense id order, `group` uses
+    expense_group_created_idx, the date range expense_created_idx & `q` the FULLTEXT index on name. `status` (two
+    values) & the `name` substring are checked on the rows those narrowed down.
+    """
+    expenses = Expense.objects.filter(
+        id__in=ExpenseSplit.objects.filter(expense_user_id=user_id).values('expense_id')
+    )
+    if filters.get("counterparty"):
+        expenses = expenses.filter(
+            id__in=ExpenseSplit.objects.filter(expense_user_id=filters["counterparty"]).values('expense_id')
+        )
+    if filters.get("group"):
+        expenses = expenses.filter(group_id=filters["group"])
+    if filters.get("status"):
+        expenses = expenses.filter(status=filters["status"])
+    if filters.get("created_after"):
+        expenses = expenses.filter(created_on__gte=filters["created_after"])
+    if filters.get("created_before"):
+        expenses = expenses.filter(created_on__lt=filters["created_before"])
+    if filters.get("name"):
+        expenses = expenses.filter(name__icontains=filters["name"])
+    if filters.get("q"):
+        query = fulltext_query(filters["q"]) if connection.vendor == 'mysql' else ""
+        expenses = expenses.filter(name__fulltext=query) if query else expenses.filter(name__icontains=filters["q"])
+    return expenses.values('id', 'name', 'balance_amt', 'status', 'group_id', 'expense_by_id', 'created_on',
+                           'updated_on')
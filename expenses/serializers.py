@@ -3,10 +3,12 @@ from decimal import Decimal, ROUND_HALF_UP
 from django.db import transaction
 from rest_framework import serializers
 
-from expenses.models import Group, GroupMember, Expense, ExpenseSplit, Settlement
+from expenses import ledger, summary_cache
+from expenses.models import Group, GroupMember, Expense, ExpenseSplit, Settlement, NotificationOutbox
 from expenses.common import constants as app_constants, messages as app_messages
-from users.models import User, Friends
-from django.db.models import Q
+from users import activity
+from users.friendships import FriendSet
+from users.models import User
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -18,6 +20,12 @@ class GroupSerializer(serializers.ModelSerializer):
         group = Group.objects.create(**validated_data)
         return group
 
+    def update(self, instance, validated_data):
+        group = super().update(instance, validated_data)
+        member_ids = group.groupmember_set.values_list('member_id', flat=True)
+        summary_cache.bump_versions(group_ids=[group.id], user_ids=member_ids)
+        return group
+
 
 class GroupMemberSerializer(serializers.ModelSerializer):
     member = serializers.ListField(
@@ -30,14 +38,13 @@ class GroupMemberSerializer(serializers.ModelSerializer):
 
     def __init__(self, *args, **kwargs):
         self.owner_id = kwargs.pop('context', {}).get('owner_id')
+        self.friend_set = FriendSet()
         super().__init__(*args, **kwargs)
 
     def validate(self, data):
         members = data.get('member', [])
         for member in members:
-            if member.id != self.owner_id and not Friends.objects.filter(
-                    Q(user_1_id=self.owner_id, user_2_id=member) | Q(user_1_id=member,
-                                                                     user_2_id=self.owner_id)).exists():
+            if member.id != self.owner_id and not self.friend_set.are_friends(self.owner_id, member):
                 raise serializers.ValidationError("Must be friends to add in group")
         return data
 
@@ -51,6 +58,10 @@ class GroupMemberSerializer(serializers.ModelSerializer):
         try:
             with transaction.atomic():
                 group_members = self._create_group_members(group, members)
+                summary_cache.bump_versions(group_ids=[group.id], user_ids=[member.id for member in members])
+                activity.record(activity.members_added(
+                    group, self.owner_id, members, group.groupmember_set.values_list('member_id', flat=True)
+                ))
                 return group_members[-1] if group_members else None
         except Exception as e:
             raise serializers.ValidationError(f"Failed to add members to group: {str(e)}")
@@ -60,8 +71,7 @@ class GroupMemberSerializer(serializers.ModelSerializer):
         for member in members:
             is_owner = self._is_owner(member)
             if not is_owner:
-                if not Friends.objects.filter(Q(user_1_id=self.owner_id, user_2_id=member) | Q(user_1_id=member,
-                                                                                               user_2_id=self.owner_id)).exists():
+                if not self.friend_set.are_friends(self.owner_id, member):
                     raise Exception("Must be friends to add in group")
             group_member = GroupMember.objects.create(
                 group=group,
@@ -121,10 +131,9 @@ class ExpenseSerializer(serializers.ModelSerializer):
 
     def _validate_friendship(self, split_breakup, expense_by):
         members = [i.get('expense_user') for i in split_breakup]
+        friend_set = FriendSet()
         for member in members:
-            if member != expense_by and not Friends.objects.filter(
-                    Q(user_1_id=expense_by, user_2_id=member) | Q(user_1_id=member,
-                                                                  user_2_id=expense_by)).exists():
+            if member != expense_by and not friend_set.are_friends(expense_by, member):
                 raise serializers.ValidationError("Must be friends to add expense")
         return split_breakup
 
@@ -183,6 +192,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
             row["split_value"] = (split_value + remainder).quantize(Decimal('0.01')) if idx == 0 else split_value
 
     def _create_expense_splits(self, expense, split_breakup_data, balance_amt):
+        splits = []
         for split_data in split_breakup_data:
             split_value = self._decimalize(split_data.pop('split_value'))
             amount = self._calculate_split_amount(split_data['split_type'], split_value, balance_amt)
@@ -190,13 +200,21 @@ class ExpenseSerializer(serializers.ModelSerializer):
             balance_outstanding = amount if split_data.get(
                 "status") != app_constants.SplitExpenseStatus.PAID.value else Decimal('0.00')
 
-            ExpenseSplit.objects.create(
+            splits.append(ExpenseSplit(
                 expense=expense,
                 amount=amount,
                 balance_outstanding=balance_outstanding,
                 settled=balance_outstanding == 0,
                 **split_data
-            )
+            ))
+
+        # bulk insert skips ExpenseSplit.save, so queue every participant's notification in one outbox insert
+        ExpenseSplit.objects.bulk_create(splits)
+        ledger.record_expense_splits(expense, splits)
+        NotificationOutbox.enqueue([split.notification() for split in splits])
+        activity.record(activity.expense_added(expense.id, expense.name, balance_amt, expense.group_id,
+                                               expense.expense_by, [split.expense_user_id for split in splits]))
+        return splits
 
     def _calculate_split_amount(self, split_type, split_value, balance_amt):
         if split_type == app_constants.SplitType.PERCENTAGE.value:
@@ -225,6 +243,26 @@ class PaymentLinkSerializer(serializers.Serializer):
         return data
 
 
+class ExpenseSearchSerializer(serializers.Serializer):
+    """
+    Query params of the expense search : `q` full-text words, `name` substring, `created_after` inclusive &
+    `created_before` exclusive (ISO dates or datetimes)
+    """
+    q = serializers.CharField(required=False, max_length=100)
+    name = serializers.CharField(required=False, max_length=100)
+    status = serializers.ChoiceField(required=False, choices=app_constants.EXPENSE_STATUS_CHOICES)
+    group = serializers.IntegerField(required=False, min_value=1)
+    counterparty = serializers.IntegerField(required=False, min_value=1)
+    created_after = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+    created_before = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+
+    def validate(self, data):
+        if data.get("created_after") and data.get("created_before") and \
+                data["created_after"] >= data["created_before"]:
+            raise serializers.ValidationError("created_after must be before created_before")
+        return data
+
+
 class SettlementListSerializer(serializers.ModelSerializer):
     expense_user = serializers.SerializerMethodField()
     expense = serializers.SerializerMethodField()
@@ -0,0 +1,58 @@
+import heapq
+from collections import defaultdict
+from decimal import Decimal
+
+from .models import Balance
+
+CENT = Decimal('0.01')
+
+
+def fetch_net_positions(group_id) -> dict:
+    """
+    Helper to compute each member's net position within a group (positive : is owed, negative : owes)
+    from the balance ledger in a single query
+    """
+    positions = defaultdict(int)
+    rows = Balance.objects.filter(group_id=group_id).exclude(amount=0).values_list('lender_id', 'borrower_id', 'amount')
+    for lender_id, borrower_id, amount in rows:
+        cents = int(amount / CENT)
+        positions[lender_id] += cents
+        positions[borrower_id] -= cents
+    return {user_id: cents for user_id, cents in positions.items() if cents}
+
+
+def simplify_debts(positions: dict) -> list:
+    """
+    Greedy min-cash-flow : repeatedly settle the largest debtor against the largest creditor.
+    `positions` maps user id -> net position in cents. Returns [(debtor_id, creditor_id, cents), ...]
+    with at most n - 1 transfers. Runs in O(n log n).
+    """
+    creditors = [(-cents, user_id) for user_id, cents in positions.items() if cents > 0]
+    debtors = [(cents, user_id) for user_id, cents in positions.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debit, debtor_id = heapq.heappop(debtors)
+        amount = min(-credit, -debit)
+        transfers.append((debtor_id, creditor_id, amount))
+
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+        if -debit > amount:
+            heapq.heappush(debtors, (debit + amount, debtor_id))
+
+    return transfers
+
+
+def suggest_settlements(group_id) -> list:
+    """
+    Helper to suggest a minimal set of payments that settles every balance within a group
+    """
+    transfers = simplify_debts(fetch_net_positions(group_id))
+    return [
+        {"from_user": debtor_id, "to_user": creditor_id, "amount": Decimal(cents) * CENT}
+        for debtor_id, creditor_id, cents in transfers
+    ]
@@ -0,0 +1,37 @@
+import logging
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from expenses.common import constants as app_constants
+
+logger = logging.getLogger("expenses")
+
+PENDING_EXPENSES_KEY = "expense-status:pending"
+
+
+def _key() -> str:
+    return cache.make_key(PENDING_EXPENSES_KEY)
+
+
+def enqueue(expense_ids) -> bool:
+    """
+    Helper to mark expenses for status recomputation. Ids are kept in a redis set, so an expense touched by
+    many settlements before the next drain is recomputed once. Returns False if redis is unavailable.
+    """
+    expense_ids = [int(expense_id) for expense_id in expense_ids]
+    if not expense_ids:
+        return True
+    try:
+        get_redis_connection("default").sadd(_key(), *expense_ids)
+        return True
+    except Exception as e:
+        logger.error(f"STATUS QUEUE - ENQUEUE : REDIS ERROR {str(e)}")
+        return False
+
+
+def pop(batch_size: int = app_constants.EXPENSE_STATUS_BATCH_SIZE) -> list:
+    """
+    Helper to atomically take up to `batch_size` pending expense ids; concurrent drainers get disjoint batches
+    """
+    return [int(expense_id) for expense_id in get_redis_connection("default").spop(_key(), batch_size) or []]
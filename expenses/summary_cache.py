@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from expenses.common import constants as app_constants
+
+logger = logging.getLogger("expenses")
+
+GROUP_VERSION_KEY = "version:group:{group_id}"
+USER_VERSION_KEY = "version:user:{user_id}"
+GROUP_DETAIL_KEY = "summary:group:{group_id}:{version}:{user_id}"
+GROUP_LIST_KEY = "summary:groups:{user_id}:{version}:{url}"
+EXPENSE_SCOPE_KEY = "summary:expense-scope:{expense_id}"
+EXPENSE_DETAIL_KEY = "summary:expense:{expense_id}:{scope}:{version}"
+LOCK_SUFFIX = ":lock"
+
+
+def _fresh_version() -> int:
+    # version keys never expire, but if one is evicted it restarts from the clock instead of 1 so
+    # entries cached under older versions can't be served again
+    return time.time_ns() // 1000
+
+
+def fetch_versions(group_ids=(), user_ids=()) -> dict:
+    """
+    Helper to read current version counters. Returns {"group:<id>": v, "user:<id>": v}
+    """
+    keys = {f"group:{gid}": GROUP_VERSION_KEY.format(group_id=gid) for gid in group_ids}
+    keys.update({f"user:{uid}": USER_VERSION_KEY.format(user_id=uid) for uid in user_ids})
+    stored = cache.get_many(list(keys.values()))
+
+    versions = {}
+    for name, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            version = _fresh_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key)
+        versions[name] = version
+    return versions
+
+
+def bump_versions(group_ids=(), user_ids=()) -> None:
+    """
+    Helper to bump version counters once the current transaction commits, so no reader can cache
+    pre-commit data under the new version
+    """
+    keys = [GROUP_VERSION_KEY.format(group_id=gid) for gid in set(group_ids) if gid is not None]
+    keys += [USER_VERSION_KEY.format(user_id=uid) for uid in set(user_ids) if uid is not None]
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def _bump(keys: list) -> None:
+    for key in keys:
+        try:
+            if not cache.add(key, _fresh_version(), timeout=None):
+                cache.incr(key)
+        except Exception as e:
+            logger.error(f"SUMMARY CACHE - BUMP VERSION : CACHE ERROR {key} {str(e)}")
+
+
+def read_through(key: str, builder, timeout: int = app_constants.SUMMARY_CACHE_TTL):
+    """
+    Helper to return the cached value for `key` or build & cache it.
+    Only one caller builds a missing key (redis SET NX lock); the others wait for its result for up
+    to SUMMARY_CACHE_WAIT_SECONDS before building it themselves. None results are not cached & a None
+    `key` (cache unavailable) just calls the builder.
+    """
+    if key is None:
+        return builder()
+    lock_key = key + LOCK_SUFFIX
+    try:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        locked = cache.add(lock_key, 1, timeout=app_constants.SUMMARY_CACHE_LOCK_TTL)
+    except Exception as e:
+        logger.error(f"SUMMARY CACHE - READ THROUGH : CACHE ERROR {key} {str(e)}")
+        return builder()
+
+    if locked:
+        # builder errors are the caller's, only cache calls are guarded
+        try:
+            value = builder()
+            if value is not None:
+                _cache_quietly(cache.set, key, value, timeout)
+            return value
+        finally:
+            _cache_quietly(cache.delete, lock_key)
+
+    try:
+        deadline = time.monotonic() + app_constants.SUMMARY_CACHE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(app_constants.SUMMARY_CACHE_POLL_SECONDS)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            if not cache.get(lock_key):
+                break
+    except Exception as e:
+        logger.error(f"SUMMARY CACHE - READ THROUGH : CACHE ERROR {key} {str(e)}")
+    return builder()
+
+
+def _cache_quietly(operation, key, *args) -> None:
+    try:
+        operation(key, *args)
+    except Exception as e:
+        logger.error(f"SUMMARY CACHE - READ THROUGH : CACHE ERROR {key} {str(e)}")
+
+
+def group_detail_key(user_id, group_id) -> str:
+    """
+    Key of a group detail as seen by `user_id`, versioned by the group. None if the cache is unavailable.
+    """
+    try:
+        version = fetch_versions(group_ids=[group_id])[f"group:{group_id}"]
+    except Exception as e:
+        logger.error(f"SUMMARY CACHE - GROUP DETAIL KEY : CACHE ERROR {str(e)}")
+        return None
+    return GROUP_DETAIL_KEY.format(group_id=group_id, version=version, user_id=user_id)
+
+
+def group_list_key(user_id, url: str) -> str:
+    """
+    Key of a page of the user's group summaries, versioned by the user. None if the cache is unavailable.
+    """
+    try:
+        version = fetch_versions(user_ids=[user_id])[f"user:{user_id}"]
+    except Exception as e:
+        logger.error(f"SUMMARY CACHE - GROUP LIST KEY : CACHE ERROR {str(e)}")
+        return None
+    url = hashlib.sha1(url.encode()).hexdigest()
+    return GROUP_LIST_KEY.format(user_id=user_id, version=version, url=url)
+
+
+def expense_detail_key(expense_id, scope_loader) -> str:
+    """
+    An expense's splits only change along with its group's balances (or its payer's for non-group
+    expenses), so its detail is versioned by that scope. `scope_loader` returns ("group"|"user", id)
+    & is itself cached as the scope of an expense never changes.
+    """
+    scope = read_through(EXPENSE_SCOPE_KEY.format(expense_id=expense_id), scope_loader,
+                         timeout=app_constants.SUMMARY_CACHE_SCOPE_TTL)
+    if scope is None:
+        return None
+    kind, scope_id = scope
+    try:
+        version = fetch_versions(**{f"{kind}_ids": [scope_id]})[f"{kind}:{scope_id}"]
+    except Exception as e:
+        logger.error(f"SUMMARY CACHE - EXPENSE DETAIL KEY : CACHE ERROR {str(e)}")
+        return None
+    return EXPENSE_DETAIL_KEY.format(expense_id=expense_id, scope=f"{kind}:{scope_id}", version=version)
@@ -0,0 +1,255 @@
+import itertools
+import json
+import logging
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from expenses import helpers, ledger
+from expenses.common import constants as app_constants
+from expenses.importer import ExpenseImporter, JSONL_FORMAT
+from expenses.models import Balance, Expense, ExpenseSplit, Group, GroupMember, Settlement
+from users.models import User, Friends
+
+logger = logging.getLogger("expenses")
+
+SPLIT_TYPES = [split_type.value for split_type in app_constants.SplitType]
+
+
+class DatasetGenerator:
+    """
+    Seeded synthetic dataset for load tests & benchmarks: users, friendships, groups, expenses with
+    Equal/Exact/Percentage splits & settlements, all written in bulk.
+
+    Activity is Zipf-skewed: user & group `n` (ranked from 0) is picked with weight 1 / (n + 1) ** skew,
+    so a few users pay, owe & belong to most of the data. `skew=0` spreads it uniformly.
+    Every row is tagged with `prefix` (emails, group names, expense names) so runs can be found & cleared.
+    """
+
+    def __init__(self, prefix: str = app_constants.SYNTHETIC_PREFIX, seed: int = 42, skew: float = 1.0,
+                 batch_size: int = app_constants.IMPORT_CHUNK_SIZE, password: str = app_constants.SYNTHETIC_PASSWORD,
+                 stdout=None):
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.skew = skew
+        self.batch_size = batch_size
+        self.password = password
+        self.stdout = stdout
+
+    def run(self, users: int, groups: int, group_size: int, friends: int, expenses: int, group_ratio: float,
+            settled_ratio: float, pending_ratio: float) -> dict:
+        user_ids = self.create_users(users)
+        memberships = self.create_groups(user_ids, groups, group_size)
+        friend_ids = self.create_friendships(user_ids, memberships, friends)
+        imported = self.create_expenses(user_ids, memberships, friend_ids, expenses, group_ratio)
+        settled, pending = self.create_settlements(settled_ratio, pending_ratio)
+        return {
+            "users": len(user_ids),
+            "groups": len(memberships),
+            "friendships": sum(len(ids) for ids in friend_ids.values()) // 2,
+            "expenses": imported["imported"],
+            "invalid_expenses": imported["failed"],
+            "settled_splits": settled,
+            "pending_settlements": pending,
+        }
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def _weights(self, count):
+        return [1 / (rank + 1) ** self.skew for rank in range(count)]
+
+    def _sample(self, population, weights, count):
+        """
+        `count` distinct items drawn by weight
+        """
+        count = min(count, len(population))
+        picked = set()
+        while len(picked) < count:
+            picked.update(self.rng.choices(population, weights=weights, k=count - len(picked)))
+        return sorted(picked)
+
+    def create_users(self, count) -> list:
+        """
+        Users ranked by activity, hottest first. All share one password hash, hashing is the slow part.
+        """
+        password = make_password(self.password)
+        User.objects.bulk_create(
+            [
+                User(email=f"{self.prefix}{n}@split-x.test", username=f"{self.prefix}{n}", password=password)
+                for n in range(count)
+            ],
+            batch_size=self.batch_size
+        )
+        by_email = dict(User.objects.filter(email__startswith=self.prefix).values_list('email', 'id'))
+        self._log(f"users={count}")
+        return [by_email[f"{self.prefix}{n}@split-x.test"] for n in range(count)]
+
+    def create_groups(self, user_ids, count, group_size) -> dict:
+        """
+        Groups of 3..group_size members, biased towards the hot users. Returns {group_id: [member_ids]}
+        """
+        Group.objects.bulk_create(
+            [Group(group_name=f"{self.prefix} group {n}", description="synthetic") for n in range(count)],
+            batch_size=self.batch_size
+        )
+        group_ids = dict(Group.objects.filter(group_name__startswith=f"{self.prefix} group ").values_list(
+            'group_name', 'id'))
+
+        weights = self._weights(len(user_ids))
+        memberships, members = {}, []
+        for n in range(count):
+            group_id = group_ids[f"{self.prefix} group {n}"]
+            member_ids = self._sample(user_ids, weights, self.rng.randint(3, max(3, group_size)))
+            memberships[group_id] = member_ids
+            members += [GroupMember(group_id=group_id, member_id=member_id, is_owner=index == 0)
+                        for index, member_id in enumerate(member_ids)]
+        GroupMember.objects.bulk_create(members, batch_size=self.batch_size)
+        self._log(f"groups={count} memberships={len(members)}")
+        return memberships
+
+    def create_friendships(self, user_ids, memberships, per_user) -> dict:
+        """
+        Group members are all friends with each other, plus ~per_user skewed friendships per user
+        """
+        pairs = set()
+        for member_ids in memberships.values():
+            pairs.update(itertools.combinations(sorted(member_ids), 2))
+        weights = self._weights(len(user_ids))
+        for user_id in user_ids:
+            for friend_id in self.rng.choices(user_ids, weights=weights, k=per_user):
+                if friend_id != user_id:
+                    pairs.add((min(user_id, friend_id), max(user_id, friend_id)))
+
+        # Friends is a multi-table inherited model, which bulk_create can't write; batch the saves instead
+        ordered = sorted(pairs)
+        for start in range(0, len(ordered), self.batch_size):
+            with transaction.atomic():
+                for a, b in ordered[start:start + self.batch_size]:
+                    Friends(user_1_id=a, user_2_id=b).save()
+        friend_ids = {user_id: [] for user_id in user_ids}
+        for a, b in ordered:
+            friend_ids[a].append(b)
+            friend_ids[b].append(a)
+        self._log(f"friendships={len(pairs)}")
+        return friend_ids
+
+    def create_expenses(self, user_ids, memberships, friend_ids, count, group_ratio) -> dict:
+        """
+        Expenses go through ExpenseImporter, so they get the same validation, bulk writes & ledger updates
+        """
+        group_ids = list(memberships)
+        group_weights = self._weights(len(group_ids))
+        user_weights = self._weights(len(user_ids))
+
+        def rows():
+            for n in range(count):
+                if group_ids and self.rng.random() < group_ratio:
+                    group_id = self.rng.choices(group_ids, weights=group_weights)[0]
+                    participants = memberships[group_id]
+                    payer = self.rng.choice(participants)
+                    participants = [payer] + self.rng.sample(
+                        [m for m in participants if m != payer], self.rng.randint(1, len(participants) - 1))
+                else:
+                    group_id = None
+                    payer = self.rng.choices(user_ids, weights=user_weights)[0]
+                    if not friend_ids[payer]:
+                        continue
+                    participants = [payer] + self.rng.sample(
+                        friend_ids[payer], self.rng.randint(1, min(4, len(friend_ids[payer]))))
+                yield json.dumps(self._expense_row(n, payer, group_id, participants))
+
+        importer = ExpenseImporter(chunk_size=self.batch_size)
+        result = importer.run(rows(), JSONL_FORMAT)
+        self._log(f"expenses={result['imported']} invalid={result['failed']}")
+        return result
+
+    def _expense_row(self, n, payer, group_id, participants):
+        # long tailed amounts : mostly small bills, a few large ones
+        cents = int(self.rng.lognormvariate(7.5, 1.0)) + len(participants)
+        amount = Decimal(cents) / 100
+        split_type = self.rng.choice(SPLIT_TYPES)
+        if split_type == app_constants.SplitType.EXACT.value:
+            values = self._partition(cents, len(participants))
+            splits = [{"expense_user": user_id, "split_value": str(Decimal(value) / 100)}
+                      for user_id, value in zip(participants, values)]
+        elif split_type == app_constants.SplitType.PERCENTAGE.value and len(participants) <= 100:
+            values = self._partition(100, len(participants))
+            splits = [{"expense_user": user_id, "split_value": str(value)}
+                      for user_id, value in zip(participants, values)]
+        else:
+            split_type = app_constants.SplitType.EQUAL.value
+            splits = [{"expense_user": user_id} for user_id in participants]
+        return {"name": f"{self.prefix} expense {n}", "balance_amt": str(amount), "expense_by": payer,
+                "group": group_id, "split_type": split_type, "splits": splits}
+
+    def _partition(self, total, parts):
+        """
+        `parts` positive integers summing to `total`
+        """
+        cuts = sorted(self.rng.sample(range(1, total), parts - 1))
+        return [b - a for a, b in zip([0] + cuts, cuts + [total])]
+
+    def create_settlements(self, settled_ratio, pending_ratio) -> tuple:
+        """
+        Fully pay `settled_ratio` of the open splits & leave a Pending settlement (open payment link) on
+        `pending_ratio` of them
+        """
+        splits = ExpenseSplit.objects.filter(
+            expense__name__startswith=f"{self.prefix} expense ", balance_outstanding__gt=0
+        ).values('id', 'amount', 'balance_outstanding', 'expense_id', 'expense_user_id', 'expense__expense_by_id',
+                 'expense__group_id').order_by('id')
+
+        settled = pending = 0
+        batch = []
+        for split in splits.iterator(chunk_size=self.batch_size):
+            roll = self.rng.random()
+            if roll < settled_ratio:
+                batch.append((split, True))
+            elif roll < settled_ratio + pending_ratio:
+                batch.append((split, False))
+            if len(batch) >= self.batch_size:
+                settled, pending = self._write_settlements(batch, settled, pending)
+                batch = []
+        if batch:
+            settled, pending = self._write_settlements(batch, settled, pending)
+        self._log(f"settled_splits={settled} pending_settlements={pending}")
+        return settled, pending
+
+    def _write_settlements(self, batch, settled, pending):
+        paid = app_constants.SplitExpenseStatus.PAID.value
+        with transaction.atomic():
+            Settlement.objects.bulk_create([
+                Settlement(payment_id=helpers.gen_unique_pay_id(), expense_split_id=split["id"],
+                           amount=split["balance_outstanding"], status='Settled' if is_paid else 'Pending')
+                for split, is_paid in batch
+            ])
+            paid_splits = [split for split, is_paid in batch if is_paid]
+            ExpenseSplit.objects.filter(id__in=[split["id"] for split in paid_splits]).update(
+                balance_outstanding=Decimal('0.00'), status=paid, settled=True)
+            ledger.record_settlement(
+                {
+                    "lender_id": split["expense__expense_by_id"],
+                    "borrower_id": split["expense_user_id"],
+                    "group_id": split["expense__group_id"],
+                    "amount": split["balance_outstanding"],
+                } for split in paid_splits
+            )
+            helpers.recompute_expense_statuses({split["expense_id"] for split in paid_splits})
+        return settled + len(paid_splits), pending + len(batch) - len(paid_splits)
+
+    def clear(self) -> None:
+        """
+        Remove everything created under this prefix
+        """
+        with transaction.atomic():
+            Settlement.objects.filter(expense_split__expense__name__startswith=f"{self.prefix} expense ").delete()
+            Expense.objects.filter(name__startswith=f"{self.prefix} expense ").delete()
+            user_ids = User.objects.filter(email__startswith=self.prefix).values_list('id', flat=True)
+            Balance.objects.filter(lender_id__in=user_ids).delete()
+            Group.objects.filter(group_name__startswith=f"{self.prefix} group ").delete()
+            # users (& their friendships, memberships & remaining ledger rows) last
+            User.objects.filter(email__startswith=self.prefix).delete()
@@ -1,42 +1,122 @@
 # tasks.py
 import logging
 
-from celery import shared_task
+from celery import group, shared_task
+from django.db import transaction
 from django.db.models import Sum
-from expenses.models import ExpenseSplit
+from django.utils import timezone
+from expenses.models import Balance, NotificationOutbox, ReminderChunk, ReminderRun
+import expenses.common.constants as app_constants
 import expenses.common.messages as app_messages
-from .utils import send_email_notification
+from . import outbox
 from django.conf import settings
 
 logger = logging.getLogger("expenses")
 
+
+@shared_task(queue=settings.NOTIFICATION_QUEUE)
+def weeekly_notification_task(run_key=None):
+    """
+    Weekly reminder coordinator. Streams borrowers with outstanding dues & fans them out in fixed-size
+    chunks to send_reminder_chunk, dispatched as celery groups. Progress is kept on ReminderRun, so
+    re-running the same week resumes after the last dispatched borrower.
+    """
+    now = timezone.now().isocalendar()
+    run_key = run_key or f"{now[0]}-W{now[1]:02d}"
+    run, _ = ReminderRun.objects.get_or_create(run_key=run_key)
+    if run.status == 'Dispatched':
+        return run.status
+
+    # chunks created before a crash may never have been queued; chunk tasks are idempotent
+    signatures = [send_reminder_chunk.s(chunk_id) for chunk_id in
+                  run.chunks.filter(status='Pending').values_list('id', flat=True)]
+
+    borrower_ids = Balance.objects.filter(
+        amount__gt=0, borrower_id__gt=run.cursor
+    ).order_by('borrower_id').values_list('borrower_id', flat=True).distinct().iterator()
+
+    batch = []
+    for borrower_id in borrower_ids:
+        batch.append(borrower_id)
+        if len(batch) >= app_constants.REMINDER_CHUNK_SIZE:
+            signatures.append(send_reminder_chunk.s(_create_chunk(run, batch)))
+            batch = []
+        if len(signatures) >= app_constants.REMINDER_GROUP_SIZE:
+            group(signatures).apply_async()
+            signatures = []
+
+    if batch:
+        signatures.append(send_reminder_chunk.s(_create_chunk(run, batch)))
+    if signatures:
+        group(signatures).apply_async()
+
+    run.status = 'Dispatched'
+    run.save(update_fields=['status', 'updated_on'])
+    logger.info(f"TASKS - WEEKLY NOTIFICATION TASK : run {run_key} dispatched up to borrower {run.cursor}")
+    return run.status
+
+
+def _create_chunk(run, borrower_ids):
+    with transaction.atomic():
+        chunk = ReminderChunk.objects.create(run=run, first_borrower_id=borrower_ids[0],
+                                             last_borrower_id=borrower_ids[-1])
+        run.cursor = borrower_ids[-1]
+        run.save(update_fields=['cursor', 'updated_on'])
+    return chunk.id
+
+
+@shared_task(queue=settings.NOTIFICATION_QUEUE)
+def send_reminder_chunk(chunk_id):
+    """
+    Queue one digest per borrower in the chunk's range. Runs at most once per chunk.
+    """
+    with transaction.atomic():
+        chunk = ReminderChunk.objects.select_for_update().get(id=chunk_id)
+        if chunk.status == 'Done':
+            return 0
+
+        dues = Balance.objects.filter(
+            amount__gt=0,
+            borrower_id__gte=chunk.first_borrower_id,
+            borrower_id__lte=chunk.last_borrower_id
+        ).values(
+            'borrower_id', 'borrower__email', 'borrower__username', 'lender__username'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by('borrower_id', 'lender__username')
+
+        notifications, digest = [], None
+        for due in dues.iterator():
+            if not digest or digest["borrower_id"] != due["borrower_id"]:
+                digest = {"borrower_id": due["borrower_id"], "email": due["borrower__email"],
+                          "name": due["borrower__username"] or "Split-X User", "dues": []}
+                notifications.append(digest)
+            digest["dues"].append(app_messages.WEEKLY_REMINDER_DUE_LINE.format(
+                amount=round(due["total_amount"], 2),
+                lender=(due["lender__username"] or "Split-X User").capitalize()
+            ))
+
+        NotificationOutbox.enqueue([
+            dict(
+                email=digest["email"],
+                subject=app_messages.DEBIT_REMINDER_MAIL_SUBJECT,
+                message=app_messages.WEEKLY_REMINDER_MAIL_BODY.format(
+                    user=digest["name"].capitalize(),
+                    dues="\n".join(digest["dues"])
+                )
+            ) for digest in notifications
+        ])
+        chunk.status = 'Done'
+        chunk.save(update_fields=['status', 'updated_on'])
+    return len(notifications)
+
+
 @shared_task(queue=settings.NOTIFICATION_QUEUE)
-def weeekly_notification_task():
-    expense_splits = ExpenseSplit.objects.filter(
-        balance_outstanding__gt=0
-    ).values(
-        'expense__expense_by',
-        'expense__expense_by__username',
-        'expense_user__email',
-        'expense_user__username'
-    ).annotate(
-        total_amount=Sum('amount')
-    )
-
-    for split in expense_splits:
-        try:
-            lender = split["expense__expense_by__username"]
-            borrower_email = split['expense_user__email']
-            borrower_name = split["expense_user__username"] if split.get("expense_user__username") else "Split-X User"
-            amount = split['total_amount']
-
-            subject = app_messages.DEBIT_REMINDER_MAIL_SUBJECT
-            message = app_messages.EXPENSE_RE3MINDER_MAIL_BODY.format(
-                user=borrower_name.capitalize(),
-                amount=round(amount, 2),
-                lender=lender.capitalize()
-            )
-            send_email_notification(email=borrower_email, subject=subject, message=message)
-        except Exception as e:
-            logger.error(f"TASKS - WEEKLY NOTIFICATION TASK : ERROR {str(e)}")
-        return True
+def drain_notification_outbox():
+    """
+    Periodic task delivering queued notifications in batches
+    """
+    result = outbox.drain()
+    if result["sent"] or result["failed"]:
+        logger.info(f"TASKS - DRAIN NOTIFICATION OUTBOX : sent {result['sent']} failed {result['failed']}")
+    return result
@@ -1,3 +1,1078 @@
-from django.test import TestCase
+import asyncio
+import codecs
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.core import mail, signing
+from django.core.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from splitwise_app.celery import app as celery_app
+from splitwise_app.utils.logging_utils import (JsonFormatter, LoggerFileHandler, QueueListenerHandler,
+                                               queue_logging_config)
+from splitwise_app.utils import metrics_utils
+from splitwise_app.utils.query_budget_utils import QueryBudgetTestMixin
+from expenses import helpers, ledger, outbox, search, simplification, status_queue, summary_cache, tasks, utils
+from expenses.common import constants as app_constants
+from expenses.importer import ExpenseImporter
+from expenses.models import (Balance, Expense, ExpenseSplit, Group, GroupMember, NotificationOutbox, ReminderRun,
+                             Settlement)
+from expenses.serializers import ExpenseSerializer, GroupMemberSerializer
+from users.models import Activity, User, Friends
+from users.serializers import FriendSerializer, LoginSerializer
+from users.user_cache import local_users
+
+
+class ExpenseFactoryMixin:
+    """
+    Creates expenses through ExpenseSerializer, paid by `self.owner` & split between `self.users` by default
+    """
+
+    def create_expense(self, amount, users=None, group=None, expense_by=None, name="dinner"):
+        serializer = self.expense_serializer(amount, users, group, expense_by, name)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def expense_serializer(self, amount, users=None, group=None, expense_by=None, name="dinner"):
+        expense_by = expense_by or self.owner
+        users = users or self.users
+        return ExpenseSerializer(data={
+            "name": name,
+            "balance_amt": str(amount),
+            "expense_by": expense_by.id,
+            "group": group.id if group else None,
+            "split_breakup": [
+                {
+                    "expense_user": user.id,
+                    "split_type": "Equal",
+                    "split_value": None,
+                    "status": "Paid" if user == expense_by else "Pending",
+                } for user in users
+            ]
+        })
+
+
+class ExpenseTestCase(ExpenseFactoryMixin, TestCase):
+    """
+    Base test case with a few friends & a shared group. Celery runs tasks eagerly.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        celery_app.conf.task_always_eager = True
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(email=f"user{i}@split-x.test", password="pass123", username=f"user{i}")
+            for i in range(4)
+        ]
+        cls.owner = cls.users[0]
+        for friend in cls.users[1:]:
+            Friends.objects.create(user_1=cls.owner, user_2=friend)
+        cls.group = Group.objects.create(group_name="Trip", description="Trip expenses")
+        for user in cls.users:
+            GroupMember.objects.create(group=cls.group, member=user, is_owner=user == cls.owner)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+
+class BalanceLedgerTests(ExpenseTestCase):
+
+    def test_expense_creation_updates_ledger(self):
+        self.create_expense("100.00", group=self.group)
+        self.create_expense("40.00", users=self.users[:2])
+
+        self.assertEqual(ledger.find_drift(), [])
+        self.assertEqual(ledger.fetch_balance(lender_id=self.owner.id, group_id=self.group.id), Decimal("75.00"))
+        self.assertEqual(ledger.fetch_balance(lender_id=self.owner.id, borrower_id=self.users[1].id),
+                         Decimal("45.00"))
+
+    def test_settlement_reduces_ledger(self):
+        expense = self.create_expense("100.00", group=self.group)
+        split = expense.expensesplit_set.get(expense_user=self.users[1])
+        Settlement.objects.create(payment_id="pay_test", expense_split=split, amount=Decimal("25.00"))
+
+        success, _ = helpers.settle_expenses(
+            expense_ids=[expense.id], user_id=self.users[1].id, payment_id="pay_test",
+            amount=Decimal("25.00"), payment_status="Settled"
+        )
+
+        self.assertTrue(success)
+        self.assertEqual(ledger.find_drift(), [])
+        self.assertEqual(ledger.fetch_balance(borrower_id=self.users[1].id), Decimal("0.00"))
+        self.assertEqual(
+            sorted(Activity.objects.filter(verb="expense_settled").values_list("user_id", "comment")),
+            [(user.id, 'user1 paid user0 Rs 25.00 for "dinner"') for user in self.users[:2]]
+        )
+
+    def test_settlement_status_is_computed_per_split(self):
+        first = self.create_expense("100.00", users=self.users[:2])
+        second = self.create_expense("40.00", users=self.users[:2])
+        Settlement.objects.create(payment_id="pay_rows", expense_split=first.expensesplit_set.get(
+            expense_user=self.users[1]), amount=Decimal("20.00"))
+
+        success, _ = helpers.settle_expenses(
+            expense_ids=[first.id, second.id], user_id=self.users[1].id, payment_id="pay_rows",
+            amount=Decimal("20.00"), payment_status="Settled"
+        )
+
+        self.assertTrue(success)
+        splits = {split.expense_id: split for split in ExpenseSplit.objects.filter(expense_user=self.users[1])}
+        self.assertEqual((splits[first.id].balance_outstanding, splits[first.id].status), (Decimal("30.00"), "Pending"))
+        self.assertEqual((splits[second.id].balance_outstanding, splits[second.id].status), (Decimal("0.00"), "Paid"))
+        self.assertEqual(Settlement.objects.get(payment_id="pay_rows").status, "Settled")
+        self.assertEqual(ledger.find_drift(), [])
+
+    def test_repeated_settlement_callback_is_a_no_op(self):
+        expense = self.create_expense("100.00", users=self.users[:2])
+        split = expense.expensesplit_set.get(expense_user=self.users[1])
+        Settlement.objects.create(payment_id="pay_twice", expense_split=split, amount=Decimal("10.00"))
+
+        for payment_status in ("Settled", "Settled", "Failed"):
+            helpers.settle_expenses([expense.id], self.users[1].id, "pay_twice", Decimal("10.00"), payment_status)
+
+        split.refresh_from_db()
+        self.assertEqual(split.balance_outstanding, Decimal("40.00"))
+        self.assertEqual(Settlement.objects.get(payment_id="pay_twice").status, "Settled")
+        self.assertEqual(ledger.find_drift(), [])
+
+    def test_rebuild_command_repairs_drift(self):
+        self.create_expense("90.00", group=self.group, users=self.users[:3])
+        Balance.objects.all().delete()
+        self.assertNotEqual(ledger.find_drift(), [])
+
+        call_command("rebuild_balances", stdout=StringIO())
+
+        self.assertEqual(ledger.find_drift(), [])
+        call_command("rebuild_balances", check=True, stdout=StringIO())
+
+    def test_non_group_balances_are_unique_per_pair(self):
+        key = (self.owner.id, self.users[1].id, None)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Balance.objects.bulk_create([Balance.for_key(key, Decimal("1.00")), Balance.for_key(key, Decimal("2.00"))])
+
+    def test_balance_row_created_concurrently_is_updated_on_retry(self):
+        key = (self.owner.id, self.users[1].id, None)
+        locked_balances = ledger._locked_balances
+        # the row is committed by another writer after this one looked for it
+        Balance.for_key(key, Decimal("5.00")).save()
+        misses = [Balance.objects.none()]
+
+        with mock.patch("expenses.ledger._locked_balances",
+                        side_effect=lambda *args: misses.pop() if misses else locked_balances(*args)):
+            ledger.apply_deltas({key: Decimal("3.00")})
+
+        self.assertEqual(list(Balance.objects.values_list("group_key", "amount")), [(0, Decimal("8.00"))])
+
+
+class ExpenseListQueryTests(ExpenseTestCase):
+
+    def test_expense_list_query_count_is_constant(self):
+        for i in range(2):
+            self.create_expense("30.00", group=self.group, name=f"small-{i}")
+        with self.assertNumQueries(2):
+            response = self.client.get("/expense-app/expense/")
+        self.assertEqual(len(response.data["data"]["results"]), 2)
+
+        for i in range(8):
+            self.create_expense("30.00", group=self.group, name=f"large-{i}")
+        with self.assertNumQueries(2):
+            response = self.client.get("/expense-app/expense/")
+        self.assertEqual(len(response.data["data"]["results"]), 10)
+        self.assertEqual(len(response.data["data"]["results"][0]["owed_expenses"]), 3)
+
+    def test_group_expense_list_query_count_is_constant(self):
+        for i in range(12):
+            self.create_expense("30.00", group=self.group, name=f"group-{i}")
+        url = f"/expense-app/groups/{self.group.id}/expense-list/"
+
+        # permission check + page + prefetch, no COUNT unless asked for
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(len(response.data["data"]["results"]), 2)
+        self.assertIsNone(response.data["data"]["count"])
+
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {"page_size": 12, "count": "true"})
+        self.assertEqual(len(response.data["data"]["results"]), 12)
+        self.assertEqual(response.data["data"]["count"], 12)
+
+    def test_cursor_pages_cost_the_same_to_the_end(self):
+        for i in range(9):
+            self.create_expense("30.00", group=self.group, name=f"page-{i}")
+
+        seen = []
+        url = "/expense-app/expense/?page_size=2"
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            page = response.data["data"]
+            seen += [row["expense_name"] for row in page["results"]]
+            url = page["next"]
+
+        self.assertEqual(seen, [f"page-{i}" for i in range(9)])
+        previous = self.client.get(page["previous"]).data["data"]["results"]
+        self.assertEqual([row["expense_name"] for row in previous], ["page-6", "page-7"])
+
+
+class GroupListSummaryTests(ExpenseTestCase):
+
+    def test_group_list_summary_uses_one_aggregate(self):
+        groups = [self.group]
+        for i in range(14):
+            group = Group.objects.create(group_name=f"group-{i}", description="")
+            GroupMember.objects.bulk_create([GroupMember(group=group, member=user) for user in self.users])
+            groups.append(group)
+        for group in groups[:5]:
+            self.create_expense("40.00", group=group)
+        self.create_expense("20.00", group=groups[1], expense_by=self.users[1], users=self.users[:2])
+
+        # page + one grouped aggregate, whatever the page size
+        with self.assertNumQueries(2):
+            response = self.client.get("/expense-app/groups/", {"page_size": 100})
+
+        results = {row["group_id"]: row for row in response.data["data"]["results"]}
+        self.assertEqual(len(results), 15)
+        self.assertEqual(results[groups[1].id]["owed_expenses"], Decimal("30.00"))
+        self.assertEqual(results[groups[1].id]["borrowed_expenses"], Decimal("10.00"))
+        self.assertEqual(results[groups[-1].id]["owed_expenses"], 0)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, ExpenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(10):
+            self.create_expense(f"{40 + i}.00", group=self.group)
+            self.create_expense(f"{20 + i}.00", users=self.users[:2])
+        self.expense = Expense.objects.filter(group=self.group).first()
+        cache.clear()
+        local_users.clear()
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.owner).access_token}")
+
+    def test_views_stay_within_their_budgets(self):
+        group_url = f"/expense-app/groups/{self.group.id}/"
+        for path in ("/expense-app/groups/", group_url, group_url + "expense-list/", group_url + "settle-up/",
+                     "/expense-app/expense/", f"/expense-app/expense/{self.expense.id}/",
+                     f"/expense-app/expense/{self.owner.id}/expense-settlement/{self.expense.id}/"):
+            response = self.assertWithinQueryBudget(self.client.get(path))
+            self.assertEqual(response.status_code, 200, path)
+
+        self.assertWithinQueryBudget(self.client.post("/expense-app/groups/", {
+            "group_name": "Flat", "description": "", "member": [user.id for user in self.users[1:]]
+        }, format="json"))
+        self.assertWithinQueryBudget(self.client.patch(group_url, {"description": "Trip 2"}, format="json"))
+        response = self.assertWithinQueryBudget(
+            self.client.post("/expense-app/expense/", self.expense_serializer("90.00", group=self.group).initial_data,
+                             format="json"))
+        self.assertEqual(response.status_code, 201)
+
+    def test_server_timing_and_over_budget_requests_are_logged(self):
+        response = self.client.get("/expense-app/groups/")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+
+        with override_settings(QUERY_BUDGET_DEFAULT=0), self.assertLogs("splitwise_backend", "WARNING") as logs:
+            self.client.get("/friend/")
+        self.assertIn("over a budget of 0", logs.output[0])
+
+
+class QueueLoggingTests(TestCase):
+
+    def test_config_routes_every_logger_through_one_queue_handler(self):
+        config = queue_logging_config(settings.LOGGING, directory="/var/log/split-x")
+        self.assertEqual(list(config["handlers"]), ["queue"])
+        self.assertTrue(all(logger["handlers"] == ["queue"] for logger in config["loggers"].values()))
+        self.assertEqual(config["handlers"]["queue"]["file_names"]["splitwise_backend"], "splitwise_app")
+        # the settings themselves are left alone
+        self.assertIn("console", settings.LOGGING["handlers"])
+
+    def test_records_are_written_as_json_lines_by_the_listener(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = QueueListenerHandler(directory, file_names={"queue_test": "queued"}, console=False)
+            handler.setFormatter(JsonFormatter())
+            logger = logging.getLogger("queue_test.view")
+            logger.addHandler(handler)
+            try:
+                logger.warning("API VIEW - %s : ERROR", "EXPENSE LIST")
+                handler.stop()
+            finally:
+                logger.removeHandler(handler)
+                handler.close()
+
+            with open(os.path.join(directory, "queued.log")) as log_file:
+                entry = json.loads(log_file.readline())
+        self.assertEqual(entry["level"], "WARNING")
+        self.assertEqual(entry["logger"], "queue_test.view")
+        self.assertEqual(entry["msg"], "API VIEW - EXPENSE LIST : ERROR")
+
+    def test_processes_share_one_file_and_follow_external_rotation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # a worker & its replacement after a restart
+            handlers = [LoggerFileHandler(directory), LoggerFileHandler(directory)]
+            try:
+                for handler in handlers:
+                    handler.emit(logging.makeLogRecord({"name": "expenses", "msg": "before"}))
+                os.rename(os.path.join(directory, "expenses.log"), os.path.join(directory, "expenses.log.1"))
+                handlers[0].emit(logging.makeLogRecord({"name": "expenses", "msg": "after"}))
+            finally:
+                for handler in handlers:
+                    handler.close()
+
+            self.assertEqual(sorted(os.listdir(directory)), ["expenses.log", "expenses.log.1"])
+            with open(os.path.join(directory, "expenses.log.1")) as rotated, \
+                    open(os.path.join(directory, "expenses.log")) as current:
+                self.assertEqual((rotated.read().split(), current.read().split()), (["before", "before"], ["after"]))
+
+
+class SettleUpTests(ExpenseTestCase):
+
+    def test_simplify_debts_settles_every_position(self):
+        rng = random.Random(7)
+        positions = defaultdict(int)
+        for _ in range(100000):
+            lender, borrower, cents = rng.randrange(1000), rng.randrange(1000), rng.randint(1, 100000)
+            positions[lender] += cents
+            positions[borrower] -= cents
+        positions = {user_id: cents for user_id, cents in positions.items() if cents}
+
+        # timed by the benchmark_settle_up command, not here
+        transfers = simplification.simplify_debts(positions)
+
+        self.assertLessEqual(len(transfers), len(positions) - 1)
+        for debtor, creditor, cents in transfers:
+            self.assertGreater(cents, 0)
+            positions[debtor] += cents
+            positions[creditor] -= cents
+        self.assertFalse(any(positions.values()))
+
+    def test_settle_up_endpoint_nets_group_debts(self):
+        # owner paid 90 for users 0-2, user1 paid 60 for users 0-1 : user2 owes 30 & user1 owes 0 net
+        self.create_expense("90.00", group=self.group, users=self.users[:3])
+        self.create_expense("60.00", group=self.group, users=self.users[:2], expense_by=self.users[1])
+
+        response = self.client.get(f"/expense-app/groups/{self.group.id}/settle-up/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"], [{
+            "from_user": self.users[2].id, "to_user": self.owner.id, "amount": "30.00",
+            "from_username": "user2", "to_username": "user0",
+        }])
+
+
+class BulkSplitCreationTests(ExpenseTestCase):
+
+    def test_split_insert_cost_does_not_grow_with_participants(self):
+        friends = [
+            User.objects.create_user(email=f"friend{i}@split-x.test", password="pass123", username=f"friend{i}")
+            for i in range(20)
+        ]
+        for friend in friends:
+            Friends.objects.create(user_1=self.owner, user_2=friend)
+
+        small = self.expense_serializer("30.00", users=self.users[:2])
+        large = self.expense_serializer("300.00", users=[self.owner] + friends)
+        small.is_valid(raise_exception=True)
+        large.is_valid(raise_exception=True)
+
+        # savepoint, expense insert, splits bulk insert, ledger savepoint, lock, insert & release, outbox insert,
+        # activity insert, release
+        with self.assertNumQueries(10):
+            small.save()
+        with self.assertNumQueries(10):
+            large.save()
+        self.assertEqual(large.instance.expensesplit_set.count(), 21)
+
+    def test_expense_notifications_are_queued_in_the_outbox(self):
+        with mock.patch("expenses.utils.send_email_notification.apply_async") as apply_async:
+            self.create_expense("100.00")
+
+        apply_async.assert_not_called()
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.values_list("email", flat=True)),
+            sorted(u.email for u in self.users)
+        )
+
+
+class ExpenseImportTests(ExpenseTestCase):
+
+    def test_csv_import_reports_row_errors_without_aborting(self):
+        stranger = User.objects.create_user(email="stranger@split-x.test", password="pass123", username="stranger")
+        u = [user.id for user in self.users]
+        content = "\n".join([
+            "name,balance_amt,expense_by,group,split_type,splits",
+            f"cab,90,{u[0]},,Equal,{u[0]}|{u[1]}|{u[2]}",
+            f"rent,100,{u[0]},{self.group.id},Exact,{u[0]}:40|{u[3]}:60",
+            f"bad-friend,10,{u[0]},,Equal,{u[0]}|{stranger.id}",
+            f"bad-sum,100,{u[0]},,Exact,{u[0]}:10|{u[1]}:10",
+            f"no-payer,100,,,Equal,{u[1]}|{u[2]}",
+        ])
+        upload = SimpleUploadedFile("expenses.csv", content.encode(), content_type="text/csv")
+
+        response = self.client.post("/expense-app/expense/import/", {"file": upload}, format="multipart")
+
+        data = response.data["data"]
+        self.assertEqual((data["imported"], data["failed"]), (2, 3))
+        self.assertEqual([error["row"] for error in data["errors"]], [4, 5, 6])
+        self.assertEqual(Expense.objects.filter(name__in=["cab", "rent"]).count(), 2)
+        self.assertEqual(ledger.fetch_balance(lender_id=u[0], borrower_id=u[3]), Decimal("60.00"))
+        self.assertEqual(ledger.find_drift(), [])
+
+    def test_jsonl_import_command_writes_in_chunks(self):
+        rows = [
+            {"name": f"import-{i}", "balance_amt": "30", "expense_by": self.owner.id, "group": self.group.id,
+             "splits": [{"expense_user": user.id} for user in self.users[:3]]}
+            for i in range(25)
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as source:
+            source.write("\n".join(json.dumps(row) for row in rows) + "\nnot json\n")
+        self.addCleanup(os.remove, source.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_expenses", source.name, chunk_size=10, stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 25 expenses, 1 rows failed", stdout.getvalue())
+        self.assertIn("row 26", stderr.getvalue())
+        self.assertEqual(ledger.fetch_balance(lender_id=self.owner.id, group_id=self.group.id), Decimal("500.00"))
+
+    def test_non_object_lines_and_undecodable_streams_are_reported(self):
+        errors = []
+        row = json.dumps({"name": "cab", "balance_amt": "20", "expense_by": self.owner.id,
+                          "splits": [{"expense_user": user.id} for user in self.users[:2]]})
+        importer = ExpenseImporter(on_error=lambda row_number, detail: errors.append(row_number))
+
+        summary = importer.run([row + "\n", "123\n", "[1]\n", '"x"\n', row + "\n"], "jsonl")
+
+        self.assertEqual(summary, {"imported": 2, "failed": 3})
+        self.assertEqual(errors, [2, 3, 4])
+
+        errors.clear()
+        lines = [b"name,balance_amt,expense_by,group,split_type,splits\n",
+                 f"cab,20,{self.owner.id},,Equal,{self.owner.id}|{self.users[1].id}\n".encode(), b"\xff\xfe,1\n"]
+        summary = ExpenseImporter(on_error=lambda row_number, detail: errors.append(row_number)).run(
+            codecs.iterdecode(lines, "utf-8"), "csv"
+        )
+        self.assertEqual(summary, {"imported": 1, "failed": 1})
+        self.assertEqual(errors, [3])
+
+    def test_expenses_are_bulk_inserted_without_returned_ids(self):
+        # payers alternate, so a one-entry friend set LRU keeps evicting
+        pairs = [(self.owner, self.users[2]), (self.users[1], self.owner)]
+        rows = [
+            json.dumps({"name": f"bulk-{i}", "balance_amt": "20", "expense_by": pairs[i % 2][0].id,
+                        "splits": [{"expense_user": user.id} for user in pairs[i % 2]]})
+            for i in range(25)
+        ]
+        # MySQL can't return ids from a bulk insert
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False), \
+                CaptureQueriesContext(connection) as queries:
+            importer = ExpenseImporter(chunk_size=10, lookup_cache_size=1)
+            summary = importer.run(rows, "jsonl")
+
+        self.assertEqual(summary, {"imported": 25, "failed": 0})
+        self.assertEqual(len(importer._friends), 1)
+        expense_inserts = [query for query in queries.captured_queries
+                           if query["sql"].startswith('INSERT INTO "expenses_expense"')]
+        self.assertEqual(len(expense_inserts), 3)
+        for expense in Expense.objects.filter(name__startswith="bulk-"):
+            payer, friend = pairs[int(expense.name.split("-")[1]) % 2]
+            self.assertEqual(expense.expense_by_id, payer.id)
+            self.assertEqual(sorted(expense.expensesplit_set.values_list("expense_user_id", flat=True)),
+                             sorted([payer.id, friend.id]))
+        self.assertEqual(ledger.find_drift(), [])
+
+
+class NotificationOutboxTests(ExpenseTestCase):
+
+    def test_drain_deduplicates_and_marks_rows_sent(self):
+        reminder = dict(email="friend@split-x.test", subject="Reminder", message="Please settle")
+        NotificationOutbox.enqueue([reminder, reminder, dict(reminder, message="Another")])
+
+        result = outbox.drain(batch_size=2)
+
+        self.assertEqual(result, {"sent": 3, "failed": 0})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(NotificationOutbox.objects.exclude(status="Sent").exists())
+
+    def test_failed_delivery_is_retried_then_given_up(self):
+        NotificationOutbox.enqueue([dict(email="friend@split-x.test", subject="Reminder", message="Please settle")])
+
+        with mock.patch("expenses.outbox.EmailMultiAlternatives.send", side_effect=OSError("smtp down")):
+            for _ in range(5):
+                outbox.drain()
+
+        row = NotificationOutbox.objects.get()
+        self.assertEqual((row.status, row.attempts), ("Failed", 5))
+
+    def test_unreachable_mail_server_fails_the_whole_batch(self):
+        reminder = dict(email="friend@split-x.test", subject="Reminder", message="Please settle")
+        NotificationOutbox.enqueue([reminder, dict(reminder, message="Another")])
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.open", side_effect=OSError("smtp down")):
+            for _ in range(5):
+                self.assertEqual(outbox.drain(), {"sent": 0, "failed": 2})
+
+        self.assertEqual(set(NotificationOutbox.objects.values_list("status", "attempts")), {("Failed", 5)})
+
+    def test_message_sent_in_an_earlier_batch_is_not_sent_again(self):
+        reminder = dict(email="friend@split-x.test", subject="Reminder", message="Please settle")
+        NotificationOutbox.enqueue([reminder, reminder])
+
+        self.assertEqual(outbox.drain(batch_size=1), {"sent": 2, "failed": 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+        # queued after the last send : a new message
+        NotificationOutbox.enqueue([reminder])
+        outbox.drain()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_invite_only_writes_to_the_outbox(self):
+        with mock.patch("django.core.mail.EmailMessage.send") as send:
+            response = self.client.post("/users/invite/", {"email": "new@split-x.test"}, format="json")
+
+        self.assertEqual(response.status_code, 202)
+        send.assert_not_called()
+        self.assertTrue(NotificationOutbox.objects.filter(email="new@split-x.test").exists())
+
+
+class WeeklyReminderTests(ExpenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_expense("90.00", group=self.group, users=self.users[:3])
+        self.create_expense("40.00", users=self.users[:2])
+        self.create_expense("60.00", group=self.group, users=self.users[1:3], expense_by=self.users[2])
+        NotificationOutbox.objects.all().delete()
+
+    @mock.patch.object(app_constants, "REMINDER_CHUNK_SIZE", 1)
+    def test_one_digest_per_borrower_and_reruns_do_not_resend(self):
+        tasks.weeekly_notification_task(run_key="2026-W01")
+        tasks.weeekly_notification_task(run_key="2026-W01")
+
+        digests = {row.email: row.message for row in NotificationOutbox.objects.all()}
+        self.assertEqual(set(digests), {self.users[1].email, self.users[2].email})
+        self.assertIn("- 50.00 rs to User0", digests[self.users[1].email])
+        self.assertIn("- 30.00 rs to User2", digests[self.users[1].email])
+        self.assertEqual(ReminderRun.objects.get(run_key="2026-W01").chunks.count(), 2)
+
+    def test_crashed_run_resumes_after_cursor(self):
+        ReminderRun.objects.create(run_key="2026-W02", cursor=self.users[1].id)
+
+        tasks.weeekly_notification_task(run_key="2026-W02")
+
+        self.assertEqual(list(NotificationOutbox.objects.values_list("email", flat=True)), [self.users[2].email])
+
+
+class ExpenseStatusQueueTests(ExpenseTestCase):
+
+    def test_settlements_are_coalesced_into_one_recompute(self):
+        paid = self.create_expense("20.00", users=self.users[:2])
+        open_expense = self.create_expense("40.00", users=self.users[:2])
+        split = paid.expensesplit_set.get(expense_user=self.users[1])
+        Settlement.objects.create(payment_id="pay_status", expense_split=split, amount=split.amount)
+        helpers.settle_expenses([paid.id], self.users[1].id, "pay_status", split.amount, "Settled")
+
+        for expense_ids in ([paid.id], [paid.id, open_expense.id], [paid.id]):
+            self.assertTrue(status_queue.enqueue(expense_ids))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(helpers.update_expense_status(), 1)
+        statements = [query["sql"].split()[0] for query in queries.captured_queries
+                      if "expenses_expense" in query["sql"]]
+        self.assertEqual(statements, ["SELECT", "UPDATE"])
+        self.assertEqual(Expense.objects.get(id=paid.id).status, "Paid")
+        self.assertEqual(Expense.objects.get(id=open_expense.id).status, "Pending")
+        self.assertEqual(status_queue.pop(), [])
+
+
+class ExpenseSearchTests(ExpenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.trip = [self.create_expense(f"{30 + i}.00", group=self.group, name=f"Airport cab {i}") for i in range(3)]
+        self.dinner = self.create_expense("40.00", users=self.users[:2], name="Team dinner")
+        self.create_expense("40.00", group=self.group, users=self.users[1:], expense_by=self.users[1], name="Cab home")
+
+    def search(self, **params):
+        response = self.client.get("/expense-app/expense/search/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["data"]
+
+    def test_filters_narrow_the_users_expenses(self):
+        ids = lambda data: [expense["expense_id"] for expense in data["results"]]
+        everything = [self.dinner.id] + [expense.id for expense in reversed(self.trip)]
+
+        self.assertEqual(ids(self.search()), everything)
+        self.assertEqual(ids(self.search(q="cab")), [expense.id for expense in reversed(self.trip)])
+        self.assertEqual(ids(self.search(name="DINN")), [self.dinner.id])
+        self.assertEqual(ids(self.search(group=self.group.id, counterparty=self.users[3].id)), everything[1:])
+        self.assertEqual(ids(self.search(counterparty=self.users[1].id, status="Pending")), everything)
+
+        Expense.objects.filter(id=self.dinner.id).update(created_on=timezone.now() - timedelta(days=10))
+        self.assertEqual(ids(self.search(created_before=(timezone.now() - timedelta(days=1)).date().isoformat())),
+                         [self.dinner.id])
+        self.assertEqual(ids(self.search(created_after=(timezone.now() - timedelta(days=1)).isoformat())),
+                         everything[1:])
+
+    def test_results_are_cursor_paginated(self):
+        first = self.search(page_size=3)
+        self.assertEqual(len(first["results"]), 3)
+        self.assertIsNone(first["count"])
+        second = self.client.get(first["next"]).data["data"]
+        self.assertEqual([expense["expense_id"] for expense in second["results"]], [self.trip[0].id])
+        self.assertIsNone(second["next"])
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get("/expense-app/expense/search/", {"status": "Lost", "created_after": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data["data"]), {"status", "created_after"})
+
+    def test_fulltext_query_keeps_indexed_words(self):
+        self.assertEqual(search.fulltext_query("The cab to Air-port!"), "+cab* +air* +port*")
+        self.assertEqual(search.fulltext_query("to a"), "")
+
+
+@override_settings(METRICS_FLUSH_SECONDS=0, METRICS_TOKEN="scrape-token")
+class MetricsTests(ExpenseTestCase):
+
+    def scrape(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_view_and_task_metrics_are_exported(self):
+        self.client.get("/expense-app/groups/")
+        self.client.get("/expense-app/groups/")
+        helpers.update_expense_status.delay(expenses=[])
+
+        with mock.patch.object(metrics_utils.NOTIFICATION_QUEUE_LENGTH, "collect", return_value=3):
+            body = self.scrape()
+        self.assertIn('splitx_http_request_duration_seconds_count{view="groups-list",method="GET",status="200"} 2',
+                      body)
+        self.assertIn('splitx_http_request_duration_seconds_bucket{view="groups-list",method="GET",status="200",'
+                      'le="+Inf"} 2', body)
+        self.assertIn('splitx_celery_task_duration_seconds_count{task="expenses.helpers.update_expense_status",'
+                      'state="SUCCESS"} 1', body)
+        self.assertIn("splitx_notification_queue_length 3", body)
+
+    def test_unreachable_broker_leaves_the_gauge_out(self):
+        with mock.patch.object(metrics_utils.NOTIFICATION_QUEUE_LENGTH, "collect", side_effect=OSError("down")), \
+                self.assertLogs("splitwise_backend", "ERROR"):
+            body = self.scrape()
+        self.assertIn("# TYPE splitx_notification_queue_length gauge", body)
+        self.assertIsNone(re.search(r"^splitx_notification_queue_length ", body, re.MULTILINE))
+
+    def test_scrape_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+    def test_histogram_fields_are_flushed_together(self):
+        registry = metrics_utils.MetricsRegistry()
+        histogram = registry.histogram("test_duration_seconds", "Test.", ("view",))
+        flushed = []
+        with mock.patch.object(registry, "flush", side_effect=lambda: flushed.append(dict(registry._pending))):
+            histogram.observe(0.2, view="groups-list")
+
+        self.assertEqual(len(flushed), 1)
+        self.assertEqual(sorted(field for _, field in flushed[0]),
+                         ['["groups-list", "0.25"]', '["groups-list", "count"]', '["groups-list", "sum"]'])
+
+    def test_scrape_without_redis_renders_pending_values_and_gauges(self):
+        registry = metrics_utils.MetricsRegistry()
+        counter = registry.counter("test_total", "Test.", ("view",))
+        registry.gauge("test_queue_length", "Test.", lambda: 3)
+        with mock.patch.object(metrics_utils, "get_redis_connection", side_effect=ConnectionError("redis down")), \
+                self.assertLogs("splitwise_backend", "ERROR"):
+            counter.inc(view="groups-list")
+            body = registry.render()
+
+        self.assertIn('test_total{view="groups-list"} 1', body)
+        self.assertIn("test_queue_length 3", body)
+
+    def test_async_observations_flush_off_the_event_loop(self):
+        registry = metrics_utils.MetricsRegistry()
+        histogram = registry.histogram("test_duration_seconds", "Test.", ("view",))
+        flush_threads = []
+
+        async def observe():
+            with mock.patch.object(registry, "flush", side_effect=lambda: flush_threads.append(
+                    threading.get_ident())):
+                histogram.observe(0.2, view="groups-list")
+                await asyncio.sleep(0.05)
+            return threading.get_ident()
+
+        with override_settings(METRICS_FLUSH_SECONDS=0):
+            loop_thread = asyncio.run(observe())
+
+        self.assertEqual(len(flush_threads), 1)
+        self.assertNotEqual(flush_threads[0], loop_thread)
+
+
+class PaymentLinkTests(ExpenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.expense = self.create_expense("40.00", users=self.users[:2])
+        self.client.force_authenticate(self.users[1])
+
+    def test_valid_link_loads_settlement_in_one_query(self):
+        response = self.client.post("/expense-app/get-payment-link/", {
+            "expense_id": self.expense.id, "amount": "5.00", "user_id": self.users[1].id
+        }, format="json")
+        link = response.data["data"]["payment_link"]
+
+        with self.assertNumQueries(1):
+            response = APIClient().get(link.replace(settings.BASE_URL, ""))
+        self.assertTemplateUsed(response, "payment-summary.html")
+        self.assertContains(response, Settlement.objects.get().payment_id)
+
+    def test_bad_links_are_rejected_without_queries(self):
+        split = self.expense.expensesplit_set.get(expense_user=self.users[1])
+        payment_id = helpers.create_pending_settlement({"expense_split": split, "amount": Decimal("5.00")})
+        token = utils.generate_payment_token(payment_id, self.users[1].id, self.expense.id, "5.00")
+        expired = utils.generate_payment_token(payment_id, self.users[1].id, self.expense.id, "5.00", expires_in=-1)
+        forged = signing.dumps(signing.loads(token, key=settings.PAYMENT_SIMULATOR_SECRET_KEY,
+                                             salt=app_constants.PAYMENT_LINK_SALT),
+                               key="not-the-secret", salt=app_constants.PAYMENT_LINK_SALT)
+
+        for bad_token in (token[:-2] + "xx", expired, forged, "pay_0123456789abcdef"):
+            with self.assertNumQueries(0):
+                response = APIClient().get(f"/expense-app/payment-summary/{bad_token}")
+            self.assertTemplateUsed(response, "invalid-link.html")
+
+
+class SyntheticDatasetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generated_dataset_is_consistent_and_benchmarkable(self):
+        call_command("generate_dataset", users=30, groups=5, expenses=200, stdout=StringIO())
+
+        self.assertEqual(User.objects.filter(email__startswith="synthetic").count(), 30)
+        self.assertEqual(Expense.objects.filter(name__startswith="synthetic expense ").count(), 200)
+        self.assertEqual(set(ExpenseSplit.objects.values_list('split_type', flat=True)),
+                         {"Equal", "Exact", "Percentage"})
+        self.assertTrue(Settlement.objects.filter(status="Settled").exists())
+        self.assertEqual(ledger.find_drift(), [])
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command("benchmark_endpoints", iterations=2, warmup=0, only="groups", output=output,
+                         stdout=StringIO())
+            with open(output) as results:
+                endpoints = json.load(results)["endpoints"]
+        self.assertIn("GET groups-list", endpoints)
+        self.assertEqual(endpoints["GET groups-list"]["status"], {"200": 2})
+        self.assertEqual(Expense.objects.filter(name__startswith="synthetic expense ").count(), 200)
+
+
+class FriendSetTests(ExpenseTestCase):
+
+    def test_group_creation_loads_friend_set_once(self):
+        friends = [
+            User.objects.create_user(email=f"member{i}@split-x.test", password="pass123", username=f"member{i}")
+            for i in range(30)
+        ]
+        for friend in friends:
+            Friends.objects.create(user_1=friend, user_2=self.owner)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/expense-app/groups/", {
+                "group_name": "Big trip", "description": "Road trip", "member": [friend.id for friend in friends]
+            }, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        friend_queries = [q for q in queries.captured_queries if 'FROM "users_friends"' in q["sql"]
+                          or "FROM `users_friends`" in q["sql"]]
+        self.assertEqual(len(friend_queries), 1)
+        self.assertEqual(GroupMember.objects.filter(group__group_name="Big trip").count(), 31)
+
+
+
+class SummaryCacheTests(ExpenseTestCase):
+
+    def test_group_detail_is_cached_until_membership_changes(self):
+        url = f"/expense-app/groups/{self.group.id}/"
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["data"]["members"]), 4)
+
+        other = Group.objects.create(group_name="Flat", description="Rent")
+        newcomer = User.objects.create_user(email="new@split-x.test", password="pass123", username="newcomer")
+        Friends.objects.create(user_1=self.owner, user_2=newcomer)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer = GroupMemberSerializer(data={"group": self.group.id, "member": [newcomer.id]},
+                                                       context={"owner_id": self.owner.id})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        response = self.client.get(url)
+        self.assertIn("newcomer", response.data["data"]["members"])
+        self.assertEqual(self.client.get(f"/expense-app/groups/{other.id}/").status_code, 404)
+
+    def test_expense_and_group_summaries_follow_settlements(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = self.create_expense("40.00", group=self.group)
+        detail_url = f"/expense-app/expense/{expense.id}/"
+        self.client.get(detail_url)
+        self.client.get("/expense-app/groups/")
+        with self.assertNumQueries(0):
+            self.client.get(detail_url)
+            response = self.client.get("/expense-app/groups/")
+        self.assertEqual(response.data["data"]["results"][0]["owed_expenses"], Decimal("30.00"))
+
+        split = expense.expensesplit_set.get(expense_user=self.users[1])
+        Settlement.objects.create(payment_id="pay_cache", expense_split=split, amount=split.amount)
+        with self.captureOnCommitCallbacks(execute=True):
+            helpers.settle_expenses([expense.id], self.users[1].id, "pay_cache", split.amount, "Settled")
+
+        response = self.client.get(detail_url)
+        balances = {split["name"]: split["balance"] for split in response.data["data"]["splits"]}
+        self.assertEqual(balances["user1"], "0.00")
+        response = self.client.get("/expense-app/groups/")
+        self.assertEqual(response.data["data"]["results"][0]["owed_expenses"], Decimal("20.00"))
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"built": True}
+
+        threads = [threading.Thread(target=summary_cache.read_through, args=("summary:test", builder))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(summary_cache.read_through("summary:test", builder), {"built": True})
+        self.assertEqual(len(calls), 1)
+
+    def test_builder_errors_propagate_without_a_rebuild(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            raise Group.DoesNotExist()
+
+        with self.assertRaises(Group.DoesNotExist):
+            summary_cache.read_through("summary:failing", builder)
+        self.assertEqual(len(calls), 1)
+        # the build lock was released
+        self.assertIsNone(cache.get("summary:failing" + summary_cache.LOCK_SUFFIX))
+
+
+class AsyncReadTests(ExpenseFactoryMixin, TransactionTestCase):
+    """
+    Async views query from worker threads, so data must be committed for them to see it
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(email=f"async{i}@split-x.test", password="pass123", username=f"async{i}")
+            for i in range(3)
+        ]
+        self.owner = self.users[0]
+        self.group = Group.objects.create(group_name="Async", description="Async trip")
+        for friend in self.users[1:]:
+            Friends.objects.create(user_1=self.owner, user_2=friend)
+        for user in self.users:
+            GroupMember.objects.create(group=self.group, member=user)
+        self.expense = self.create_expense("30.00", group=self.group)
+        token = RefreshToken.for_user(self.owner).access_token
+        self.client = AsyncClient()
+        self.auth = {"authorization": f"Bearer {token}"}
+
+    async def test_group_summary_and_balances(self):
+        response = await self.client.get(f"/expense-app/async/groups/{self.group.id}/summary/", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(sorted(data["members"]), ["async0", "async1", "async2"])
+        self.assertEqual((data["owed_expenses"], data["borrowed_expenses"]), (20.0, 0.0))
+
+        response = await self.client.get("/expense-app/async/balances/", **self.auth)
+        data = response.json()["data"]
+        self.assertEqual(data["owed_expenses"], 20.0)
+        self.assertEqual([row["name"] for row in data["owed_by"]], ["async1", "async2"])
+
+    def test_asgi_middleware_chain_stays_async(self):
+        chain = ASGIHandler()._middleware_chain
+        self.assertNotIsInstance(chain, SyncToAsync)
+        self.assertTrue(asyncio.iscoroutinefunction(chain))
+
+    async def test_query_budget_is_reported_under_asgi(self):
+        response = await self.client.get(f"/expense-app/async/groups/{self.group.id}/summary/", **self.auth)
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    async def test_expense_detail_and_auth(self):
+        response = await self.client.get(f"/expense-app/async/expense/{self.expense.id}/", **self.auth)
+        self.assertEqual(len(response.json()["data"]["splits"]), 3)
+
+        response = await self.client.get(f"/expense-app/async/expense/{self.expense.id + 100}/", **self.auth)
+        self.assertEqual(response.status_code, 404)
+        response = await self.client.get("/expense-app/async/balances/")
+        self.assertEqual(response.status_code, 401)
+
+
+def full_table_scans(sql: str) -> list:
+    """
+    EXPLAIN `sql` on the test database & return the tables it reads with a full table scan
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+            return [m.group(1) for m in map(re.compile(r"^SCAN (?:TABLE )?(\w+)$").match, details) if m]
+        cursor.execute(f"EXPLAIN {sql}")
+        if connection.vendor == "mysql":
+            columns = [col[0] for col in cursor.description]
+            plans = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return [plan["table"] for plan in plans if plan["type"] == "ALL"]
+        return re.findall(r"Seq Scan on (\w+)", "\n".join(row[0] for row in cursor.fetchall()))
+
+
+class QueryPlanTests(ExpenseTestCase):
+    """
+    Every query issued by the helpers in expenses/helpers.py & users/serializers.py must be served by an index
+    once the tables hold a realistic amount of data.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rng = random.Random(7)
+        User.objects.bulk_create([
+            User(email=f"seed{i}@split-x.test", username=f"seed{i}", mobile=f"90000{i:05d}", password="!")
+            for i in range(200)
+        ])
+        people = list(User.objects.order_by("id"))
+        for i, user in enumerate(people[4:120]):
+            Friends.objects.create(user_1=user, user_2=people[4 + (i + 1) % 196])
+
+        Group.objects.bulk_create([Group(group_name=f"seed-{i}", description="") for i in range(50)])
+        groups = list(Group.objects.filter(group_name__startswith="seed-"))
+        GroupMember.objects.bulk_create([
+            GroupMember(group=group, member=member) for group in groups for member in rng.sample(people, 6)
+        ])
+
+        Expense.objects.bulk_create([
+            Expense(name=f"seed-{i}", balance_amt=Decimal("40.00"), expense_by=rng.choice(people),
+                    group=rng.choice(groups + [None]))
+            for i in range(500)
+        ])
+        splits = [
+            ExpenseSplit(expense=expense, expense_user=user, amount=Decimal("10.00"),
+                         balance_outstanding=Decimal("0.00") if user == expense.expense_by else Decimal("10.00"),
+                         status="Paid" if user == expense.expense_by else "Pending")
+            for expense in Expense.objects.select_related("expense_by").filter(name__startswith="seed-")
+            for user in [expense.expense_by] + rng.sample(people, 3)
+        ]
+        ExpenseSplit.objects.bulk_create(splits)
+        Settlement.objects.bulk_create([
+            Settlement(payment_id=f"pay_seed{i}", expense_split=split, amount=split.amount, status="Settled")
+            for i, split in enumerate(ExpenseSplit.objects.order_by("id")[:400])
+        ])
+        ledger.rebuild_balances()
+
+        if connection.vendor == "mysql":
+            with connection.cursor() as cursor:
+                for model in (User, Friends, Group, GroupMember, Expense, ExpenseSplit, Settlement, Balance):
+                    cursor.execute(f"ANALYZE TABLE {model._meta.db_table}")
+
+    def setUp(self):
+        super().setUp()
+        self.request = mock.Mock(user=self.owner)
+        self.expense = self.create_expense("40.00", group=self.group)
+
+    def assertIndexedQueries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            result = func(*args, **kwargs)
+            if hasattr(result, "__iter__") and not isinstance(result, (str, dict)):
+                result = list(result)
+        statements = [q["sql"] for q in queries.captured_queries if q["sql"].lstrip().upper().startswith(
+            ("SELECT", "UPDATE", "DELETE"))]
+        self.assertTrue(statements, f"{func.__name__} issued no queries")
+        for sql in statements:
+            self.assertEqual(full_table_scans(sql), [], f"{func.__name__} : full table scan in {sql}")
+        return result
+
+    def test_unindexed_filter_is_reported(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(Expense.objects.filter(name="seed-1"))
+        self.assertEqual(full_table_scans(queries.captured_queries[0]["sql"]), [Expense._meta.db_table])
+
+    def test_group_helpers_use_indexes(self):
+        self.assertIndexedQueries(helpers.fetch_user_groups, self.request)
+        self.assertIndexedQueries(helpers.fetch_user_groups, self.request, group_id=self.group.id)
+        self.assertIndexedQueries(helpers.fetch_group_members, self.group.id)
+        self.assertIndexedQueries(helpers.fetch_settle_up_suggestions, self.group.id)
+        self.assertIndexedQueries(helpers.fetch_group_expenses, self.group, self.request)
+        self.assertIndexedQueries(helpers.fetch_groups_summary, [self.group], self.request)
+
+    def test_expense_helpers_use_indexes(self):
+        self.assertIndexedQueries(lambda: helpers.fetch_expense_list_data(
+            helpers.fetch_user_expense(self.request), self.request))
+        self.assertIndexedQueries(lambda: helpers.fetch_expense_list_data(
+            helpers.fetch_user_expense(self.request, group_id=self.group.id), self.request))
+        self.assertIndexedQueries(helpers.fetch_user_expense, self.request, expense_id=self.expense.id)
+        self.assertIndexedQueries(lambda: [list(splits) for splits in helpers.fetch_expense_split(
+            self.expense, self.request)])
+        self.assertIndexedQueries(helpers.fetch_expense_split_details, self.expense)
+        self.assertIndexedQueries(helpers.notify_user_about_debit, self.owner, self.users[1].id)
+
+    def test_expense_search_uses_indexes(self):
+        start = timezone.now() - timedelta(days=7)
+        for filters in ({}, {"counterparty": self.users[1].id}, {"group": self.group.id},
+                        {"group": self.group.id, "status": "Pending"}, {"created_after": start},
+                        {"created_after": start, "created_before": timezone.now(), "counterparty": self.users[2].id},
+                        {"name": "seed", "status": "Paid"}, {"q": "seed"}):
+            self.assertIndexedQueries(lambda: search.search_user_expenses(self.owner.id, filters).order_by('-id')[:10])
+
+    def test_settlement_helpers_use_indexes(self):
+        split = self.expense.expensesplit_set.get(expense_user=self.users[1])
+        payment_id = helpers.create_pending_settlement({"expense_split": split, "amount": split.amount})
+
+        self.assertIndexedQueries(helpers.get_payment_data, payment_id)
+        self.assertIndexedQueries(helpers.settle_expenses, [self.expense.id], self.users[1].id, payment_id,
+                                  split.amount, "Settled")
+        self.assertIndexedQueries(helpers.update_expense_status, expenses=[self.expense.id])
+        self.assertIndexedQueries(helpers.fetch_user_settlements_for_expense, self.users[1].id, self.expense.id)
+
+    def test_user_serializers_use_indexes(self):
+        login = LoginSerializer(data={"email": self.owner.email, "password": "pass123"})
+        self.assertIndexedQueries(login.is_valid)
+
+        friend = FriendSerializer(data={"user_1_id": self.owner.id, "email": "seed42@split-x.test"})
+        self.assertIndexedQueries(friend.is_valid)
+        self.assertIndexedQueries(friend.save)
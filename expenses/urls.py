@@ -13,5 +13,9 @@ router.register('reminder', expense_views.ReminderViewSet, basename='reminders')
 urlpatterns = [
     path('', include(router.urls)),
     path('get-payment-link/', expense_views.PaymentSimulator.as_view(), name='generate-payment-link'),
-    path('payment-summary/<str:payment_uid>', expense_views.PaymentSummary.as_view(), name='payment-summary')
+    path('payment-summary/<str:token>', expense_views.PaymentSummary.as_view(), name='payment-summary'),
+    # async read endpoints, served natively by the ASGI entry point (splitwise_app.asgi)
+    path('async/groups/<int:group_id>/summary/', expense_views.group_summary, name='async-group-summary'),
+    path('async/expense/<int:expense_id>/', expense_views.expense_detail, name='async-expense-detail'),
+    path('async/balances/', expense_views.user_balances, name='async-user-balances'),
 ]
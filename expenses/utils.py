@@ -1,10 +1,12 @@
-import hashlib
-import hmac
+import time
 
 from celery import shared_task
+from django.core import signing
 from django.core.mail import send_mail
 from django.conf import settings
 
+from expenses.common import constants as app_constants
+
 
 @shared_task(bind=True, queue=settings.NOTIFICATION_QUEUE)
 def send_email_notification(self, **kwargs):
@@ -17,11 +19,30 @@ def send_email_notification(self, **kwargs):
     send_mail(subject, message, settings.EMAIL_HOST_USER, [email])
 
 
-def generate_hmac_signature(user_id, expense_id, payment_uid, secret_key):
-    message = f"{user_id}:{expense_id}:{payment_uid}"
-    return hmac.new(secret_key.encode(), message.encode(), hashlib.sha256).hexdigest()
+def generate_payment_token(payment_uid, user_id, expense_id, amount, expires_in=None):
+    """
+    Helper to sign a self-contained payment link token. Everything needed to reject a forged or expired
+    link is inside the token, so it can be checked without touching the database.
+    """
+    expires_in = expires_in or app_constants.PAYMENT_LINK_TTL
+    payload = {
+        "payment_id": payment_uid,
+        "user_id": int(user_id),
+        "expense_id": int(expense_id),
+        "amount": str(amount),
+        "exp": int(time.time()) + expires_in,
+    }
+    return signing.dumps(payload, key=settings.PAYMENT_SIMULATOR_SECRET_KEY, salt=app_constants.PAYMENT_LINK_SALT)
 
 
-def verify_hmac_signature(user_id, expense_id, payment_uid, provided_signature, secret_key):
-    expected_signature = generate_hmac_signature(user_id, expense_id, payment_uid, secret_key)
-    return hmac.compare_digest(expected_signature, provided_signature)
+def load_payment_token(token):
+    """
+    Helper to verify a payment link token. Returns its payload, or None if it's forged, malformed or expired.
+    """
+    try:
+        payload = signing.loads(token, key=settings.PAYMENT_SIMULATOR_SECRET_KEY, salt=app_constants.PAYMENT_LINK_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get("exp", 0) < time.time():
+        return None
+    return payload
@@ -1,4 +1,5 @@
 from .groups import GroupAPIView
 from .payment_reminder import ReminderViewSet
 from .settlements import SettlementViewSet, PaymentSimulator, PaymentSummary
-from .expenses import ExpenseViewSet
\ No newline at end of file
+from .expenses import ExpenseViewSet
+from .balances import group_summary, expense_detail, user_balances
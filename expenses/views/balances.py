@@ -0,0 +1,103 @@
+import functools
+import logging
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+
+from expenses import async_helpers
+from expenses.common import messages as app_messages
+from splitwise_app.utils.response_util import JsonResponseHandler
+from splitwise_app.utils.throttle_utils import RedisUserRateThrottle
+from users.authentication import CachedJWTAuthentication
+
+logger = logging.getLogger('expenses')
+
+
+def _authenticate_and_throttle(request):
+    """
+    JWT authentication & user rate throttle, same as the DRF views. Returns an error response or None.
+    """
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if not authenticated:
+        return JsonResponseHandler.failure(message=app_messages.AUTHENTICATION_REQUIRED,
+                                           status_code=status.HTTP_401_UNAUTHORIZED)
+    request.user = authenticated[0]
+
+    throttle = RedisUserRateThrottle()
+    if not throttle.allow_request(request, None):
+        response = JsonResponseHandler.failure(message=app_messages.REQUEST_THROTTLED,
+                                               status_code=status.HTTP_429_TOO_MANY_REQUESTS)
+        if throttle.wait():
+            response["Retry-After"] = str(int(throttle.wait()) + 1)
+        return response
+    return None
+
+
+def async_read_view(view):
+    """
+    Decorator for async GET-only API views served natively under ASGI (still usable under WSGI)
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return JsonResponseHandler.failure(message=app_messages.METHOD_NOT_ALLOWED,
+                                               status_code=status.HTTP_405_METHOD_NOT_ALLOWED)
+        error = await sync_to_async(_authenticate_and_throttle)(request)
+        if error:
+            return error
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@async_read_view
+async def group_summary(request, group_id):
+    """
+    Group detail with members & the user's owed/borrowed totals within it
+    """
+    try:
+        result = await async_helpers.afetch_group_summary(request.user.id, group_id)
+        if not result:
+            return JsonResponseHandler.failure(
+                message=app_messages.GROUP_NOT_FOUND,
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        return JsonResponseHandler.success(message=app_messages.GROUP_DATA_FOUND, data=result)
+    except Exception as e:
+        logger.error(f"API VIEW - ASYNC GROUP SUMMARY : ERROR {str(e)}")
+        return JsonResponseHandler.exception(message=app_messages.GROUP_NOT_FOUND)
+
+
+@async_read_view
+async def expense_detail(request, expense_id):
+    """
+    Expense detail with its splits
+    """
+    try:
+        result = await async_helpers.afetch_expense_detail(expense_id)
+        if not result:
+            return JsonResponseHandler.failure(
+                message=app_messages.EXPENSE_NOT_FOUND,
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        return JsonResponseHandler.success(message=app_messages.EXPENSE_DETAILS_RETRIEVED, data=result)
+    except Exception as e:
+        logger.error(f"API VIEW - ASYNC EXPENSE DETAIL : ERROR {str(e)}")
+        return JsonResponseHandler.exception(message=f"Unexpected error: {str(e)}")
+
+
+@async_read_view
+async def user_balances(request):
+    """
+    What each friend owes the user & what the user owes each friend, with totals
+    """
+    try:
+        result = await async_helpers.afetch_user_balances(request.user.id)
+        return JsonResponseHandler.success(message=app_messages.BALANCES_FETCHED, data=result)
+    except Exception as e:
+        logger.error(f"API VIEW - ASYNC USER BALANCES : ERROR {str(e)}")
+        return JsonResponseHandler.exception(message=app_messages.BALANCES_FETCH_FAILED)
@@ -1,24 +1,39 @@
+import codecs
 import logging
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import NotFound, ValidationError
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 
-from expenses import helpers as helper
-from expenses.common import messages as app_messages
+from expenses import helpers as helper, summary_cache
+from expenses.common import messages as app_messages, constants as app_constants
+from expenses.importer import ExpenseImporter, IMPORT_FORMATS
 from expenses.permissions import IsSelfOrExpenseAdmin
-from expenses.serializers import ExpenseSerializer, SettlementListSerializer
+from expenses.search import search_user_expenses
+from expenses.serializers import ExpenseSearchSerializer, ExpenseSerializer, SettlementListSerializer
 
+from splitwise_app.utils.pagination_utils import KeysetResultsSetPagination
+from splitwise_app.utils.query_budget_utils import QueryBudgetMixin
 from splitwise_app.utils.response_util import ResponseHandler
 
 logger = logging.getLogger('expenses')
 
 
-class ExpenseViewSet(viewsets.ViewSet):
-    authentication_classes = [JWTAuthentication]
+class ExpenseViewSet(QueryBudgetMixin, viewsets.ViewSet):
+    authentication_classes = [CachedJWTAuthentication]
     # permission_classes = [IsAuthenticated]
+    # SQL statements per request, cold caches included; see QueryBudgetMiddleware
+    query_budget = {
+        'list': 4,
+        'retrieve': 5,
+        'create': 24,
+        'import_expenses': 12,
+        'user_expense_settlements': 6,
+        'search': 3,
+    }
 
     def get_permissions(self):
 
@@ -32,19 +47,13 @@ class ExpenseViewSet(viewsets.ViewSet):
     def list(self, request):
         try:
             expenses = helper.fetch_user_expense(request)
-            if not expenses:
+            paginator = KeysetResultsSetPagination()
+            paginated_expenses = paginator.paginate_queryset(expenses, request) if expenses is not None else None
+            if not paginated_expenses:
                 raise NotFound(app_messages.EXPENSE_NOT_FOUND)
 
-            result = []
-            for expense in expenses:
-                owed, borrowed = helper.fetch_expense_split(expense, request)
-                exp_dict = {
-                    "expense_name": expense.name,
-                    "expense_id": expense.id,
-                    "owed_expenses": helper.fetch_owed_exp_breakup(owed),
-                    "borrowed_expenses": helper.fetch_borrowed_exp_breakup(borrowed),
-                }
-                result.append(exp_dict)
+            result = helper.fetch_expense_list_data(paginated_expenses, request)
+            result = paginator.get_paginated_response(result)
 
             return ResponseHandler.success(
                 message=app_messages.EXPENSE_DETAILS_RETRIEVED,
@@ -66,18 +75,11 @@ class ExpenseViewSet(viewsets.ViewSet):
 
     def retrieve(self, request, pk=None):  # pk = expense_id
         try:
-            expense = helper.fetch_user_expense(request, expense_id=pk)
-            if not expense:
+            key = summary_cache.expense_detail_key(pk, lambda: helper.fetch_expense_cache_scope(pk))
+            result = summary_cache.read_through(key, lambda: helper.fetch_expense_detail(request, pk))
+            if not result:
                 raise NotFound(app_messages.EXPENSE_NOT_FOUND)
 
-            splits = helper.fetch_expense_split_details(expense)
-            result = {
-                "expense_name": expense.name,
-                "expense_id": expense.id,
-                "amount": expense.balance_amt,
-                "splits": splits,
-            }
-
             return ResponseHandler.success(
                 message=app_messages.EXPENSE_DETAILS_RETRIEVED,
                 data=result
@@ -147,3 +149,88 @@ class ExpenseViewSet(viewsets.ViewSet):
                 data=[],
                 status_code=status.HTTP_400_BAD_REQUEST
             )
+
+    @action(detail=False, methods=["GET"], url_path="search")
+    def search(self, request):
+        """
+        Search the current user's expenses, newest first & cursor paginated. See ExpenseSearchSerializer for filters.
+        """
+        try:
+            params = ExpenseSearchSerializer(data=request.query_params)
+            params.is_valid(raise_exception=True)
+
+            expenses = search_user_expenses(request.user.id, params.validated_data)
+            paginator = KeysetResultsSetPagination(ordering='-id')
+            page = paginator.paginate_queryset(expenses, request)
+            result = paginator.get_paginated_response([
+                {
+                    "expense_id": expense["id"],
+                    "expense_name": expense["name"],
+                    "amount": expense["balance_amt"],
+                    "status": expense["status"],
+                    "group_id": expense["group_id"],
+                    "expense_by": expense["expense_by_id"],
+                    "created_on": expense["created_on"],
+                    "updated_on": expense["updated_on"],
+                } for expense in page
+            ])
+
+            return ResponseHandler.success(
+                message=app_messages.EXPENSE_SEARCH_RESULTS,
+                data=result
+            )
+        except ValidationError as ve:
+            logger.error(f"API VIEW - SEARCH EXPENSES : VALIDATION ERROR {str(ve.detail)}")
+            return ResponseHandler.failure(
+                message="Validation failed",
+                data=ve.detail,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"API VIEW - SEARCH EXPENSES : ERROR {str(e)}")
+            return ResponseHandler.exception(
+                message=f"Unexpected error: {str(e)}",
+                data=None
+            )
+
+    @action(detail=False, methods=["POST"], url_path="import", parser_classes=[MultiPartParser])
+    def import_expenses(self, request):
+        """
+        Bulk import expenses from an uploaded csv/jsonl `file`. Rows without expense_by are paid by the current user.
+        """
+        try:
+            upload = request.FILES.get("file")
+            if not upload:
+                raise ValidationError(app_messages.IMPORT_FILE_REQUIRED)
+
+            fmt = request.data.get("format") or upload.name.rsplit(".", 1)[-1].lower()
+            if fmt not in IMPORT_FORMATS:
+                raise ValidationError(app_messages.INVALID_IMPORT_FORMAT)
+
+            errors = []
+
+            def on_error(row_number, detail):
+                if len(errors) < app_constants.MAX_REPORTED_IMPORT_ERRORS:
+                    errors.append({"row": row_number, "errors": detail})
+
+            importer = ExpenseImporter(on_error=on_error, default_expense_by=request.user.id)
+            summary = importer.run(codecs.iterdecode(upload, "utf-8"), fmt)
+            summary["errors"] = errors
+
+            return ResponseHandler.success(
+                message=app_messages.EXPENSES_IMPORTED,
+                data=summary
+            )
+        except ValidationError as ve:
+            logger.error(f"API VIEW - IMPORT EXPENSES : VALIDATION ERROR {str(ve.detail)}")
+            return ResponseHandler.failure(
+                message=app_messages.EXPENSE_IMPORT_FAILED,
+                data=ve.detail,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"API VIEW - IMPORT EXPENSES : ERROR {str(e)}")
+            return ResponseHandler.exception(
+                message=f"Unexpected error: {str(e)}",
+                data=None
+            )
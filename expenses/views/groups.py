@@ -1,81 +1,85 @@
 import logging
 
 from rest_framework import (status, viewsets, mixins)
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import serializers
 import expenses.helpers as helper
+from expenses import summary_cache
 from expenses.models import Group
 from expenses.permissions import IsGroupMemberOrExpenseAdmin
 from expenses.serializers import GroupSerializer, GroupMemberSerializer
 from rest_framework.decorators import action
 
-from splitwise_app.utils.pagination_utils import StandardResultsSetPagination
+from splitwise_app.utils.pagination_utils import KeysetResultsSetPagination
+from splitwise_app.utils.query_budget_utils import QueryBudgetMixin
 from splitwise_app.utils.response_util import ResponseHandler
 from expenses.common import messages as app_messages
 
 logger = logging.getLogger('groups')
 
 
-class GroupAPIView(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+class GroupAPIView(QueryBudgetMixin, viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
                    mixins.UpdateModelMixin, mixins.ListModelMixin):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
+    # SQL statements per request, cold caches included; see QueryBudgetMiddleware
+    query_budget = {
+        'list': 4,
+        'retrieve': 4,
+        'create': 12,
+        'update': 6,
+        'partial_update': 6,
+        'expense_list': 5,
+        'settle_up': 5,
+    }
 
     def get_permissions(self):
-        if self.action == 'expense_list':
+        if self.action in ['expense_list', 'settle_up']:
             permission_list = [IsGroupMemberOrExpenseAdmin]
         else:
             permission_list = [IsAuthenticated]
         return [permission() for permission in permission_list]
 
     def list(self, request, *args, **kwargs):
-        groups = helper.fetch_user_groups(request)
+        key = summary_cache.group_list_key(request.user.id, request.build_absolute_uri())
+        result = summary_cache.read_through(key, lambda: self._group_summaries(request))
 
-        if not groups:
+        if result is None:
             return ResponseHandler.failure(
                 message=app_messages.GROUP_NOT_FOUND,
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        paginator = StandardResultsSetPagination()
-        paginated_groups = paginator.paginate_queryset(groups, request)
-        result = [
-            {
-                "group_name": g.group_name,
-                "group_id": g.id,
-                "owed_expenses": helper.fetch_group_expenses(g, request)[0] or 0,
-                "borrowed_expenses": helper.fetch_group_expenses(g, request)[1] or 0
-            } for g in paginated_groups
-        ]
-        result = paginator.get_paginated_response(result)
         return ResponseHandler.success(
             message=app_messages.GROUP_DATA_FOUND,
             data=result
         )
 
+    def _group_summaries(self, request):
+        groups = helper.fetch_user_groups(request)
+        paginator = KeysetResultsSetPagination()
+        paginated_groups = paginator.paginate_queryset(groups, request) if groups is not None else None
+        if not paginated_groups:
+            return None
+
+        result = helper.fetch_groups_summary(paginated_groups, request)
+        return paginator.get_paginated_response(result)
+
     def retrieve(self, request, id=None, *args, **kwargs):
         try:
-            group = helper.fetch_user_groups(request, group_id=id)
+            key = summary_cache.group_detail_key(request.user.id, id)
+            result = summary_cache.read_through(key, lambda: helper.fetch_group_detail(request, id))
 
-            if not group:
+            if not result:
                 return ResponseHandler.failure(
                     message=app_messages.GROUP_NOT_FOUND,
                     status_code=status.HTTP_404_NOT_FOUND
                 )
 
-            members = helper.fetch_group_members(group.id)
-
-            result = {
-                "group_name": group.group_name,
-                "description": group.description,
-                "members": members,
-                # "created_on": group.created_on
-            }
-
             return ResponseHandler.success(
                 message=app_messages.GROUP_DATA_FOUND,
                 data=result
@@ -141,17 +145,10 @@ class GroupAPIView(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.Retr
     def expense_list(self, request, id=None):
         try:
             expenses = helper.fetch_user_expense(request, group_id=id)
-            paginator = StandardResultsSetPagination()
+            paginator = KeysetResultsSetPagination()
             paginated_expenses = paginator.paginate_queryset(expenses, request)
 
-            expenses_data = [
-                {
-                    "expense_name": e.name,
-                    "expense_id": e.id,
-                    "owed_expenses": helper.fetch_owed_exp_breakup(helper.fetch_expense_split(e, request)[0]),
-                    "borrowed_expenses": helper.fetch_borrowed_exp_breakup(helper.fetch_expense_split(e, request)[1])
-                } for e in paginated_expenses
-            ]
+            expenses_data = helper.fetch_expense_list_data(paginated_expenses, request)
             expenses_data = paginator.get_paginated_response(expenses_data)
             return ResponseHandler.success(
                 message=app_messages.GROUP_EXPENSE_FETCHED,
@@ -164,3 +161,21 @@ class GroupAPIView(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.Retr
                 data=None,
                 status_code=status.HTTP_400_BAD_REQUEST
             )
+
+    @action(methods=['GET'], detail=True, url_path="settle-up")
+    def settle_up(self, request, id=None):
+        """
+        Suggest the minimal set of payments that settles every balance within the group
+        """
+        try:
+            suggestions = helper.fetch_settle_up_suggestions(id)
+            return ResponseHandler.success(
+                message=app_messages.GROUP_SETTLE_UP_FETCHED,
+                data=suggestions
+            )
+        except Exception as e:
+            logger.error(f"API VIEW - GROUP SETTLE UP : ERROR {str(e)}")
+            return ResponseHandler.exception(
+                message=app_messages.GROUP_SETTLE_UP_FAILED,
+                data=None
+            )
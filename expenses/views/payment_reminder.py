@@ -3,7 +3,7 @@ import logging
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 
 from expenses import helpers as helper
 from expenses.common import messages as app_messages
@@ -12,7 +12,7 @@ logger = logging.getLogger('reminders')
 
 
 class ReminderViewSet(viewsets.ViewSet):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=["post"], url_path="notify")
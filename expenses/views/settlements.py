@@ -1,4 +1,5 @@
 import logging
+from decimal import Decimal
 
 from django.conf import settings
 from django.shortcuts import render
@@ -6,13 +7,13 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 from rest_framework.views import APIView
 
-from expenses import helpers
+from expenses import helpers, status_queue
 from expenses.common import messages as app_messages, constants as app_constants
 from expenses.serializers import PaymentLinkSerializer
-from expenses.utils import generate_hmac_signature, verify_hmac_signature
+from expenses.utils import generate_payment_token, load_payment_token
 
 from splitwise_app.utils.response_util import ResponseHandler
 
@@ -20,7 +21,7 @@ logger = logging.getLogger('payments')
 
 
 class SettlementViewSet(viewsets.ViewSet):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     @action(detail=False, methods=["post"], url_path="settle")
     def simulate_settle_expenses(self, request):
@@ -42,7 +43,9 @@ class SettlementViewSet(viewsets.ViewSet):
             )
 
             if success and payment_status == 'Settled':
-                helpers.update_expense_status.apply_async(kwargs=dict(expenses=expense_ids))
+                # coalesced & recomputed by the periodic update_expense_status task
+                if not status_queue.enqueue(expense_ids):
+                    helpers.update_expense_status.apply_async(kwargs=dict(expenses=expense_ids))
                 return render(request, 'payment-success.html', context={
                     'payment_obj': payment_obj
                 })
@@ -56,7 +59,7 @@ class SettlementViewSet(viewsets.ViewSet):
 
 
 class PaymentSimulator(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -66,7 +69,7 @@ class PaymentSimulator(APIView):
             serializer = PaymentLinkSerializer(data=data)
             if serializer.is_valid():
                 payment_uid = helpers.create_pending_settlement(serializer.validated_data)
-                payment_link = self.generate_link(data, payment_uid)
+                payment_link = self.generate_link(serializer.validated_data, payment_uid)
                 return ResponseHandler.success(
                     message=app_messages.PAYMENT_LINK_GENERATED_SUCCESSFULLY,
                     data={"payment_link": payment_link}
@@ -85,21 +88,28 @@ class PaymentSimulator(APIView):
             )
 
     def generate_link(self, data, payment_uid):
-        user_id = data.get("user_id")
-        expense_id = data.get("expense_id")
-        signature = generate_hmac_signature(user_id=user_id, expense_id=expense_id, payment_uid=payment_uid,
-                                            secret_key=settings.PAYMENT_SIMULATOR_SECRET_KEY)
-        payment_link = settings.BASE_URL + app_constants.PAYMENT_LINK_URL.format(payment_uid=payment_uid,
-                                                                                 signature=signature)
+        token = generate_payment_token(payment_uid=payment_uid, user_id=data.get("user_id"),
+                                       expense_id=data.get("expense_id"), amount=data.get("amount"))
+        payment_link = settings.BASE_URL + app_constants.PAYMENT_LINK_URL.format(token=token)
         return payment_link
 
 
 class PaymentSummary(APIView):
-    def get(self, request, payment_uid):
+    def get(self, request, token):
         try:
-            signature = request.GET.get("signature")
-            payment_obj = helpers.get_payment_data(payment_uid)
-            if not payment_obj or payment_obj.status == 'Failed':
+            # forged, tampered & expired links are rejected before any query
+            payload = load_payment_token(token)
+            if not payload:
+                return render(
+                    request,
+                    'invalid-link.html',
+                    context={"message": app_messages.INVALID_PAYMENT_LINK}
+                )
+            payment_obj = helpers.get_payment_data(payload["payment_id"])
+            if (not payment_obj or payment_obj.status == 'Failed'
+                    or payment_obj.expense_split.expense_user_id != payload["user_id"]
+                    or payment_obj.expense_split.expense_id != payload["expense_id"]
+                    or payment_obj.amount != Decimal(payload["amount"])):
                 return render(
                     request,
                     'invalid-link.html',
@@ -111,13 +121,6 @@ class PaymentSummary(APIView):
                     'invalid-link.html',
                     context={"message": app_messages.EXPENSE_ALREADY_SETTLED}
                 )
-            if not verify_hmac_signature(user_id=payment_obj.expense_split.expense_user.id,
-                                         expense_id=payment_obj.expense_split.expense.id, payment_uid=payment_uid,
-                                         provided_signature=signature,
-                                         secret_key=settings.PAYMENT_SIMULATOR_SECRET_KEY):
-                return ResponseHandler.failure(
-                    message=app_messages.SIGNATURE_VALIDATION_FAILED
-                )
 
             return render(
                 request, 'payment-summary.html', context={
@@ -19,5 +19,23 @@ app.conf.beat_schedule = {
         'schedule': crontab(minute='0', hour='0', day_of_week='1'),
         'options': {'queue': settings.NOTIFICATION_QUEUE},
         'args': ()
+    },
+    'drain-notification-outbox': {
+        'task': 'expenses.tasks.drain_notification_outbox',
+        'schedule': 30.0,
+        'options': {'queue': settings.NOTIFICATION_QUEUE},
+        'args': ()
+    },
+    'update-expense-status': {
+        'task': 'expenses.helpers.update_expense_status',
+        'schedule': 10.0,
+        'options': {'queue': settings.NOTIFICATION_QUEUE},
+        'args': ()
+    },
+    'purge-expired-tokens': {
+        'task': 'users.tasks.purge_expired_tokens',
+        'schedule': crontab(minute='15'),
+        'options': {'queue': settings.NOTIFICATION_QUEUE},
+        'args': ()
     }
 }
@@ -136,6 +136,12 @@ LOGGING = {
     }
 }
 
+# LOG_MODE=queue : loggers only enqueue records, one background listener per process writes them as JSON lines
+# to logs/<logger>.log files (shared by every process, rotated by logrotate) & the console, off the request thread
+LOG_MODE = os.getenv(key='LOG_MODE', default='sync')
+if LOG_MODE == 'queue':
+    LOGGING_CONFIG = 'splitwise_app.utils.logging_utils.configure_queue_logging'
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -154,6 +160,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'splitwise_app.utils.metrics_utils.MetricsMiddleware',
+    'splitwise_app.utils.query_budget_utils.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -186,15 +194,17 @@ WSGI_APPLICATION = 'splitwise_app.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'splitwise_app.utils.throttle_utils.RedisAnonRateThrottle',
+        'splitwise_app.utils.throttle_utils.RedisUserRateThrottle',
+        'splitwise_app.utils.throttle_utils.RedisScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/min',
-        'user': '250/min'
+        'user': '250/min',
+        'login': '5/min',
     }
 }
 
@@ -209,9 +219,40 @@ DATABASES = {
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
         "OPTIONS": {"charset": "utf8mb4"},
+        # seconds a connection is reused (per thread) instead of reconnecting for every request / async query
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
     }
 }
 
+# Cache
+# django-redis backed cache shared by every web & celery worker
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": os.getenv(
+            key="REDIS_CACHE_URL",
+            default="redis://redis:6379/1"
+        ),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+        "KEY_PREFIX": "split-x",
+    },
+    # revoked token ids (users.tokens) : a redis of their own run with maxmemory-policy noeviction & persistence,
+    # keys there must never be evicted or flushed along with the cache
+    "tokens": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": os.getenv(
+            key="REDIS_TOKENS_URL",
+            default="redis://redis-tokens:6379/0"
+        ),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+        "KEY_PREFIX": "split-x",
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -268,7 +309,7 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'id',
     'AUTH_HEADER_TYPES': ('Bearer',),
-    'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'AUTH_TOKEN_CLASSES': ('users.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'JTI_CLAIM': 'jti',
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
@@ -308,6 +349,15 @@ PAYMENT_SIMULATOR_SECRET_KEY = os.getenv(
     key='PAYMENT_SIMULATOR_SECRET_KEY',
     default="SPLIT-X-TEST-MODE"
 )
+
+# SQL statements a request may run before it's logged, for views that don't declare a query_budget
+QUERY_BUDGET_DEFAULT = int(os.getenv(key='QUERY_BUDGET_DEFAULT', default=30))
+
+# /metrics : each process sums its observations & adds them to the shared redis series at most this often
+METRICS_FLUSH_SECONDS = float(os.getenv(key='METRICS_FLUSH_SECONDS', default=1))
+# bearer token required to scrape /metrics, open if empty
+METRICS_TOKEN = os.getenv(key='METRICS_TOKEN', default='')
+
 BASE_URL = os.getenv(
     key='BASE_URL',
     default='http://localhost:8000'
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from splitwise_app.utils.metrics_utils import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('users.urls')),
     path('expense-app/', include('expenses.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
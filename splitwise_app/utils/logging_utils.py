@@ -0,0 +1,160 @@
+import atexit
+import copy
+import json
+import logging
+import logging.config
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One compact JSON object per line : time, level, logger, message (& traceback if any)
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LoggerFileHandler(logging.Handler):
+    """
+    Routes each record to `<directory>/<file name>.log` by its top level logger name, through one
+    WatchedFileHandler per file. `file_names` maps logger names to file names where they differ.
+    Every process (web & celery workers, forked children) appends to the same files, one write per record; none
+    rotates them, as renaming a file other processes write to isn't safe. Rotation is left to logrotate (move &
+    create, not copytruncate) : a moved file is noticed & reopened on the next record.
+    """
+
+    def __init__(self, directory="logs", file_names=None):
+        super().__init__()
+        self.directory = directory
+        self.file_names = file_names or {}
+        self._files = {}
+
+    def _file_for(self, logger_name):
+        name = logger_name.split(".", 1)[0]
+        handler = self._files.get(name)
+        if handler is None:
+            path = os.path.join(self.directory, f"{self.file_names.get(name, name)}.log")
+            handler = WatchedFileHandler(path, encoding="utf-8")
+            handler.setFormatter(self.formatter)
+            self._files[name] = handler
+        return handler
+
+    def emit(self, record):
+        try:
+            self._file_for(record.name).emit(record)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for handler in self._files.values():
+            handler.close()
+        self._files.clear()
+        super().close()
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Request threads only put records on an in-memory queue; one background QueueListener per process formats
+    & writes them (per-logger files shared by every process, plus stderr if `console`). Attach this single handler
+    to every logger. The listener is restarted in forked workers, whose copy of the parent's thread isn't running.
+    """
+
+    def __init__(self, directory="logs", file_names=None, console=True):
+        super().__init__(queue.SimpleQueue())
+        self.targets = [LoggerFileHandler(directory, file_names)]
+        if console:
+            self.targets.append(logging.StreamHandler())
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # formatting happens on the listener thread, with the formatter configured for this handler
+        super().setFormatter(fmt)
+        for target in self.targets:
+            target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # resolve the message now (its args may change after the call returns); formatting is left to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """
+        Drain the queue & stop the listener, e.g. on shutdown
+        """
+        with self._lock:
+            if self._listener and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener, self._pid = None, None
+
+    def close(self):
+        self.stop()
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+def queue_logging_config(config: dict, directory: str = "logs", console: bool = True) -> dict:
+    """
+    Copy of the dictConfig `config` with every logger sending JSON lines through one shared
+    QueueListenerHandler. Each logger keeps writing to the file its FileHandler used (under `directory`).
+    """
+    config = copy.deepcopy(config)
+    file_names = {}
+    for name, logger in config.get("loggers", {}).items():
+        for handler_name in logger.get("handlers", []):
+            filename = config["handlers"][handler_name].get("filename")
+            if filename:
+                file_names[name] = os.path.splitext(os.path.basename(filename))[0]
+        logger["handlers"] = ["queue"]
+
+    config.setdefault("formatters", {})["json"] = {"()": JsonFormatter}
+    config["handlers"] = {
+        "queue": {
+            "class": "splitwise_app.utils.logging_utils.QueueListenerHandler",
+            "formatter": "json",
+            "directory": directory,
+            "file_names": file_names,
+            "console": console,
+        },
+    }
+    return config
+
+
+def configure_queue_logging(config: dict) -> None:
+    """
+    LOGGING_CONFIG callable for LOG_MODE=queue : applies queue_logging_config to settings.LOGGING
+    """
+    logging.config.dictConfig(queue_logging_config(config))
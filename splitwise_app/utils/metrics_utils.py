@@ -0,0 +1,322 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis import get_redis_connection
+
+logger = logging.getLogger("splitwise_backend")
+
+METRICS_KEY = "metrics:{name}"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class MetricsRegistry:
+    """
+    Counters & histograms shared by every web & celery worker process. Observations are summed in process &
+    flushed to one redis hash per metric at most every METRICS_FLUSH_SECONDS (HINCRBY is atomic, so any number
+    of processes can add to the same series). Label values must come from a small fixed set (view names, status
+    codes, task names), never from ids or paths.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, collect):
+        """
+        Gauge read at scrape time: `collect()` returns the current value, or None to leave it out
+        """
+        return self._register(Gauge(self, name, documentation, collect))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add(self, name, field, amount):
+        self.add_many([(name, field, amount)])
+
+    def add_many(self, items):
+        """
+        Add (name, field, amount) items under one lock, so fields that belong together (a histogram's bucket,
+        count & sum) are always flushed together
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked worker : the parent flushes what it had pending, start empty
+                self._pending.clear()
+                self._pid = os.getpid()
+            for name, field, amount in items:
+                self._pending[(name, field)] += amount
+            due = time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_SECONDS
+            if due:
+                # one flush per interval, even while a handed off flush hasn't started yet
+                self._flushed_at = time.monotonic()
+        if not due:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+        else:
+            # never block the event loop (ASGI requests) on the redis pipeline
+            loop.run_in_executor(None, self.flush)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._flushed_at = time.monotonic()
+        if not pending or self._pid != os.getpid():
+            return
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for (name, field), amount in pending.items():
+                if isinstance(amount, float):
+                    pipe.hincrbyfloat(cache.make_key(METRICS_KEY.format(name=name)), field, amount)
+                else:
+                    pipe.hincrby(cache.make_key(METRICS_KEY.format(name=name)), field, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"METRICS - FLUSH : REDIS ERROR {str(e)}")
+            # the series are few, keep the counts for the next flush
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] += amount
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format
+        """
+        self.flush()
+        stored = [metric for metric in self.metrics.values() if not isinstance(metric, Gauge)]
+        values = defaultdict(dict)
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for metric in stored:
+                pipe.hgetall(cache.make_key(METRICS_KEY.format(name=metric.name)))
+            for metric, fields in zip(stored, pipe.execute()):
+                values[metric.name] = {field.decode(): float(value) for field, value in fields.items()}
+        except Exception as e:
+            logger.error(f"METRICS - RENDER : REDIS ERROR {str(e)}")
+        # what a failed flush kept in this process
+        with self._lock:
+            pending = list(self._pending.items())
+        for (name, field), amount in pending:
+            values[name][field] = values[name].get(field, 0) + amount
+
+        lines = []
+        for metric in self.metrics.values():
+            lines += [f"# HELP {metric.name} {metric.documentation}", f"# TYPE {metric.name} {metric.type}"]
+            lines += metric.samples(values.get(metric.name))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _decode(stored) -> list:
+    return [(json.loads(field), value) for field, value in (stored or {}).items()]
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry, self.name, self.documentation, self.labelnames = registry, name, documentation, labelnames
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, json.dumps([str(labels[name]) for name in self.labelnames]), amount)
+
+    def samples(self, stored):
+        return [f"{self.name}{_labels(self.labelnames, values)} {_number(value)}"
+                for values, value in sorted(_decode(stored))]
+
+
+class Histogram:
+    """
+    Stored per series as one field per bucket (non cumulative) plus `count` & `sum`; cumulated when rendered
+    """
+    type = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        self.registry, self.name, self.documentation, self.labelnames = registry, name, documentation, labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        values = [str(labels[name]) for name in self.labelnames]
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        self.registry.add_many([
+            (self.name, json.dumps(values + [_number(bucket)]), 1),
+            (self.name, json.dumps(values + ["count"]), 1),
+            (self.name, json.dumps(values + ["sum"]), float(value)),
+        ])
+
+    def samples(self, stored):
+        series = defaultdict(dict)
+        for field, value in _decode(stored):
+            series[tuple(field[:-1])][field[-1]] = float(value)
+
+        lines = []
+        for values, fields in sorted(series.items()):
+            cumulative = 0
+            for bound in self.buckets:
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                cumulative += fields.get(_number(bound), 0)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le=le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_number(fields.get('sum', 0))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {_number(fields.get('count', 0))}")
+        return lines
+
+
+class Gauge:
+    type = "gauge"
+
+    def __init__(self, registry, name, documentation, collect):
+        self.registry, self.name, self.documentation, self.collect = registry, name, documentation, collect
+
+    def samples(self, stored):
+        try:
+            value = self.collect()
+        except Exception as e:
+            logger.error(f"METRICS - {self.name} : ERROR {str(e)}")
+            return []
+        return [] if value is None else [f"{self.name} {_number(value)}"]
+
+
+def notification_queue_length():
+    """
+    Messages waiting in NOTIFICATION_QUEUE on the celery broker
+    """
+    from splitwise_app.celery import app
+
+    with app.connection_for_read() as connection:
+        # fail fast instead of retrying forever while the scrape waits
+        connection.ensure_connection(max_retries=1)
+        try:
+            return connection.default_channel.queue_declare(settings.NOTIFICATION_QUEUE, passive=True).message_count
+        except connection.channel_errors:
+            # redis drops the key of an emptied queue, a passive declare then reports it missing
+            return 0
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    "splitx_http_request_duration_seconds", "API request latency by view, method & response status.",
+    ("view", "method", "status"),
+)
+TASK_DURATION = registry.histogram(
+    "splitx_celery_task_duration_seconds", "Celery task run time by task & final state.",
+    ("task", "state"), buckets=TASK_BUCKETS,
+)
+TASK_RETRIES = registry.counter(
+    "splitx_celery_task_retries_total", "Celery task retries by task.", ("task",),
+)
+NOTIFICATION_QUEUE_LENGTH = registry.gauge(
+    "splitx_notification_queue_length", "Messages waiting in the notification queue.", notification_queue_length,
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency & status of every request, labelled with its url name (not its path).
+    Sync & async capable, so the ASGI handler chain stays async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, duration) -> None:
+        match = request.resolver_match
+        REQUEST_DURATION.observe(
+            duration, view=match.view_name if match else "unmatched", method=request.method,
+            status=response.status_code,
+        )
+
+
+def metrics_view(request):
+    """
+    Scrape endpoint. Guarded by METRICS_TOKEN (`Authorization: Bearer <token>`) when it's set.
+    """
+    if settings.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+def track_tasks(task_names) -> None:
+    """
+    Record duration, final state & retries of the named celery tasks through celery's task signals
+    """
+    from celery.signals import task_postrun, task_prerun, task_retry, worker_process_shutdown
+
+    task_names = set(task_names)
+    started = {}
+
+    def on_prerun(task_id=None, task=None, **kwargs):
+        if task.name in task_names:
+            started[task_id] = time.perf_counter()
+
+    def on_postrun(task_id=None, task=None, state=None, **kwargs):
+        began = started.pop(task_id, None)
+        if began is not None:
+            TASK_DURATION.observe(time.perf_counter() - began, task=task.name, state=state or "UNKNOWN")
+
+    def on_retry(sender=None, **kwargs):
+        if sender.name in task_names:
+            TASK_RETRIES.inc(task=sender.name)
+
+    task_prerun.connect(on_prerun, weak=False)
+    task_postrun.connect(on_postrun, weak=False)
+    task_retry.connect(on_retry, weak=False)
+    # prefork children leave through os._exit, skipping the atexit flush
+    worker_process_shutdown.connect(lambda **kwargs: registry.flush(), weak=False)
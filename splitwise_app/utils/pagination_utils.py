@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -13,4 +13,36 @@ class StandardResultsSetPagination(PageNumberPagination):
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data,
-        }
\ No newline at end of file
+        }
+
+
+class KeysetResultsSetPagination(CursorPagination):
+    """
+    Keyset pagination : each page is `WHERE key > cursor ORDER BY key LIMIT n` on an indexed ordering, so deep
+    pages cost the same as the first one. Same response shape as StandardResultsSetPagination, but `count` is
+    only computed (one COUNT query) when asked for with `?count=true`, otherwise it is null.
+    """
+    page_size = 10  # default
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+    count_query_param = 'count'
+
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return {
+            'count': self.count,
+            'page_size': self.page_size,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
@@ -0,0 +1,132 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("splitwise_backend")
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper counting statements & the time spent executing them
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the SQL statements & DB time of every request, reports them in a Server-Timing header & logs
+    requests over their view's query budget (QueryBudgetMixin.query_budget, else QUERY_BUDGET_DEFAULT).
+
+    Sync & async capable. Under ASGI the counter is installed on the request's thread-sensitive thread, where
+    sync views & middleware run; async views querying from other worker threads (db_query) aren't counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        return self.report(request, response, counter, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        wrapped = await sync_to_async(install_counter)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_counter)(wrapped, counter)
+        return self.report(request, response, counter, time.perf_counter() - started)
+
+    def report(self, request, response, counter, elapsed):
+        response["Server-Timing"] = (
+            f'db;dur={counter.duration * 1000:.2f};desc="{counter.count} queries", total;dur={elapsed * 1000:.2f}'
+        )
+        budget = getattr(request, "query_budget", None)
+        if budget is None:
+            budget = settings.QUERY_BUDGET_DEFAULT
+        # kept on the response for QueryBudgetTestMixin
+        response.query_count, response.query_budget = counter.count, budget
+
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                f"QUERY BUDGET - {request.method} {request.path} ({getattr(request, 'query_budget_view', '-')}) : "
+                f"{counter.count} queries over a budget of {budget}, {counter.duration * 1000:.1f}ms in DB"
+            )
+        return response
+
+
+def install_counter(counter) -> list:
+    """
+    Add `counter` to the execute wrappers of this thread's connections; returns them for remove_counter
+    """
+    wrapped = connections.all()
+    for connection in wrapped:
+        connection.execute_wrappers.append(counter)
+    return wrapped
+
+
+def remove_counter(wrapped, counter) -> None:
+    for connection in wrapped:
+        connection.execute_wrappers.remove(counter)
+
+
+class QueryBudgetMixin:
+    """
+    DRF view mixin declaring how many SQL statements a request may run, either one number for every action or
+    a {action: budget} dict (actions missing from it fall back to QUERY_BUDGET_DEFAULT).
+    """
+    query_budget = None
+
+    def get_query_budget(self):
+        if isinstance(self.query_budget, dict):
+            return self.query_budget.get(getattr(self, "action", None))
+        return self.query_budget
+
+    def initial(self, request, *args, **kwargs):
+        # the action is resolved by now; hand the budget to QueryBudgetMiddleware through the django request
+        request._request.query_budget = self.get_query_budget()
+        request._request.query_budget_view = f"{self.__class__.__name__}.{getattr(self, 'action', None)}"
+        super().initial(request, *args, **kwargs)
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin enforcing the budgets views declare, on responses from the test client
+    """
+
+    def assertWithinQueryBudget(self, response):
+        self.assertIsNotNone(response.query_budget, f"{response.wsgi_request.path} declares no query budget")
+        self.assertLessEqual(
+            response.query_count, response.query_budget,
+            f"{response.wsgi_request.method} {response.wsgi_request.path} ran {response.query_count} queries, "
+            f"budget is {response.query_budget}"
+        )
+        return response
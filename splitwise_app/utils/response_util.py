@@ -1,5 +1,7 @@
+from django.http import JsonResponse
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class ResponseHandler:
@@ -38,3 +40,30 @@ class ResponseHandler:
             "data": data
         }
         return Response(response, status=status_code)
+
+
+class JsonResponseHandler:
+    """
+    ResponseHandler counterpart for plain (async) django views, rendered the same way as DRF's JSONRenderer
+    """
+    @staticmethod
+    def _respond(success, message, data, status_code):
+        response = {
+            "success": success,
+            "status_code": status_code,
+            "message": message,
+            "data": {} if data is None else data
+        }
+        return JsonResponse(response, status=status_code, encoder=JSONEncoder)
+
+    @staticmethod
+    def success(message="Success", data=None, status_code=status.HTTP_200_OK):
+        return JsonResponseHandler._respond(True, message, data, status_code)
+
+    @staticmethod
+    def failure(message="Failure", data=None, status_code=status.HTTP_400_BAD_REQUEST):
+        return JsonResponseHandler._respond(False, message, data, status_code)
+
+    @staticmethod
+    def exception(message="An error occurred", data=None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR):
+        return JsonResponseHandler._respond(False, message, data, status_code)
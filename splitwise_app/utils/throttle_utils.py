@@ -0,0 +1,91 @@
+import logging
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from rest_framework.throttling import AnonRateThrottle, ScopedRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+logger = logging.getLogger("splitwise_backend")
+
+# Token bucket : KEYS[1] hash {tokens, ts}, ARGV[1] capacity, ARGV[2] refill rate (tokens/sec).
+# Runs atomically inside redis & uses the redis clock, so every web worker shares one bucket.
+# Returns {allowed (0/1), seconds until the next token}.
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens))
+redis.call('HSET', KEYS[1], 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(wait)}
+"""
+
+_token_bucket = None
+
+
+def consume_token(key: str, capacity: int, duration: int) -> tuple:
+    """
+    Take one token from the bucket at `key` refilling `capacity` tokens every `duration` seconds.
+    Returns (allowed, wait seconds).
+    """
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = get_redis_connection("default").register_script(TOKEN_BUCKET_SCRIPT)
+    allowed, wait = _token_bucket(keys=[cache.make_key(key)], args=[capacity, capacity / duration])
+    return bool(allowed), float(wait)
+
+
+class RedisRateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle backed by a shared redis token bucket instead of a per-process timestamp history.
+    Fails open (logs & allows) if redis is unavailable.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        try:
+            allowed, self.wait_seconds = consume_token(self.key, self.num_requests, self.duration)
+        except Exception as e:
+            logger.error(f"THROTTLE - {self.scope} : REDIS ERROR {str(e)}")
+            return True
+        return allowed
+
+    def wait(self):
+        return getattr(self, "wait_seconds", None)
+
+
+class RedisAnonRateThrottle(AnonRateThrottle, RedisRateThrottle):
+    pass
+
+
+class RedisUserRateThrottle(UserRateThrottle, RedisRateThrottle):
+    pass
+
+
+class RedisScopedRateThrottle(ScopedRateThrottle, RedisRateThrottle):
+    """
+    Applies the rate of the view's `throttle_scope`, e.g. the strict `login` scope. No-op for views without one.
+    """
+    pass
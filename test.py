@@ -1,8 +1,13 @@
 import requests
 import json, time
+from multiprocessing import Pool
 
-def trylogin():
-    url = "http://localhost:8000/users/login/"
+URL = "http://localhost:8000/users/login/"
+LOGIN_RATE = 5  # REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]["login"], per minute
+
+
+def trylogin(_=None):
+    url = URL
 
     payload = json.dumps({
         "email": "sam.dev2@yopmail.com",
@@ -39,4 +44,32 @@ def test_throttle(limit=100, delay=0.1):
     print(f"  - Throttled (429): {throttle_hit}")
     print(f"  - Other errors: {other_errors}")
 
-test_throttle()
\ No newline at end of file
+
+def test_concurrent_throttle(processes=8, attempts=80, rate=LOGIN_RATE):
+    """
+    Fire `attempts` logins from `processes` client processes at once. Run the server with several workers
+    (e.g. gunicorn -w 4); the login limit must hold across all of them, not per worker.
+    """
+    print(f"\n🚀 Starting concurrent login burst: {attempts} attempts from {processes} processes")
+
+    started = time.monotonic()
+    with Pool(processes) as pool:
+        statuses = pool.map(trylogin, range(attempts))
+    elapsed = time.monotonic() - started
+
+    allowed = len([status for status in statuses if status != 429])
+    throttle_hit = statuses.count(429)
+    # the bucket refills `rate` tokens per minute while the burst runs
+    budget = rate + int(rate * elapsed / 60) + 1
+
+    print(f"\n✅ Completed {attempts} concurrent login attempts in {elapsed:.2f}s:")
+    print(f"  - Let through: {allowed} (limit {budget})")
+    print(f"  - Throttled (429): {throttle_hit}")
+    assert allowed <= budget, f"throttle leaked : {allowed} requests let through, limit is {budget}"
+
+
+if __name__ == "__main__":
+    test_throttle()
+    print("\n⏳ Waiting a minute for the login bucket to refill")
+    time.sleep(60)
+    test_concurrent_throttle()
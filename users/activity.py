@@ -0,0 +1,247 @@
+import base64
+import calendar
+import datetime
+import json
+import logging
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+from users.common import constants as app_constants, messages as app_messages
+from users.models import Activity
+
+logger = logging.getLogger("users")
+
+TIMELINE_KEY = "activity:{user_id}"
+# members all score 0 & are ordered by value : "<created_at µs, 16 digits>:<uuid hex>:<entry json>"
+POSITION_LENGTH = 16 + 1 + 32
+# always at rank 0 of a timeline that was loaded from the table; a key without it is rebuilt
+SENTINEL = ""
+FEED_FIELDS = ('uuid', 'verb', 'comment', 'actor_id', 'data', 'created_at')
+
+# add to timelines that exist only, so users who never read their feed don't get one in redis
+PUSH_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+    for i = 3, #ARGV do
+        redis.call('ZADD', KEYS[1], 0, ARGV[i])
+    end
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 1, -(tonumber(ARGV[1]) + 1))
+end
+"""
+
+
+def record(events: list) -> list:
+    """
+    Write one Activity row per event & push them to the recipients' redis timelines once the transaction commits.
+    `events` : dicts of user_id (the recipient), actor_id, verb, comment & data, one per user an event concerns.
+    """
+    if not events:
+        return []
+    activities = Activity.objects.bulk_create([Activity(**event) for event in events])
+    transaction.on_commit(lambda: push(activities))
+    return activities
+
+
+def expense_added(expense_id, name, amount, group_id, actor, participant_ids) -> list:
+    """
+    Events of a new expense, for its payer (`actor`, a User) & every user with a split in it
+    """
+    comment = app_messages.ACTIVITY_EXPENSE_ADDED.format(actor=actor.username, expense=name, amount=amount)
+    data = {"expense_id": expense_id, "group_id": group_id, "amount": str(amount)}
+    return [
+        dict(user_id=user_id, actor_id=actor.id, verb='expense_added', comment=comment, data=data)
+        for user_id in {actor.id, *participant_ids}
+    ]
+
+
+def expense_settled(expense_id, name, amount, borrower, lender) -> list:
+    """
+    Events of a payment towards a split, for the borrower & the lender. Users are (id, username) pairs.
+    """
+    comment = app_messages.ACTIVITY_EXPENSE_SETTLED.format(borrower=borrower[1], lender=lender[1], expense=name,
+                                                          amount=amount)
+    data = {"expense_id": expense_id, "amount": str(amount)}
+    return [
+        dict(user_id=user_id, actor_id=borrower[0], verb='expense_settled', comment=comment, data=data)
+        for user_id in {borrower[0], lender[0]}
+    ]
+
+
+def friendship_changed(verb, actor, friend) -> list:
+    """
+    Events of a friendship added or removed by `actor`, for both users. Users are (id, username) pairs.
+    """
+    template = app_messages.ACTIVITY_FRIEND_ADDED if verb == 'friend_added' else app_messages.ACTIVITY_FRIEND_REMOVED
+    comment = template.format(actor=actor[1], friend=friend[1])
+    return [
+        dict(user_id=user_id, actor_id=actor[0], verb=verb, comment=comment, data={"friend_id": friend[0]})
+        for user_id in {actor[0], friend[0]}
+    ]
+
+
+def members_added(group, actor_id, added, member_ids) -> list:
+    """
+    Events of users (`added`) joining a group, for every member of it
+    """
+    names = [user.username for user in added if user.id != actor_id]
+    if not names:
+        return []
+    if len(names) > 3:
+        names = names[:2] + [f"{len(names) - 2} others"]
+    listed = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+    actor = next((user.username for user in added if user.id == actor_id), None)
+    comment = app_messages.ACTIVITY_MEMBERS_ADDED.format(actor=actor or "Someone", members=listed,
+                                                         group=group.group_name)
+    data = {"group_id": group.id, "member_ids": [user.id for user in added]}
+    return [
+        dict(user_id=user_id, actor_id=actor_id, verb='members_added', comment=comment, data=data)
+        for user_id in set(member_ids)
+    ]
+
+
+def push(activities: list) -> None:
+    """
+    Add written activities to their users' timelines, keeping the newest ACTIVITY_TIMELINE_CAP of each
+    """
+    members = defaultdict(list)
+    for activity in activities:
+        members[timeline_key(activity.user_id)].append(_member({field: getattr(activity, field)
+                                                                 for field in FEED_FIELDS}))
+    connection = get_redis_connection("default")
+    try:
+        script = connection.register_script(PUSH_SCRIPT)
+        pipe = connection.pipeline(transaction=False)
+        for key, key_members in members.items():
+            script(keys=[key], args=[app_constants.ACTIVITY_TIMELINE_CAP, SENTINEL, *key_members], client=pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"ACTIVITY - PUSH : REDIS ERROR {str(e)}")
+        # a timeline that missed entries must be rebuilt from the table on its next read
+        try:
+            connection.delete(*members)
+        except Exception as e:
+            logger.error(f"ACTIVITY - PUSH : REDIS ERROR {str(e)}")
+
+
+def fetch_feed(user_id: int, position: str = None, limit: int = app_constants.ACTIVITY_PAGE_SIZE) -> tuple:
+    """
+    A page of `user_id`'s feed, newest first, after `position` (see decode_cursor). Returns (entries, next position
+    or None). The page is one range read of the redis timeline; pages past its cap, or any page while redis is
+    unavailable, are read from the Activity table instead.
+    """
+    try:
+        page, truncated = _page_from_timeline(user_id, position, limit + 1)
+    except Exception as e:
+        logger.error(f"ACTIVITY - FETCH FEED : REDIS ERROR {str(e)}")
+        page, truncated = [], True
+
+    if len(page) <= limit and truncated:
+        page += _page_from_table(user_id, page[-1][0] if page else position, limit + 1 - len(page))
+    next_position = page[limit - 1][0] if len(page) > limit else None
+    return [entry for _, entry in page[:limit]], next_position
+
+
+def timeline_key(user_id) -> str:
+    return cache.make_key(TIMELINE_KEY.format(user_id=user_id))
+
+
+def encode_cursor(position: str) -> str:
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Position of a feed cursor; raises ValueError for a malformed one
+    """
+    try:
+        position = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except Exception:
+        raise ValueError("Invalid cursor")
+    micros, _, hex_id = position.partition(":")
+    if len(micros) != 16 or not micros.isdigit() or len(hex_id) != 32 or uuid.UUID(hex=hex_id).hex != hex_id:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def _page_from_timeline(user_id, position, count) -> tuple:
+    """
+    (position, entry) pairs of the redis timeline & whether it was trimmed (older entries are only in the table)
+    """
+    connection = get_redis_connection("default")
+    key = timeline_key(user_id)
+    for _ in range(2):
+        pipe = connection.pipeline(transaction=False)
+        pipe.zrevrangebylex(key, f"({position}" if position else "+", "(", start=0, num=count)
+        pipe.zscore(key, SENTINEL)
+        pipe.zcard(key)
+        pipe.expire(key, app_constants.ACTIVITY_TIMELINE_TTL)
+        members, loaded, size, _ = pipe.execute()
+        if loaded is not None:
+            break
+        _rebuild_timeline(user_id, connection, key)
+
+    page = [(member[:POSITION_LENGTH], json.loads(member[POSITION_LENGTH + 1:]))
+            for member in (member.decode() for member in members)]
+    return page, size - 1 >= app_constants.ACTIVITY_TIMELINE_CAP
+
+
+def _rebuild_timeline(user_id, connection, key) -> None:
+    """
+    Reload an expired or incomplete timeline from the table. The sentinel goes in first, so activities committed
+    meanwhile are pushed by their writers (members are deterministic, a duplicate push is a no-op).
+    """
+    pipe = connection.pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, {SENTINEL: 0})
+    pipe.expire(key, app_constants.ACTIVITY_TIMELINE_TTL)
+    pipe.execute()
+
+    rows = _feed_rows(user_id, None, app_constants.ACTIVITY_TIMELINE_CAP)
+    if rows:
+        pipe = connection.pipeline()
+        pipe.zadd(key, {_member(row): 0 for row in rows})
+        pipe.zremrangebyrank(key, 1, -(app_constants.ACTIVITY_TIMELINE_CAP + 1))
+        pipe.execute()
+
+
+def _page_from_table(user_id, position, count) -> list:
+    return [(_position(row), _entry(row)) for row in _feed_rows(user_id, position, count)]
+
+
+def _feed_rows(user_id, position, count):
+    """
+    Newest activities of a user after `position`, a walk of activity_user_feed_idx
+    """
+    rows = Activity.objects.filter(user_id=user_id)
+    if position:
+        micros, _, hex_id = position.partition(":")
+        created_at = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc) + \
+            datetime.timedelta(microseconds=int(micros))
+        rows = rows.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, uuid__lt=uuid.UUID(hex=hex_id)))
+    return rows.order_by('-created_at', '-uuid').values(*FEED_FIELDS)[:count]
+
+
+def _position(row) -> str:
+    created_at = row["created_at"]
+    micros = calendar.timegm(created_at.utctimetuple()) * 10 ** 6 + created_at.microsecond
+    return f"{micros:016d}:{row['uuid'].hex}"
+
+
+def _entry(row) -> dict:
+    return {
+        "id": row["uuid"].hex,
+        "verb": row["verb"],
+        "comment": row["comment"],
+        "actor": row["actor_id"],
+        "data": row["data"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+def _member(row) -> str:
+    return f"{_position(row)}:{json.dumps(_entry(row), sort_keys=True, cls=DjangoJSONEncoder)}"
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Friends
+from .models import User, Friends, Activity
 from django.contrib.admin.decorators import register
 
 
@@ -16,3 +16,11 @@ class FriendsAdmin(admin.ModelAdmin):
     search_fields = ("user_1__username", "user_2__username")
     list_display = ["user_1", "user_2"]
     # readonly_fields = ["username", "email", "password", "mobile"]
+
+
+@register(Activity)
+class ActivityAdmin(admin.ModelAdmin):
+    search_fields = ("user__username", "comment")
+    list_display = ["user", "verb", "comment", "created_at"]
+    list_filter = ["verb"]
+    raw_id_fields = ["user", "actor"]
@@ -0,0 +1,13 @@
+ACTIVITY_VERB_CHOICES = (
+    ('expense_added', 'Expense added'),
+    ('expense_settled', 'Expense settled'),
+    ('friend_added', 'Friend added'),
+    ('friend_removed', 'Friend removed'),
+    ('members_added', 'Members added'),
+)
+
+# activity feed : newest entries kept per user in redis, older pages are read from the Activity table
+ACTIVITY_TIMELINE_CAP = 200
+ACTIVITY_TIMELINE_TTL = 60 * 60 * 24 * 30  # timelines of inactive users expire & are rebuilt on their next read
+ACTIVITY_PAGE_SIZE = 20
+ACTIVITY_MAX_PAGE_SIZE = 100
@@ -15,3 +15,11 @@ INVITE_FAILED = "Error sending invite"
 
 TOKEN_REFRESHED = "Token refreshed successfully"
 TOKEN_REFRESH_FAILED = "Token refresh failed with exception"
+
+ACTIVITY_FEED_FETCHED = "Activity feed fetched successfully"
+ACTIVITY_FEED_FAILED = "Error fetching activity feed"
+ACTIVITY_EXPENSE_ADDED = "{actor} added \"{expense}\" : Rs {amount}"
+ACTIVITY_EXPENSE_SETTLED = "{borrower} paid {lender} Rs {amount} for \"{expense}\""
+ACTIVITY_FRIEND_ADDED = "{actor} added {friend} as a friend"
+ACTIVITY_FRIEND_REMOVED = "{actor} removed {friend} from friends"
+ACTIVITY_MEMBERS_ADDED = "{actor} added {members} to {group}"
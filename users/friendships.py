@@ -0,0 +1,61 @@
+import logging
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from users.models import Friends
+
+logger = logging.getLogger("users")
+
+FRIEND_SET_CACHE_KEY = "friends:{user_id}"
+FRIEND_SET_CACHE_TTL = 60 * 60
+
+
+def load_friend_ids(user_id) -> frozenset:
+    """
+    Load ids of every friend of a user (either side of the relation) with one query, cached in redis
+    """
+    key = FRIEND_SET_CACHE_KEY.format(user_id=user_id)
+    try:
+        friend_ids = cache.get(key)
+    except Exception as e:
+        logger.error(f"FRIENDSHIPS - LOAD FRIEND IDS : CACHE ERROR {str(e)}")
+        friend_ids = None
+
+    if friend_ids is None:
+        pairs = Friends.objects.filter(Q(user_1_id=user_id) | Q(user_2_id=user_id)).values_list("user_1_id",
+                                                                                              "user_2_id")
+        friend_ids = frozenset(u1 if u2 == user_id else u2 for u1, u2 in pairs)
+        try:
+            cache.set(key, friend_ids, FRIEND_SET_CACHE_TTL)
+        except Exception as e:
+            logger.error(f"FRIENDSHIPS - LOAD FRIEND IDS : CACHE ERROR {str(e)}")
+    return friend_ids
+
+
+def invalidate_friend_ids(*user_ids) -> None:
+    """
+    Drop cached friend sets of users whose friendships changed
+    """
+    try:
+        cache.delete_many([FRIEND_SET_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.error(f"FRIENDSHIPS - INVALIDATE FRIEND IDS : CACHE ERROR {str(e)}")
+
+
+class FriendSet:
+    """
+    Per-request memo over load_friend_ids. Create one per request/serializer & reuse it for every check.
+    """
+
+    def __init__(self):
+        self._friend_ids = {}
+
+    def friend_ids(self, user_id) -> frozenset:
+        user_id = getattr(user_id, "id", user_id)
+        if user_id not in self._friend_ids:
+            self._friend_ids[user_id] = load_friend_ids(user_id)
+        return self._friend_ids[user_id]
+
+    def are_friends(self, user_id, other_id) -> bool:
+        return getattr(other_id, "id", other_id) in self.friend_ids(user_id)
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+def drop_duplicate_friends(apps, schema_editor):
+    """
+    Keep the oldest row of every friendship so the unique constraint can be added. A friendship is the unordered
+    pair : (A, B) & (B, A) are duplicates too, which the constraint alone doesn't catch (FriendSerializer checks
+    the reverse pair under a lock). The pk is a random uuid, so the oldest is found by created_at (pk only breaks
+    ties).
+    """
+    Friends = apps.get_model('users', 'Friends')
+    seen = set()
+    duplicate_ids = []
+    for pk, user_1, user_2 in Friends.objects.order_by('created_at', 'pk').values_list(
+            'pk', 'user_1_id', 'user_2_id').iterator():
+        pair = (min(user_1, user_2), max(user_1, user_2))
+        if pair in seen:
+            duplicate_ids.append(pk)
+        else:
+            seen.add(pair)
+    for start in range(0, len(duplicate_ids), 1000):
+        Friends.objects.filter(pk__in=duplicate_ids[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_friends, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='friends',
+            index=models.Index(fields=['user_2', 'user_1'], name='friends_reverse_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='friends',
+            constraint=models.UniqueConstraint(fields=('user_1', 'user_2'), name='unique_friend_pair'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def copy_legacy_activities(apps, schema_editor):
+    """
+    Move rows of the old multi-table Activity (fields split over users_basemodel & users_activity) to the new table
+    """
+    LegacyActivity = apps.get_model('users', 'LegacyActivity')
+    Activity = apps.get_model('users', 'Activity')
+    BaseModel = apps.get_model('users', 'BaseModel')
+
+    legacy_ids = []
+    for legacy in LegacyActivity.objects.values('basemodel_ptr_id', 'user_id', 'comment', 'created_at', 'updated_at',
+                                                'deleted_on').iterator():
+        Activity.objects.create(uuid=legacy['basemodel_ptr_id'], user_id=legacy['user_id'], verb='',
+                                comment=legacy['comment'])
+        # auto_now_add / auto_now overwrite timestamps on insert
+        Activity.objects.filter(uuid=legacy['basemodel_ptr_id']).update(
+            created_at=legacy['created_at'], updated_at=legacy['updated_at'], deleted_on=legacy['deleted_on'])
+        legacy_ids.append(legacy['basemodel_ptr_id'])
+    BaseModel.objects.filter(uuid__in=legacy_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_friends_pair_constraint'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='Activity',
+            new_name='LegacyActivity',
+        ),
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('verb', models.CharField(choices=[('expense_added', 'Expense added'), ('expense_settled', 'Expense settled'), ('friend_added', 'Friend added'), ('friend_removed', 'Friend removed'), ('members_added', 'Members added')], max_length=20)),
+                ('comment', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_on', models.DateTimeField(blank=True, null=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='caused_activities', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Activities',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['user', 'created_at', 'uuid'], name='activity_user_feed_idx'),
+        ),
+        migrations.RunPython(copy_legacy_activities, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='LegacyActivity',
+        ),
+    ]
@@ -2,9 +2,11 @@ import uuid
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.base_user import AbstractBaseUser
 
-from django.db import models
+from django.db import models, transaction
 
+from .common import constants as app_constants
 from .managers import UserManager
+from .user_cache import invalidate_cached_user
 
 
 class BaseModel(models.Model):
@@ -36,6 +38,19 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.username}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # profile/password/is_active changes must not be served from the authentication cache; invalidated once
+        # committed, so a concurrent request can't re-cache the old row in between
+        user_id = self.id
+        transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+    def delete(self, *args, **kwargs):
+        user_id = self.id
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(lambda: invalidate_cached_user(user_id))
+        return result
+
     class Meta:
         """A meta object for defining name of the user table"""
         db_table = "User"
@@ -48,15 +63,29 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['password']
 
 
-class Activity(BaseModel):
+class Activity(models.Model):
+    """
+    One entry of `user`'s activity feed. Events are fanned out on write : every user an event concerns gets
+    their own row (see users.activity), so a feed page is a range read of (user, created_at, uuid).
+    Same fields as BaseModel but in a table of its own, so entries can be bulk inserted & read without a join.
+    """
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    actor = models.ForeignKey(User, related_name='caused_activities', on_delete=models.SET_NULL, null=True,
+                              blank=True)
+    verb = models.CharField(max_length=20, choices=app_constants.ACTIVITY_VERB_CHOICES)
     comment = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_on = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f'{self.user.username} - {self.created_at}'
 
     class Meta:
         verbose_name_plural = "Activities"
+        indexes = [models.Index(fields=['user', 'created_at', 'uuid'], name='activity_user_feed_idx')]
 
 
 class Friends(BaseModel):
@@ -68,3 +97,5 @@ class Friends(BaseModel):
 
     class Meta:
         verbose_name_plural = "Friends"
+        constraints = [models.UniqueConstraint(fields=['user_1', 'user_2'], name='unique_friend_pair')]
+        indexes = [models.Index(fields=['user_2', 'user_1'], name='friends_reverse_idx')]
@@ -1,6 +1,10 @@
 # serializers.py
+from django.db import transaction
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from users import activity
+from users.common import constants as app_constants
 from users.models import User, Friends
 
 
@@ -87,13 +91,18 @@ class FriendSerializer(serializers.Serializer):
             user_serializer.is_valid(raise_exception=True)
             user_2 = user_serializer.save()
 
-        # Check if the friend relation already exists
-        if Friends.objects.filter(user_1=user_1, user_2=user_2).exists() or Friends.objects.filter(user_1=user_2,
-                                                                                                   user_2=user_1).exists():
-            raise serializers.ValidationError("Friend relation already exists.")
+        with transaction.atomic():
+            # unique_friend_pair only covers (user_1, user_2) : lock both users, in id order, so two users adding
+            # each other at once can't both miss the reverse pair. The check is a locking read, which sees rows
+            # committed after this transaction's snapshot.
+            list(User.objects.select_for_update().filter(id__in=[user_1.id, user_2.id]).order_by('id')
+                 .values_list('id', flat=True))
+            if Friends.objects.select_for_update().filter(
+                    Q(user_1=user_1, user_2=user_2) | Q(user_1=user_2, user_2=user_1)).exists():
+                raise serializers.ValidationError("Friend relation already exists.")
 
-        # Update Friends table
-        friend, created = Friends.objects.get_or_create(user_1=user_1, user_2=user_2)
+            # Update Friends table
+            friend = Friends.objects.create(user_1=user_1, user_2=user_2)
 
         return friend
 
@@ -142,3 +151,18 @@ class FriendListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Friends
         fields = ['user_1', 'user_2', 'created_at']
+
+
+class ActivityFeedSerializer(serializers.Serializer):
+    """
+    Query params of the activity feed : `cursor` is the opaque `next` cursor of the previous page
+    """
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=app_constants.ACTIVITY_MAX_PAGE_SIZE,
+                                         default=app_constants.ACTIVITY_PAGE_SIZE)
+
+    def validate_cursor(self, value):
+        try:
+            return activity.decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid cursor")
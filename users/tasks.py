@@ -0,0 +1,42 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from users.tokens import revoke_jti
+
+logger = logging.getLogger("users")
+
+TOKEN_PURGE_CHUNK_SIZE = 1000
+
+
+@shared_task(queue=settings.NOTIFICATION_QUEUE)
+def purge_expired_tokens(chunk_size: int = TOKEN_PURGE_CHUNK_SIZE) -> dict:
+    """
+    Delete expired outstanding/blacklisted token rows chunk by chunk (short transactions, no table-wide
+    delete), then re-seed the redis blacklist with the revoked tokens that are still valid.
+    """
+    now = timezone.now()
+    purged = 0
+    while True:
+        ids = list(OutstandingToken.objects.filter(expires_at__lt=now).order_by('id').values_list('id', flat=True)[
+                   :chunk_size])
+        if not ids:
+            break
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+
+    reseeded = 0
+    live = BlacklistedToken.objects.filter(token__expires_at__gte=now).values_list('token__jti', 'token__expires_at')
+    for jti, expires_at in live.iterator(chunk_size=chunk_size):
+        try:
+            revoke_jti(jti, expires_at.timestamp())
+            reseeded += 1
+        except Exception as e:
+            logger.error(f"TASKS - PURGE EXPIRED TOKENS : REDIS ERROR {str(e)}")
+            break
+
+    return {"purged": purged, "reseeded": reseeded}
@@ -1,3 +1,284 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from splitwise_app.utils.throttle_utils import consume_token
+from users import activity
+from users.common import constants as app_constants
+from users.friendships import FriendSet, load_friend_ids
+from users.tasks import purge_expired_tokens
+from users.tokens import RefreshToken, is_revoked
+from users.user_cache import load_user, local_users
+from users.models import Activity, User, Friends
+
+
+class FriendSetCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="owner@split-x.test", password="pass123", username="owner")
+        cls.friend = User.objects.create_user(email="friend@split-x.test", password="pass123", username="friend")
+        Friends.objects.create(user_1=cls.friend, user_2=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_friend_set_is_cached_and_memoized(self):
+        self.assertEqual(load_friend_ids(self.user.id), {self.friend.id})
+        with self.assertNumQueries(0):
+            friend_set = FriendSet()
+            self.assertTrue(friend_set.are_friends(self.user.id, self.friend))
+            self.assertTrue(friend_set.are_friends(self.user.id, self.friend.id))
+
+    def test_friend_changes_invalidate_cache(self):
+        load_friend_ids(self.user.id)
+
+        response = self.client.post("/friend/", {"email": "new@split-x.test", "username": "new"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        new_friend = User.objects.get(email="new@split-x.test")
+        self.assertEqual(load_friend_ids(self.user.id), {self.friend.id, new_friend.id})
+        self.assertEqual(load_friend_ids(new_friend.id), {self.user.id})
+
+        response = self.client.delete("/friend/new/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(load_friend_ids(self.user.id), {self.friend.id})
+
+    def test_reverse_pair_is_an_existing_friendship(self):
+        # friend added user first; user adding friend back must not store (user, friend) as well
+        response = self.client.post("/friend/", {"email": self.friend.email}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Friends.objects.count(), 1)
+
+
+class LoginThrottleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="owner@split-x.test", password="pass123", username="owner")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_login_has_a_strict_shared_rate(self):
+        payload = {"email": self.user.email, "password": "wrong"}
+        statuses = [APIClient().post("/users/login/", payload, format="json").status_code for _ in range(7)]
+
+        self.assertNotIn(429, statuses[:5])
+        self.assertEqual(statuses[5:], [429, 429])
+        response = APIClient().post("/users/login/", payload, format="json")
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_token_bucket_refills(self):
+        self.assertEqual([consume_token("throttle_test", 2, 1)[0] for _ in range(3)], [True, True, False])
+        allowed, wait = consume_token("throttle_test", 2, 1)
+        self.assertFalse(allowed)
+        self.assertLessEqual(wait, 0.5)
+
+
+class CachedAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="owner@split-x.test", password="pass123", username="owner")
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_user_is_resolved_without_a_query(self):
+        self.client.get("/friend/")
+        with self.assertNumQueries(1):  # the friend list itself
+            response = self.client.get("/friend/")
+        self.assertEqual(response.status_code, 200)
+
+        local_users.clear()
+        with self.assertNumQueries(1):  # still served from redis
+            self.client.get("/friend/")
+
+    def test_profile_update_and_deactivation_invalidate(self):
+        self.client.get("/users/me/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put("/users/me/", {"username": "renamed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(local_users.get(self.user.id))
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get("/users/me/").status_code, 401)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get("/users/me/")
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            self.assertIsNotNone(local_users.get(self.user.id))
+        callbacks[0]()
+        self.assertIsNone(local_users.get(self.user.id))
+        self.assertIsNone(cache.get(f"auth-user:{self.user.id}"))
+
+    def test_cached_user_is_not_shared_between_requests(self):
+        first = load_user(self.user.id)
+        first.set_password("changed")
+        second = load_user(self.user.id)
+        self.assertIsNot(first, second)
+        self.assertTrue(second.check_password("pass123"))
+
+    def test_change_password_invalidates(self):
+        self.client.get("/users/me/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/users/change_password/", {
+                "old_password": "pass123", "new_password": "pass456", "confirm_new_password": "pass456"
+            }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(local_users.get(self.user.id))
+        self.assertIsNone(cache.get(f"auth-user:{self.user.id}"))
+        self.assertTrue(User.objects.get(id=self.user.id).check_password("pass456"))
+
+
+class TokenBlacklistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="owner@split-x.test", password="pass123", username="owner")
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+
+    def test_issue_and_refresh_without_queries(self):
+        with self.assertNumQueries(0):
+            refresh = RefreshToken.for_user(self.user)
+        response = APIClient().post("/users/refresh-token/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+        with self.assertNumQueries(0):
+            RefreshToken(str(refresh))
+
+    def test_logout_revokes_refresh_and_access_token(self):
+        refresh = RefreshToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.assertEqual(client.get("/users/me/").status_code, 200)
+
+        response = client.post("/users/logout/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+        response = APIClient().post("/users/refresh-token/", {"refresh": str(refresh)}, format="json")
+        self.assertNotEqual(response.status_code, 200)
+        self.assertEqual(client.get("/users/me/").status_code, 401)
+
+        # the revocations live outside the evictable cache
+        cache.clear()
+        self.assertEqual(client.get("/users/me/").status_code, 401)
+
+    def test_failed_revocation_is_reported_and_rolled_back(self):
+        refresh = RefreshToken.for_user(self.user)
+        with mock.patch("users.tokens.revoke_jti", side_effect=ConnectionError("down")), \
+                self.assertLogs("users", "ERROR"), self.assertRaises(TokenError):
+            refresh.blacklist()
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertFalse(is_revoked(refresh["jti"], refresh["exp"]))
+
+    def test_purge_drops_expired_rows_and_reseeds_redis(self):
+        live = RefreshToken.for_user(self.user)
+        live.blacklist()
+        expired = OutstandingToken.objects.create(user=self.user, jti="expired", token="expired",
+                                                  expires_at=timezone.now() - timedelta(hours=1))
+        BlacklistedToken.objects.create(token=expired)
+        cache.clear()
+
+        result = purge_expired_tokens(chunk_size=1)
+
+        self.assertEqual(result, {"purged": 1, "reseeded": 1})
+        self.assertFalse(OutstandingToken.objects.filter(jti="expired").exists())
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertTrue(is_revoked(live["jti"], live["exp"]))
+
+
+class ActivityFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="owner@split-x.test", password="pass123", username="owner")
+        cls.friend = User.objects.create_user(email="friend@split-x.test", password="pass123", username="friend")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def record(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.record([
+                dict(user_id=self.user.id, actor_id=self.friend.id, verb="expense_added", comment=f"expense {i}")
+                for i in range(count)
+            ])
+        return [row.hex for row in Activity.objects.filter(user=self.user).order_by("-created_at", "-uuid")
+                .values_list("uuid", flat=True)]
+
+    def walk(self, page_size):
+        entries, position = activity.fetch_feed(self.user.id, None, page_size)
+        while position:
+            page, position = activity.fetch_feed(self.user.id, position, page_size)
+            entries += page
+        return [entry["id"] for entry in entries]
+
+    def test_friendship_is_fanned_out_to_both_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/friend/", {"email": "friend@split-x.test"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        for user in (self.user, self.friend):
+            entries, _ = activity.fetch_feed(user.id)
+            self.assertEqual([(entry["verb"], entry["comment"]) for entry in entries],
+                             [("friend_added", "owner added friend as a friend")])
+
+    def test_pages_past_the_timeline_cap_come_from_the_table(self):
+        with mock.patch.object(app_constants, "ACTIVITY_TIMELINE_CAP", 5):
+            expected = self.record(12)
+            self.assertEqual(self.walk(4), expected)
+            # the newest entries are pushed on write & a page of them is one redis read
+            expected = self.record(2)
+            with self.assertNumQueries(0):
+                entries, _ = activity.fetch_feed(self.user.id, None, 4)
+            self.assertEqual([entry["id"] for entry in entries], expected[:4])
+            self.assertEqual(self.walk(3), expected)
+
+    def test_expired_or_unreachable_timeline_falls_back_to_the_table(self):
+        expected = self.record(6)
+        self.assertEqual(self.walk(4), expected)
+
+        cache.delete(activity.TIMELINE_KEY.format(user_id=self.user.id))
+        self.assertEqual(self.walk(4), expected)
+
+        with mock.patch.object(activity, "get_redis_connection", side_effect=ConnectionError("down")), \
+                self.assertLogs("users", "ERROR"):
+            self.assertEqual(self.walk(4), expected)
+
+    def test_feed_endpoint_follows_next_cursor(self):
+        expected = self.record(3)
+
+        response = self.client.get("/users/activity/", {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()["data"]
+        self.assertEqual([entry["id"] for entry in page["results"]], expected[:2])
+
+        page = self.client.get(page["next"]).json()["data"]
+        self.assertEqual([entry["id"] for entry in page["results"]], expected[2:])
+        self.assertIsNone(page["next"])
+        self.assertEqual(self.client.get("/users/activity/", {"cursor": "bogus"}).status_code, 400)
 
-# Create your tests here.
@@ -0,0 +1,98 @@
+import logging
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from rest_framework_simplejwt import tokens as jwt_tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+logger = logging.getLogger("users")
+
+REVOKED_JTI_KEY = "revoked-jtis:{bucket}"
+REVOKED_JTI_BUCKET_SECONDS = 60 * 60
+# a non-evicting redis of its own (CACHES["tokens"]) : a lost key would make a revoked token valid again
+TOKENS_REDIS_ALIAS = "tokens"
+
+
+def _revoked_key(exp) -> str:
+    return caches[TOKENS_REDIS_ALIAS].make_key(REVOKED_JTI_KEY.format(bucket=int(exp) // REVOKED_JTI_BUCKET_SECONDS))
+
+
+def revoke_jti(jti: str, exp) -> None:
+    """
+    Add a revoked jti to the redis set of its token's expiry hour. The set expires right after the last token
+    in it would have, so the blacklist never outgrows the tokens that are still valid.
+    """
+    key = _revoked_key(exp)
+    expire_at = (int(exp) // REVOKED_JTI_BUCKET_SECONDS + 1) * REVOKED_JTI_BUCKET_SECONDS
+    pipe = get_redis_connection(TOKENS_REDIS_ALIAS).pipeline()
+    pipe.sadd(key, jti)
+    pipe.expireat(key, expire_at)
+    pipe.execute()
+
+
+def is_revoked(jti: str, exp) -> bool:
+    """
+    O(1) blacklist lookup in redis; falls back to the blacklist table only if redis is unavailable
+    """
+    try:
+        return bool(get_redis_connection(TOKENS_REDIS_ALIAS).sismember(_revoked_key(exp), jti))
+    except Exception as e:
+        logger.error(f"TOKENS - IS REVOKED : REDIS ERROR {str(e)}")
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+class RedisBlacklistMixin:
+    """
+    Blacklist check against redis instead of the token_blacklist tables. Blacklisting still writes a durable
+    row (re-seeded into redis by users.tasks.purge_expired_tokens), but issuing tokens no longer does.
+    """
+
+    def verify(self, *args, **kwargs) -> None:
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self) -> None:
+        if is_revoked(self.payload[api_settings.JTI_CLAIM], self.payload["exp"]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self) -> BlacklistedToken:
+        """
+        Write the durable row & revoke the jti in redis, all or nothing : if redis can't be written the row is
+        rolled back & TokenError raised, rather than reporting a revocation that isn't enforced
+        """
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload["exp"]
+        try:
+            with transaction.atomic():
+                token = OutstandingToken.objects.get_or_create(
+                    jti=jti,
+                    defaults={
+                        "user_id": self.payload.get(api_settings.USER_ID_CLAIM),
+                        "token": str(self),
+                        "expires_at": datetime_from_epoch(exp),
+                    },
+                )[0]
+                blacklisted = BlacklistedToken.objects.get_or_create(token=token)[0]
+                revoke_jti(jti, exp)
+        except Exception as e:
+            logger.error(f"TOKENS - BLACKLIST : ERROR {str(e)}")
+            raise TokenError(_("Token could not be revoked"))
+        return blacklisted
+
+    @classmethod
+    def for_user(cls, user):
+        # plain Token.for_user : simplejwt's BlacklistMixin.for_user inserts an OutstandingToken row per login
+        return jwt_tokens.Token.for_user.__func__(cls, user)
+
+
+class AccessToken(RedisBlacklistMixin, jwt_tokens.AccessToken):
+    pass
+
+
+class RefreshToken(RedisBlacklistMixin, jwt_tokens.RefreshToken):
+    access_token_class = AccessToken
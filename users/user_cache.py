@@ -0,0 +1,97 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+logger = logging.getLogger("users")
+
+USER_CACHE_KEY = "auth-user:{user_id}"
+USER_CACHE_TTL = 60 * 5
+LOCAL_USER_CACHE_TTL = 5  # seconds a worker may serve a user without asking redis
+LOCAL_USER_CACHE_SIZE = 2048
+
+
+class LocalUserCache:
+    """
+    Thread-safe in-process LRU with a TTL. Entries of other workers can't be invalidated from here, so the
+    TTL bounds how long a worker may keep serving a changed/deactivated user.
+    Users are copied in & out, so concurrent requests never share (& mutate) one instance.
+    """
+
+    def __init__(self, size: int = LOCAL_USER_CACHE_SIZE, ttl: int = LOCAL_USER_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return copy.copy(user)
+
+    def set(self, user_id, user) -> None:
+        with self._lock:
+            self._entries[user_id] = (copy.copy(user), time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+local_users = LocalUserCache()
+
+
+def load_user(user_id):
+    """
+    Resolve a user by id from the in-process LRU, then redis, then the database. None if it doesn't exist.
+    """
+    user = local_users.get(user_id)
+    if user is not None:
+        return user
+
+    key = USER_CACHE_KEY.format(user_id=user_id)
+    try:
+        user = cache.get(key)
+    except Exception as e:
+        logger.error(f"USER CACHE - LOAD USER : CACHE ERROR {str(e)}")
+
+    if user is None:
+        user = get_user_model().objects.filter(id=user_id).first()
+        if user is None:
+            return None
+        try:
+            cache.set(key, user, USER_CACHE_TTL)
+        except Exception as e:
+            logger.error(f"USER CACHE - LOAD USER : CACHE ERROR {str(e)}")
+
+    local_users.set(user_id, user)
+    return user
+
+
+def invalidate_cached_user(user_id) -> None:
+    """
+    Drop a changed user from this worker's LRU & from redis
+    """
+    local_users.delete(user_id)
+    try:
+        cache.delete(USER_CACHE_KEY.format(user_id=user_id))
+    except Exception as e:
+        logger.error(f"USER CACHE - INVALIDATE USER : CACHE ERROR {str(e)}")
@@ -1,8 +1,10 @@
+from django.db import transaction
 from rest_framework import (status, viewsets, serializers as drf_serializers, permissions as drf_permissions, mixins)
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 
 from splitwise_app.utils.response_util import ResponseHandler
-from users import serializers, models
+from users import activity, serializers, models
+from users.friendships import invalidate_friend_ids
 from users.common import messages as app_messages
 
 
@@ -18,7 +20,7 @@ class FriendViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.L
     """
     queryset = models.Friends.objects.all()
     permission_classes = [drf_permissions.IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     lookup_field = 'user_2__username'
     lookup_url_kwarg = 'username'
     serializer_class = serializers.FriendSerializer
@@ -63,7 +65,16 @@ class FriendViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.L
                 status_code=status.HTTP_406_NOT_ACCEPTABLE
             )
         friend_obj = self.queryset.filter(user_2__username=username)
-        self.perform_destroy(friend_obj)
+        pairs = list(friend_obj.values_list('user_1_id', 'user_1__username', 'user_2_id', 'user_2__username'))
+        with transaction.atomic():
+            self.perform_destroy(friend_obj)
+            activity.record([
+                event for user_1_id, user_1_name, user_2_id, user_2_name in pairs
+                for event in activity.friendship_changed('friend_removed', (user_1_id, user_1_name),
+                                                         (user_2_id, user_2_name))
+            ])
+        affected_users = {user_id for user_1_id, _, user_2_id, _ in pairs for user_id in (user_1_id, user_2_id)}
+        invalidate_friend_ids(*affected_users)
         return ResponseHandler.success(
             message=app_messages.FRIEND_REMOVED,
             status_code=status.HTTP_204_NO_CONTENT
@@ -76,7 +87,12 @@ class FriendViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.L
             serializer = self.get_serializer(data=request_data)
 
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                friend = serializer.save()
+                activity.record(activity.friendship_changed(
+                    'friend_added', (request.user.id, request.user.username), (friend.user_2_id, friend.user_2.username)
+                ))
+            invalidate_friend_ids(friend.user_1_id, friend.user_2_id)
             return ResponseHandler.success(
                 message=app_messages.FRIEND_ADDED_SUCCESSFULLY,
                 status_code=status.HTTP_201_CREATED
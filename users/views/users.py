@@ -1,17 +1,17 @@
 import logging
 
-from django.core.mail import send_mail
-from django.conf import settings
+from expenses.models import NotificationOutbox
 
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import (status, viewsets, serializers as drf_serializers, permissions as drf_permissions, mixins)
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import CachedJWTAuthentication
 
 from splitwise_app.utils.response_util import ResponseHandler
-from users import serializers, models, permissions
+from users import activity, serializers, models, permissions
 from users.common import messages as app_messages
+from users.tokens import RefreshToken
 
 logger = logging.getLogger('users')
 
@@ -31,11 +31,12 @@ class UserViewSet(
     * **retrieve** [`/user/me/|GET`]: obtain current user information
     * **change_password** [`/user/change_password|POST`]: update user password (old password is required)
     * **invite** [`/user/invite|POST`]: invite external users
+    * **activity** [`/user/activity|GET`]: current user's activity feed, newest first & cursor paginated
     """
 
     lookup_field = 'id'
     lookup_url_kwarg = 'id'
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     serializer_class = serializers.EgoUserSerializer
     queryset = models.User.objects.all()
 
@@ -68,8 +69,17 @@ class UserViewSet(
                 return drf_serializers.Serializer
         elif self.action == 'invite':
             return serializers.InviteSerializer
+        elif self.action == 'activity':
+            return serializers.ActivityFeedSerializer
         return serializers.UserSerializer
 
+    def get_throttles(self):
+        """
+        Login gets its own strict rate on top of the default anon/user rates.
+        """
+        self.throttle_scope = 'login' if self.action == 'login' else None
+        return super().get_throttles()
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
@@ -78,7 +88,7 @@ class UserViewSet(
             permission_list = [drf_permissions.AllowAny]
         elif self.action in ['update', 'change_password', 'logout', 'me']:
             permission_list = [permissions.IsSelfOrAdmin, drf_permissions.IsAuthenticated]
-        elif self.action in ['retrieve', 'list', 'invite']:
+        elif self.action in ['retrieve', 'list', 'invite', 'activity']:
             permission_list = [drf_permissions.IsAuthenticated]
         else:
             permission_list = [drf_permissions.AllowAny]
@@ -121,18 +131,18 @@ class UserViewSet(
 
         if serializer.is_valid():
             # Check old password
-            if not user.check_password(serializer.data.get("old_password")):
+            if not user.check_password(serializer.validated_data.get("old_password")):
                 return Response({"old_password": ["Wrong password."]}, status=status.HTTP_400_BAD_REQUEST)
 
             # confirm the new passwords match
-            new_password = serializer.data.get("new_password")
-            confirm_new_password = serializer.data.get("confirm_new_password")
+            new_password = serializer.validated_data.get("new_password")
+            confirm_new_password = serializer.validated_data.get("confirm_new_password")
             if new_password != confirm_new_password:
                 return Response({"new_password": ["New passwords must match"]}, status=status.HTTP_400_BAD_REQUEST)
 
             # set_password also hashes the password that the user will get
-            user.set_password(serializer.data.get("new_password"))
-            user.object.save()
+            user.set_password(serializer.validated_data.get("new_password"))
+            user.save(update_fields=["password"])
             return Response({"response": "successfully changed password"}, status=status.HTTP_200_OK)
 
         return ResponseHandler.failure(
@@ -206,6 +216,9 @@ class UserViewSet(
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
             token.blacklist()
+            if request.auth is not None:
+                # the access token presented with the logout request must stop working too
+                request.auth.blacklist()
             return ResponseHandler.success(
                 message=app_messages.LOG_OUT_SUCCESS,
                 status_code=status.HTTP_202_ACCEPTED
@@ -237,16 +250,16 @@ class UserViewSet(
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             if 'email' in serializer.validated_data and serializer.validated_data['email']:
-                send_mail(subject=app_messages.INVITE_SUBJECT,
-                          message=f'''Howdy fellow human!
+                NotificationOutbox.enqueue([dict(
+                    email=serializer.validated_data['email'],
+                    subject=app_messages.INVITE_SUBJECT,
+                    message=f'''Howdy fellow human!
                           Your friend {request.user.first_name.capitalize() if request.user.first_name else request.user.username} has invited you to
                            join the Split-X platform.''',
-                          html_message=f'''Howdy fellow human!<br> Your friend <strong>
+                    html_message=f'''Howdy fellow human!<br> Your friend <strong>
                             {request.user.first_name.capitalize() if request.user.first_name else request.user.username}
                           </strong> has invited you to join the <a href="#">Split-X</a> platform.''',
-                          from_email=settings.EMAIL_HOST_USER,
-                          recipient_list=[serializer.validated_data['email']],
-                          fail_silently=True)
+                )])
 
             # todo add phone api as well
             return ResponseHandler.success(
@@ -260,6 +273,51 @@ class UserViewSet(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(methods=['GET'], detail=False, )
+    def activity(self, request, format=None):
+        """
+        Current user's activity feed : expenses, settlements, friendships & group memberships concerning them.
+        Pages are read from the user's redis timeline; follow `next` for older entries.
+
+        Permissions:
+
+        * _Authentication_ is required
+        """
+        try:
+            params = self.get_serializer(data=request.query_params)
+            params.is_valid(raise_exception=True)
+            page_size = params.validated_data["page_size"]
+
+            entries, next_position = activity.fetch_feed(request.user.id, params.validated_data.get("cursor"),
+                                                         page_size)
+            next_link = None
+            if next_position:
+                next_link = replace_query_param(request.build_absolute_uri(), "cursor",
+                                                activity.encode_cursor(next_position))
+            return ResponseHandler.success(
+                message=app_messages.ACTIVITY_FEED_FETCHED,
+                data={
+                    'count': None,
+                    'page_size': page_size,
+                    'next': next_link,
+                    'previous': None,
+                    'results': entries,
+                }
+            )
+        except drf_serializers.ValidationError as ve:
+            logger.error(f"API VIEW - ACTIVITY FEED : VALIDATION ERROR {str(ve.detail)}")
+            return ResponseHandler.failure(
+                message="Validation failed",
+                data=ve.detail,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"API VIEW - ACTIVITY FEED : ERROR {str(e)}")
+            return ResponseHandler.exception(
+                message=app_messages.ACTIVITY_FEED_FAILED,
+                data=None,
+            )
+
     @action(methods=['POST'], detail=False, )
     def forget_password(self, request, format=None):
         """